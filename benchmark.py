@@ -0,0 +1,946 @@
+import os
+import sys
+import time
+import shutil
+import tempfile
+import argparse
+
+
+def make_content(index, size=2000):
+    """生成一段较长的Markdown任务内容"""
+    line = f"- [ ] 子任务 {index}: 完成需求分析、设计评审与实现\n"
+    return f"# 任务 {index}\n\n" + line * (size // len(line) + 1)
+
+
+def create_manager(tmp_dir, **kwargs):
+    """在临时目录中创建任务管理器"""
+    os.environ['LOCALAPPDATA'] = tmp_dir
+    from task_manager import TaskManager
+    return TaskManager(**kwargs)
+
+
+def make_tasks(count, content_size=2000):
+    """生成指定数量的任务数据"""
+    from datetime import datetime
+    import uuid
+    return [
+        {
+            "id": str(uuid.uuid4()),
+            "title": f"任务 {i}",
+            "content": make_content(i, content_size),
+            "is_completed": False,
+            "created_at": datetime.now().isoformat(),
+            "completed_at": None,
+            "show_on_wallpaper": True
+        }
+        for i in range(count)
+    ]
+
+
+def task_map(tasks):
+    """把任务字典转换为任务管理器使用的ID -> 任务记录映射"""
+    from task_record import Task
+    return {task["id"]: Task.from_dict(task) for task in tasks}
+
+
+def populate(manager, count):
+    """直接填充任务数据，并整体保存一次"""
+    manager.tasks = task_map(make_tasks(count))
+    manager._save_tasks()
+
+
+class NullStorage:
+    """不落盘的存储，用于单独测量内存中的数据结构开销"""
+
+    supports_query = False
+    schema_version = 4
+
+    def has_pending(self):
+        return False
+
+    def load(self):
+        return []
+
+    def save(self, tasks):
+        pass
+
+    def apply(self, records, tasks):
+        pass
+
+    def metrics(self):
+        return {}
+
+    def close(self):
+        pass
+
+
+def bench_journal(args):
+    """比较后台合并保存与日志模式下每次变更在调用线程上的耗时"""
+    print(f"{'任务数':>8} {'后台保存(ms)':>14} {'日志模式(ms)':>14}")
+    for count in args.sizes:
+        results = []
+        for journal_mode in (False, True):
+            tmp_dir = tempfile.mkdtemp()
+            try:
+                manager = create_manager(tmp_dir, journal_mode=journal_mode)
+                populate(manager, count)
+                ids = list(manager.tasks)
+                start = time.perf_counter()
+                for i in range(args.mutations):
+                    task_id = ids[i % len(ids)]
+                    manager.update_task(task_id, is_completed=(i % 2 == 0))
+                elapsed = time.perf_counter() - start
+                manager.close()
+                results.append(elapsed / args.mutations * 1000)
+            finally:
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+        print(f"{count:>8} {results[0]:>14.3f} {results[1]:>14.3f}")
+
+
+def bench_index(args):
+    """在大任务量下测量按ID更新/删除/添加的耗时（不含磁盘写入）"""
+    import random
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        manager = create_manager(tmp_dir)
+        manager.close()
+        manager.storage = NullStorage()
+        tasks = make_tasks(args.tasks, content_size=50)
+        manager.tasks = task_map(tasks)
+        rng = random.Random(42)
+
+        # 旧实现：线性扫描列表
+        legacy = list(tasks)
+        ids = [task["id"] for task in legacy]
+        sample = args.legacy_mutations
+        start = time.perf_counter()
+        for i in range(sample):
+            task_id = ids[rng.randrange(len(ids))]
+            for task in legacy:
+                if task["id"] == task_id:
+                    task["is_completed"] = not task["is_completed"]
+                    break
+        legacy_elapsed = (time.perf_counter() - start) / sample
+
+        # 新实现：ID索引
+        start = time.perf_counter()
+        for i in range(args.mutations):
+            kind = i % 4
+            position = rng.randrange(len(ids))
+            if kind == 3:
+                # 删除一个任务并补充一个新任务，保持任务总数不变
+                manager.delete_task(ids[position])
+                ids[position] = manager.add_task(f"新任务 {i}")["id"]
+            else:
+                manager.update_task(ids[position], is_completed=(kind == 0))
+        indexed_elapsed = (time.perf_counter() - start) / args.mutations
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    print(f"任务数: {args.tasks}, 变更次数: {args.mutations}")
+    print(f"线性扫描: {legacy_elapsed * 1e6:10.2f} us/次 (抽样 {sample} 次)")
+    print(f"ID索引:   {indexed_elapsed * 1e6:10.2f} us/次, 合计 {indexed_elapsed * args.mutations:.3f} s")
+
+
+def bench_format(args):
+    """比较JSON、二进制快照及其按需加载模式的保存、冷启动加载耗时和文件大小"""
+    from task_storage import write_json_snapshot, write_pack_snapshot
+    print(f"{'任务数':>8} {'格式':>6} {'保存(ms)':>10} {'加载(ms)':>10} {'大小(KB)':>10}")
+    for count in args.sizes:
+        tasks = make_tasks(count, content_size=args.content_size)
+        variants = (
+            ('json', '.json', write_json_snapshot, False),
+            ('pack', '.pack', write_pack_snapshot, False),
+            ('lazy', '.pack', write_pack_snapshot, True),
+        )
+        for name, extension, write, lazy_content in variants:
+            tmp_dir = tempfile.mkdtemp()
+            try:
+                path = os.path.join(tmp_dir, 'tasks' + extension)
+                start = time.perf_counter()
+                write(path, tasks)
+                save_elapsed = time.perf_counter() - start
+
+                # 冷启动：包含创建任务管理器时的全部加载步骤
+                start = time.perf_counter()
+                manager = create_manager(tmp_dir, data_path=path, lazy_content=lazy_content)
+                load_elapsed = time.perf_counter() - start
+                assert manager.task_count() == count
+                manager.close()
+
+                size = os.path.getsize(path)
+            finally:
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+            print(f"{count:>8} {name:>6} {save_elapsed * 1000:>10.1f} "
+                  f"{load_elapsed * 1000:>10.1f} {size / 1024:>10.0f}")
+
+
+def bench_export(args):
+    """测量各导出格式的耗时、文件大小和导出过程中的内存峰值"""
+    import json
+    import tracemalloc
+    from task_export import EXPORT_JSON, EXPORT_NDJSON, EXPORT_CSV, EXPORT_MARKDOWN
+
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        manager = create_manager(tmp_dir)
+        manager.close()
+        manager.storage = NullStorage()
+        manager.tasks = task_map(make_tasks(args.tasks, args.content_size))
+
+        def legacy_export(path):
+            # 旧实现：一次性生成整个JSON文档
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(list(manager.tasks.values()), f, ensure_ascii=False, indent=2, default=dict)
+
+        variants = [('旧JSON', legacy_export)]
+        for export_format in (EXPORT_JSON, EXPORT_NDJSON, EXPORT_CSV, EXPORT_MARKDOWN):
+            variants.append((export_format, lambda path, export_format=export_format:
+                             manager.export_tasks(path, export_format)))
+
+        print(f"任务数: {args.tasks}")
+        print(f"{'格式':>8} {'耗时(ms)':>10} {'大小(MB)':>10} {'内存峰值(MB)':>14}")
+        for name, export in variants:
+            path = os.path.join(tmp_dir, 'export.out')
+            start = time.perf_counter()
+            export(path)
+            elapsed = time.perf_counter() - start
+            size = os.path.getsize(path)
+
+            # 单独跑一遍测内存峰值，tracemalloc会拖慢耗时
+            tracemalloc.start()
+            export(path)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(f"{name:>8} {elapsed * 1000:>10.1f} {size / 1024 / 1024:>10.1f} {peak / 1024 / 1024:>14.2f}")
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def bench_search(args):
+    """测量全文索引的建立、查询和增量更新耗时，并与逐个任务子串扫描比较"""
+    import random
+    rng = random.Random(42)
+    chars = "需求设计评审实现测试发布文档会议报告整理预算采购客户反馈优化修复上线部署周月计划总结"
+    words = ["report", "review", "deploy", "budget", "meeting", "release", "fix", "design",
+             "python", "wallpaper", "sync", "backup", "invoice", "travel", "doctor", "call"]
+
+    def sentence(length):
+        parts = []
+        for _ in range(length):
+            if rng.random() < 0.7:
+                parts.append("".join(rng.choice(chars) for _ in range(rng.randint(2, 6))))
+            else:
+                parts.append(f" {rng.choice(words)} {rng.randint(0, 99)} ")
+        return "".join(parts)
+
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        manager = create_manager(tmp_dir)
+        manager.close()
+        manager.storage = NullStorage()
+        tasks = make_tasks(args.tasks, content_size=0)
+        for task in tasks:
+            task["title"] = sentence(3)
+            task["content"] = sentence(args.words)
+        manager.tasks = task_map(tasks)
+
+        start = time.perf_counter()
+        manager.search_tasks("预热")
+        print(f"任务数: {args.tasks}, 建立索引: {(time.perf_counter() - start) * 1000:.0f} ms")
+
+        queries = ["评审", "需求设计", "deploy", "rep", "测试 budget", "发布 上线 sync", "会议 doctor 42"]
+        print(f"{'查询':<16} {'结果数':>8} {'索引(ms)':>10} {'子串扫描(ms)':>14}")
+        for query in queries:
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                results = manager.search_tasks(query)
+            indexed = (time.perf_counter() - start) / args.repeat
+
+            # 朴素实现：逐个任务检查每个查询词是否出现在标题或内容中
+            terms = query.lower().split()
+            start = time.perf_counter()
+            naive = [task["id"] for task in manager.tasks.values()
+                     if all(term in task["title"].lower() or term in task["content"].lower()
+                            for term in terms)]
+            scanned = time.perf_counter() - start
+            print(f"{query:<16} {len(results):>8} {indexed * 1000:>10.3f} {scanned * 1000:>14.1f}")
+
+        ids = list(manager.tasks)
+        start = time.perf_counter()
+        for i in range(args.updates):
+            manager.update_task(ids[rng.randrange(len(ids))], content=sentence(args.words))
+        elapsed = (time.perf_counter() - start) / args.updates
+        print(f"增量更新（含重新切词）: {elapsed * 1e6:.0f} us/次")
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def bench_memory(args):
+    """比较以字典和以Task记录保存任务时每个任务占用的内存"""
+    import gc
+    import json
+    import tracemalloc
+    from task_record import Task
+
+    records = make_tasks(args.tasks, args.content_size)
+    for index, record in enumerate(records):
+        record["updated_at"] = record["created_at"]
+        if index % 2:
+            # 一半任务已完成，多一个完成时间
+            record["is_completed"] = True
+            record["completed_at"] = record["created_at"]
+    # 从JSON文本解析，与真实加载时一样，每个任务的字符串都是独立的对象
+    text = json.dumps(records, ensure_ascii=False)
+    del records
+
+    gc.collect()
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    records = json.loads(text)
+    dict_size = tracemalloc.get_traced_memory()[0] - base
+
+    tasks = [Task.from_dict(record) for record in records]
+    del records
+    gc.collect()
+    task_size = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+    del tasks
+
+    print(f"任务数: {args.tasks}, 内容长度: {args.content_size}")
+    print(f"字典记录:  {dict_size / args.tasks:8.0f} 字节/任务, 合计 {dict_size / 1024 / 1024:.1f} MB")
+    print(f"Task记录:  {task_size / args.tasks:8.0f} 字节/任务, 合计 {task_size / 1024 / 1024:.1f} MB")
+    print(f"节省:      {(dict_size - task_size) / args.tasks:8.0f} 字节/任务")
+
+
+def bench_snapshot(args):
+    """比较每次读取都复制任务列表与按版本共享只读快照的读取耗时"""
+    import random
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        manager = create_manager(tmp_dir)
+        manager.close()
+        manager.storage = NullStorage()
+        manager.tasks = task_map(make_tasks(args.tasks, content_size=0))
+        ids = list(manager.tasks)
+        rng = random.Random(42)
+
+        def run(read):
+            # 每次变更后界面和壁纸各读取若干次全部任务
+            start = time.perf_counter()
+            for i in range(args.mutations):
+                manager.update_task(ids[rng.randrange(len(ids))], is_completed=bool(i % 2))
+                for _ in range(args.reads):
+                    read()
+            return (time.perf_counter() - start) / args.mutations
+
+        copy_elapsed = run(lambda: list(manager.tasks.values()))
+        snapshot_elapsed = run(manager.get_all_tasks)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    print(f"任务数: {args.tasks}, 每次变更后读取 {args.reads} 次")
+    print(f"每次读取复制列表: {copy_elapsed * 1000:8.3f} ms/变更")
+    print(f"共享版本快照:     {snapshot_elapsed * 1000:8.3f} ms/变更")
+
+
+def bench_priority(args):
+    """比较二级索引与全量扫描排序在每次变更后取前N个壁纸任务和按标签查询的耗时"""
+    import random
+    from task_index import task_priority
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        manager = create_manager(tmp_dir)
+        manager.close()
+        manager.storage = NullStorage()
+        rng = random.Random(42)
+        tags = [f"标签{i}" for i in range(args.tags)]
+        tasks = make_tasks(args.tasks, content_size=0)
+        for task in tasks:
+            task["priority"] = rng.randint(-1, 2)
+            task["tags"] = rng.sample(tags, 2)
+            task["category"] = rng.choice(("工作", "生活", "学习"))
+        manager.tasks = task_map(tasks)
+        ids = list(manager.tasks)
+
+        start = time.perf_counter()
+        manager.get_wallpaper_tasks(limit=1)
+        print(f"任务数: {args.tasks}, 建立索引: {(time.perf_counter() - start) * 1000:.0f} ms")
+
+        def scan_wallpaper():
+            visible = [(-task_priority(task), position, task)
+                       for position, task in enumerate(manager.tasks.values())
+                       if not task["is_completed"] and task.get("show_on_wallpaper", True)]
+            visible.sort(key=lambda item: item[:2])
+            return [task for _, _, task in visible[:args.top]]
+
+        def scan_tag():
+            return [task for task in manager.tasks.values() if tags[0] in task.get("tags", ())]
+
+        def run(top, by_tag):
+            # 每次修改一个任务的优先级或完成状态，之后渲染壁纸并刷新按标签过滤的列表
+            start = time.perf_counter()
+            for i in range(args.mutations):
+                task_id = ids[rng.randrange(len(ids))]
+                if i % 2:
+                    manager.update_task(task_id, priority=rng.randint(-1, 2))
+                else:
+                    manager.update_task(task_id, is_completed=not manager.tasks[task_id]["is_completed"])
+                result = top()
+                by_tag()
+            return (time.perf_counter() - start) / args.mutations, result
+
+        scan_elapsed, scanned = run(scan_wallpaper, scan_tag)
+        index_elapsed, indexed = run(lambda: manager.get_wallpaper_tasks(limit=args.top),
+                                     lambda: manager.get_tasks_by_tag(tags[0]))
+        assert [task["id"] for task in scan_wallpaper()] == [task["id"] for task in indexed]
+        assert ({task["id"] for task in scan_tag()}
+                == {task["id"] for task in manager.get_tasks_by_tag(tags[0])})
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    print(f"每次变更后取前 {args.top} 个壁纸任务并按标签查询")
+    print(f"全量扫描排序: {scan_elapsed * 1000:8.3f} ms/变更")
+    print(f"二级索引:     {index_elapsed * 1000:8.3f} ms/变更")
+
+
+def bench_schedule(args):
+    """比较最小堆与每次扫描全部任务求下一个截止时间的重新安排耗时
+
+    TaskScheduler依赖Qt，这里直接使用它内部的DeadlineQueue，按同样的方式随变更
+    重新安排被修改的任务。
+    """
+    import random
+    from datetime import datetime, timedelta
+    from task_index import DeadlineQueue
+    from task_record import now_timestamp, task_timestamp
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        manager = create_manager(tmp_dir)
+        manager.close()
+        manager.storage = NullStorage()
+        rng = random.Random(42)
+        start_time = datetime.now()
+
+        def random_due():
+            return (start_time + timedelta(minutes=rng.randint(1, 30 * 24 * 60))).isoformat()
+
+        tasks = make_tasks(args.tasks, content_size=0)
+        for task in tasks:
+            task["due_at"] = random_due()
+        manager.tasks = task_map(tasks)
+        ids = list(manager.tasks)
+        now = now_timestamp()
+        queue = DeadlineQueue()
+
+        def build_queue():
+            queue.build((task_timestamp(task, "due_at"), task_id, "due")
+                        for task_id, task in manager.tasks.items() if not task["is_completed"])
+
+        def scan_next():
+            return min(filter(None, (task_timestamp(task, "due_at") for task in manager.tasks.values()
+                                     if not task["is_completed"])), default=None)
+
+        def heap_next(task_id):
+            task = manager.tasks[task_id]
+            when = task_timestamp(task, "due_at")
+            queue.set(task_id, "due", None if task["is_completed"] or when <= now else when)
+            return queue.next_time()
+
+        def run(next_deadline):
+            # 每次修改一个任务的截止时间或完成状态，之后求出下一次定时器触发的时间
+            start = time.perf_counter()
+            for i in range(args.mutations):
+                task_id = ids[rng.randrange(len(ids))]
+                if i % 4:
+                    manager.update_task(task_id, due_at=random_due())
+                else:
+                    manager.update_task(task_id, is_completed=not manager.tasks[task_id]["is_completed"])
+                result = next_deadline(task_id)
+            return (time.perf_counter() - start) / args.mutations, result
+
+        scan_elapsed, _ = run(lambda task_id: scan_next())
+        # 在扫描方式的变更之后建立，与当时的任务一致
+        start = time.perf_counter()
+        build_queue()
+        print(f"任务数: {args.tasks}, 建立最小堆: {(time.perf_counter() - start) * 1000:.1f} ms")
+        heap_elapsed, heap_result = run(heap_next)
+        assert heap_result == scan_next()
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    print("每次变更后求下一个截止时间")
+    print(f"扫描全部任务: {scan_elapsed * 1000:8.3f} ms/变更")
+    print(f"最小堆:       {heap_elapsed * 1000:8.3f} ms/变更")
+
+
+def bench_timerange(args):
+    """比较排序时间索引与每次解析全部时间戳的“今天完成”“本周新增”查询耗时"""
+    import random
+    from datetime import datetime, timedelta
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        manager = create_manager(tmp_dir)
+        manager.close()
+        manager.storage = NullStorage()
+        rng = random.Random(42)
+        now = datetime.now()
+        tasks = make_tasks(args.tasks, content_size=0)
+        # 任务在过去一年内创建，一半已完成
+        for task in tasks:
+            created = now - timedelta(minutes=rng.randint(0, 365 * 24 * 60))
+            task["created_at"] = created.isoformat()
+            if rng.random() < 0.5:
+                task["is_completed"] = True
+                task["completed_at"] = (created + (now - created) * rng.random()).isoformat()
+        manager.tasks = task_map(tasks)
+        ids = list(manager.tasks)
+        today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        week = today - timedelta(days=today.weekday())
+
+        start = time.perf_counter()
+        manager.count_tasks_created_between()
+        print(f"任务数: {args.tasks}, 建立索引: {(time.perf_counter() - start) * 1000:.0f} ms")
+
+        def scan():
+            completed = [task for task in manager.tasks.values() if task["is_completed"]
+                         and task.get("completed_at") and datetime.fromisoformat(task["completed_at"]) >= today]
+            completed.sort(key=lambda task: task["completed_at"], reverse=True)
+            created = [task for task in manager.tasks.values()
+                       if task.get("created_at") and datetime.fromisoformat(task["created_at"]) >= week]
+            return completed, created
+
+        def indexed():
+            return (manager.get_tasks_completed_between(today),
+                    manager.get_tasks_created_between(week))
+
+        def run(query):
+            # 每次完成或恢复一个任务后刷新“今天完成”和“本周新增”两个视图
+            start = time.perf_counter()
+            for i in range(args.mutations):
+                task_id = ids[rng.randrange(len(ids))]
+                manager.update_task(task_id, is_completed=not manager.tasks[task_id]["is_completed"])
+                result = query()
+            return (time.perf_counter() - start) / args.mutations, result
+
+        scan_elapsed, (scan_completed, scan_created) = run(scan)
+        index_elapsed, (index_completed, index_created) = run(indexed)
+        scan_completed, scan_created = scan()
+        assert [task["id"] for task in scan_completed] == [task["id"] for task in index_completed]
+        assert {task["id"] for task in scan_created} == {task["id"] for task in index_created}
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    print(f"今天完成 {len(index_completed)} 个, 本周新增 {len(index_created)} 个")
+    print(f"逐个解析时间戳: {scan_elapsed * 1000:8.3f} ms/变更")
+    print(f"排序时间索引:   {index_elapsed * 1000:8.3f} ms/变更")
+
+
+# 壁纸基准测试使用的分辨率
+WALLPAPER_SIZES = {"1080p": (1920, 1080), "4K": (3840, 2160), "8K": (7680, 4320)}
+
+
+def make_wallpaper(path, size):
+    """生成一张有细节的JPEG壁纸（渐变加噪声），解码开销接近真实照片"""
+    from PIL import Image
+    gradient = Image.linear_gradient("L").resize(size)
+    noise = Image.effect_noise(size, 40)
+    Image.merge("RGB", (gradient, noise, gradient.transpose(Image.Transpose.FLIP_LEFT_RIGHT))).save(
+        path, quality=90)
+
+
+def bench_wallpaper(args):
+    """比较刷新中准备底图的耗时：每次重新解码原始壁纸、使用解码缓存、再缓存静态图层
+
+    完整的刷新还需要Windows壁纸接口、字体和Qt渲染，这里只测量随这些改动变化的部分：
+    读取原始壁纸、转换为RGBA、与半透明面板合成、绘制标题，得到可以继续绘制任务的图像。
+    """
+    from PIL import Image, ImageDraw, ImageFont
+    from wallpaper_cache import BaseImageCache, LayerCache
+
+    title_font = ImageFont.load_default()
+
+    def panel(size):
+        overlay = Image.new("RGBA", size, (0, 0, 0, 0))
+        width, height = size
+        ImageDraw.Draw(overlay).rounded_rectangle(
+            [int(width * 0.5), int(height * 0.15), int(width * 0.95), int(height * 0.95)],
+            radius=20, fill=(30, 30, 40, 160))
+        return overlay
+
+    def draw_title(img):
+        ImageDraw.Draw(img).text((int(img.width * 0.7), int(img.height * 0.15) + 20), "任务清单",
+                                 fill=(255, 255, 255), font=title_font)
+        return img
+
+    def legacy_refresh(path, overlay):
+        # 原来的做法：每次打开并复制原图，再复制一次，合成前转换为RGBA
+        original_image = Image.open(path).copy()
+        img = original_image.copy()
+        return draw_title(Image.alpha_composite(img.convert("RGBA"), overlay).convert("RGB"))
+
+    def cached_refresh(cache, path, overlay):
+        return draw_title(Image.alpha_composite(cache.get(path), overlay).convert("RGB"))
+
+    def layered_refresh(cache, layers, path):
+        base_image = cache.get(path)
+        return layers.get((cache.generation, base_image.size),
+                          lambda: draw_title(Image.alpha_composite(base_image, panel(base_image.size)).convert("RGB"))
+                          ).copy()
+
+    def measure(refresh):
+        start = time.perf_counter()
+        refresh()
+        first = time.perf_counter() - start
+        start = time.perf_counter()
+        for _ in range(args.refreshes):
+            refresh()
+        return (time.perf_counter() - start) / args.refreshes, first
+
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        print(f"{'分辨率':>8} {'每次解码(ms)':>14} {'解码缓存(ms)':>14} {'静态图层(ms)':>14} {'首次(ms)':>10}")
+        for name in args.sizes:
+            size = WALLPAPER_SIZES[name]
+            path = os.path.join(tmp_dir, f"wallpaper-{name}.jpg")
+            make_wallpaper(path, size)
+            overlay = panel(size)
+
+            start = time.perf_counter()
+            for _ in range(args.refreshes):
+                legacy_refresh(path, overlay)
+            legacy = (time.perf_counter() - start) / args.refreshes
+
+            cache = BaseImageCache()
+            cached, _ = measure(lambda: cached_refresh(cache, path, overlay))
+            assert cache.misses == 1
+
+            cache = BaseImageCache()
+            layers = LayerCache()
+            layered, first = measure(lambda: layered_refresh(cache, layers, path))
+            assert cache.misses == 1 and layers.misses == 1
+            print(f"{name:>8} {legacy * 1000:>14.1f} {cached * 1000:>14.1f} {layered * 1000:>14.1f} "
+                  f"{first * 1000:>10.1f}")
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def bench_tiles(args):
+    """比较每次刷新重新渲染全部任务图块与使用图块缓存时的耗时和渲染次数
+
+    MarkdownRenderer依赖Qt，这里用Pillow绘制多行文字并经过一次PNG编解码代替，
+    与刷新中QPixmap转换为PIL图像的过程相当。每次刷新隐藏或重新显示一个任务，
+    其余任务不变。
+    """
+    import io
+    import random
+    from PIL import Image, ImageDraw, ImageFont
+    from wallpaper_cache import TileCache, tile_key
+
+    font = ImageFont.load_default()
+    width = 800
+    rng = random.Random(42)
+    contents = [[f"任务{i} 第{line}行 " + "x" * rng.randint(10, 60) for line in range(rng.randint(2, 8))]
+                for i in range(args.tasks)]
+    rendered = 0
+
+    def render(lines):
+        nonlocal rendered
+        rendered += 1
+        tile = Image.new("RGBA", (width, 20 * len(lines) + 10), (0, 0, 0, 0))
+        draw = ImageDraw.Draw(tile)
+        for number, line in enumerate(lines):
+            draw.text((10, 5 + 20 * number), line, fill=(255, 255, 255, 255), font=font)
+        buffer = io.BytesIO()
+        tile.save(buffer, "PNG")
+        buffer.seek(0)
+        return Image.open(buffer).convert("RGBA")
+
+    def run(tile):
+        nonlocal rendered
+        rendered = 0
+        hidden = None
+        start = time.perf_counter()
+        for _ in range(args.refreshes):
+            # 切换一个任务的可见性，然后绘制全部可见任务
+            hidden = None if hidden is not None else rng.randrange(args.tasks)
+            for i, lines in enumerate(contents):
+                if i != hidden:
+                    tile(lines)
+        return (time.perf_counter() - start) / args.refreshes, rendered / args.refreshes
+
+    uncached, uncached_renders = run(render)
+    cache = TileCache(args.budget_mb * 1024 * 1024)
+    for lines in contents:
+        cache.get(tile_key(lines, width), lambda: render(lines))
+    cached, cached_renders = run(lambda lines: cache.get(tile_key(lines, width), lambda: render(lines)))
+
+    print(f"可见任务数: {args.tasks}, 内存预算: {args.budget_mb} MB, "
+          f"缓存占用: {cache.size / 1024 / 1024:.1f} MB ({len(cache)} 个图块)")
+    print(f"每次全部渲染: {uncached * 1000:8.2f} ms/刷新, 渲染 {uncached_renders:.1f} 个图块")
+    print(f"图块缓存:     {cached * 1000:8.2f} ms/刷新, 渲染 {cached_renders:.1f} 个图块, "
+          f"命中 {cache.hits} 次, 未命中 {cache.misses} 次")
+
+
+def contention_worker(data_path, worker, count, journal_mode):
+    """并发进程：向同一个数据文件添加并修改任务"""
+    from task_manager import TaskManager
+    manager = TaskManager(data_path, journal_mode=journal_mode, save_delay=0.005)
+    for i in range(count):
+        task = manager.add_task(f"进程{worker}-{i}")
+        manager.update_task(task["id"], content=f"由进程{worker}写入")
+        if i % 2:
+            manager.update_task(task["id"], is_completed=True)
+    manager.close()
+
+
+def bench_contention(args):
+    """多个进程同时修改同一个数据文件，检查没有任务或修改丢失，有丢失时以非零状态退出"""
+    import multiprocessing
+    from task_manager import TaskManager
+    tmp_dir = tempfile.mkdtemp()
+    failed = False
+    try:
+        for journal_mode in (False, True):
+            data_path = os.path.join(tmp_dir, f"tasks-{int(journal_mode)}.json")
+            start = time.perf_counter()
+            processes = [multiprocessing.Process(target=contention_worker,
+                                                 args=(data_path, worker, args.tasks, journal_mode))
+                         for worker in range(args.processes)]
+            for process in processes:
+                process.start()
+            for process in processes:
+                process.join()
+            elapsed = time.perf_counter() - start
+
+            manager = TaskManager(data_path)
+            tasks = manager.get_all_tasks()
+            manager.close()
+            expected = {f"进程{worker}-{i}" for worker in range(args.processes) for i in range(args.tasks)}
+            titles = {task["title"] for task in tasks}
+            lost = len(expected - titles)
+            lost_updates = sum(1 for task in tasks
+                               if task["content"] != f"由进程{task['title'][2:].split('-')[0]}写入"
+                               or task["is_completed"] != bool(int(task["title"].split("-")[1]) % 2))
+            mode = "日志模式" if journal_mode else "后台保存"
+            print(f"{mode}: {args.processes} 个进程 x {args.tasks} 个任务, 耗时 {elapsed:.2f} s, "
+                  f"丢失任务 {lost}, 丢失修改 {lost_updates}, 重复 {len(tasks) - len(titles)}")
+            failed = failed or lost or lost_updates or len(tasks) != len(titles)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    if failed:
+        sys.exit("并发修改有任务或修改丢失")
+
+
+def bench_recovery(args):
+    """故障注入：在随机字节偏移处中断写入，检查能否恢复到最新的一致状态并测量恢复耗时
+
+    有恢复不正确的情况时以非零状态退出。
+    """
+    import io
+    import json
+    import random
+    from contextlib import redirect_stdout
+    from task_storage import create_storage
+
+    rng = random.Random(args.seed)
+    older = make_tasks(args.tasks, args.content_size)
+    newer = [dict(task, title=task["title"] + " 已修改") if index % 10 == 0 else task
+             for index, task in enumerate(older)]
+    newest = newer[:-1]
+    journal = [{"op": "update", "id": task["id"], "fields": {"title": f"日志 {index}"}}
+               for index, task in enumerate(newer[:args.journal_records])]
+    journal_bytes = "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in journal).encode('utf-8')
+
+    def titles(tasks):
+        return {task["id"]: task["title"] for task in tasks}
+
+    def replayed(data):
+        # 日志中完整的记录按顺序重放，第一条不完整的记录及其后的内容被丢弃
+        tasks = titles(newer)
+        for line in data.split(b"\n"):
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break
+            tasks[record["id"]] = record["fields"]["title"]
+        return tasks
+
+    tmp_dir = tempfile.mkdtemp()
+    failed = False
+    try:
+        print(f"任务数: {args.tasks}, 每种故障 {args.trials} 次")
+        print(f"{'格式':>6} {'故障':<14} {'恢复正确':>8} {'平均加载(ms)':>12}")
+        for extension in (".json", ".pack"):
+            # 准备各个状态的完整快照文件
+            files = {}
+            for name, tasks in (("older", older), ("newer", newer), ("newest", newest)):
+                path = os.path.join(tmp_dir, name + extension)
+                storage = create_storage(path, journal_mode=True)
+                storage.write_snapshot(path, tasks)
+                storage.close()
+                with open(path, 'rb') as f:
+                    files[name] = f.read()
+
+            def truncated_primary():
+                offset = rng.randrange(len(files["newer"]))
+                return {"": files["newer"][:offset], ".bak": files["older"]}, titles(older)
+
+            def interrupted_tmp():
+                offset = rng.randrange(len(files["newest"]))
+                return {"": files["newer"], ".bak": files["older"], ".tmp": files["newest"][:offset]}, titles(newer)
+
+            def before_replace():
+                # 原快照已改名为.bak，完整的临时文件还没有换为数据文件
+                return {".bak": files["newer"], ".tmp": files["newest"]}, titles(newest)
+
+            def torn_journal():
+                data = journal_bytes[:rng.randrange(len(journal_bytes) + 1)]
+                return {"": files["newer"], ".bak": files["older"], ".journal": data}, replayed(data)
+
+            def intact():
+                return {"": files["newer"], ".bak": files["older"]}, titles(newer)
+
+            def bit_rot():
+                # 数据文件中某个标题的一个数字被改动，仍是合法的JSON，只有校验和能发现
+                data = bytearray(files["newer"])
+                marker = '"title": "任务 '.encode('utf-8')
+                start = data.find(marker, rng.randrange(len(data) // 2))
+                index = (start if start >= 0 else data.find(marker)) + len(marker)
+                data[index] = ord("0") + (data[index] - ord("0") + 1) % 10
+                return {"": bytes(data), ".bak": files["older"]}, titles(older)
+
+            def synced_older_mtime():
+                # 同步工具换入的数据文件保留远端的修改时间，比.bak还旧
+                return {"": files["newest"], ".bak": files["newer"]}, titles(newest)
+
+            faults = (("无故障", intact), ("数据文件被截断", truncated_primary),
+                      ("写临时文件时中断", interrupted_tmp), ("替换前中断", before_replace),
+                      ("日志末尾中断", torn_journal), ("同步的旧修改时间", synced_older_mtime))
+            if extension == ".json":
+                faults += (("内容被改动", bit_rot),)
+            # 按写入的先后设置修改时间：.bak最旧，数据文件其次，临时文件和日志最新
+            default_ages = {".bak": 3, "": 2, ".tmp": 1, ".journal": 1}
+            fault_ages = {synced_older_mtime: {".bak": 2, "": 60}}
+            for fault_name, inject in faults:
+                correct = 0
+                elapsed = 0.0
+                for trial in range(args.trials):
+                    trial_dir = tempfile.mkdtemp(dir=tmp_dir)
+                    path = os.path.join(trial_dir, "tasks" + extension)
+                    written, expected = inject()
+                    ages = fault_ages.get(inject, default_ages)
+                    now = time.time()
+                    for suffix, data in written.items():
+                        with open(path + suffix, 'wb') as f:
+                            f.write(data)
+                        os.utime(path + suffix, (now - ages[suffix], now - ages[suffix]))
+                    start = time.perf_counter()
+                    with redirect_stdout(io.StringIO()):
+                        storage = create_storage(path, journal_mode=True)
+                        tasks = storage.load()
+                        storage.close()
+                    elapsed += time.perf_counter() - start
+                    correct += titles(tasks) == expected
+                    shutil.rmtree(trial_dir, ignore_errors=True)
+                print(f"{extension[1:]:>6} {fault_name:<14} {correct:>4}/{args.trials:<3} "
+                      f"{elapsed / args.trials * 1000:>12.1f}")
+                failed = failed or correct < args.trials
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    if failed:
+        sys.exit("有故障没有恢复到最新的一致状态")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="任务存储性能测试")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    journal_parser = subparsers.add_parser("journal", help="日志模式与后台保存的单次变更耗时")
+    journal_parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 5000])
+    journal_parser.add_argument("--mutations", type=int, default=200)
+    journal_parser.set_defaults(func=bench_journal)
+
+    index_parser = subparsers.add_parser("index", help="ID索引下的更新/删除耗时")
+    index_parser.add_argument("--tasks", type=int, default=50000)
+    index_parser.add_argument("--mutations", type=int, default=100000)
+    index_parser.add_argument("--legacy-mutations", type=int, default=500)
+    index_parser.set_defaults(func=bench_index)
+
+    format_parser = subparsers.add_parser("format", help="JSON与二进制快照的加载/保存耗时和文件大小")
+    format_parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    format_parser.add_argument("--content-size", type=int, default=500)
+    format_parser.set_defaults(func=bench_format)
+
+    export_parser = subparsers.add_parser("export", help="各导出格式的耗时与内存峰值")
+    export_parser.add_argument("--tasks", type=int, default=100000)
+    export_parser.add_argument("--content-size", type=int, default=500)
+    export_parser.set_defaults(func=bench_export)
+
+    search_parser = subparsers.add_parser("search", help="全文索引的建立、查询与增量更新耗时")
+    search_parser.add_argument("--tasks", type=int, default=50000)
+    search_parser.add_argument("--words", type=int, default=40, help="每个任务内容的词数")
+    search_parser.add_argument("--repeat", type=int, default=20)
+    search_parser.add_argument("--updates", type=int, default=2000)
+    search_parser.set_defaults(func=bench_search)
+
+    memory_parser = subparsers.add_parser("memory", help="字典与Task记录的每任务内存占用")
+    memory_parser.add_argument("--tasks", type=int, default=100000)
+    memory_parser.add_argument("--content-size", type=int, default=0)
+    memory_parser.set_defaults(func=bench_memory)
+
+    snapshot_parser = subparsers.add_parser("snapshot", help="复制任务列表与共享只读快照的读取耗时")
+    snapshot_parser.add_argument("--tasks", type=int, default=50000)
+    snapshot_parser.add_argument("--mutations", type=int, default=200)
+    snapshot_parser.add_argument("--reads", type=int, default=4)
+    snapshot_parser.set_defaults(func=bench_snapshot)
+
+    priority_parser = subparsers.add_parser("priority", help="按优先级取前N个壁纸任务与按标签查询的耗时")
+    priority_parser.add_argument("--tasks", type=int, default=50000)
+    priority_parser.add_argument("--tags", type=int, default=50, help="标签总数，每个任务带两个")
+    priority_parser.add_argument("--top", type=int, default=20)
+    priority_parser.add_argument("--mutations", type=int, default=200)
+    priority_parser.set_defaults(func=bench_priority)
+
+    schedule_parser = subparsers.add_parser("schedule", help="截止时间最小堆与全量扫描的重新安排耗时")
+    schedule_parser.add_argument("--tasks", type=int, default=10000)
+    schedule_parser.add_argument("--mutations", type=int, default=500)
+    schedule_parser.set_defaults(func=bench_schedule)
+
+    timerange_parser = subparsers.add_parser("timerange", help="按创建/完成时间范围查询的耗时")
+    timerange_parser.add_argument("--tasks", type=int, default=50000)
+    timerange_parser.add_argument("--mutations", type=int, default=200)
+    timerange_parser.set_defaults(func=bench_timerange)
+
+    wallpaper_parser = subparsers.add_parser("wallpaper", help="原始壁纸解码缓存和静态图层缓存对刷新耗时的影响")
+    wallpaper_parser.add_argument("--sizes", nargs="+", choices=list(WALLPAPER_SIZES),
+                                  default=list(WALLPAPER_SIZES))
+    wallpaper_parser.add_argument("--refreshes", type=int, default=5)
+    wallpaper_parser.set_defaults(func=bench_wallpaper)
+
+    tiles_parser = subparsers.add_parser("tiles", help="任务图块缓存对刷新中Markdown渲染次数的影响")
+    tiles_parser.add_argument("--tasks", type=int, default=30, help="壁纸上可见的任务数")
+    tiles_parser.add_argument("--refreshes", type=int, default=50)
+    tiles_parser.add_argument("--budget-mb", type=int, default=64, help="图块缓存的内存预算")
+    tiles_parser.set_defaults(func=bench_tiles)
+
+    contention_parser = subparsers.add_parser("contention", help="多进程并发修改同一个数据文件")
+    contention_parser.add_argument("--processes", type=int, default=4)
+    contention_parser.add_argument("--tasks", type=int, default=200, help="每个进程添加的任务数")
+    contention_parser.set_defaults(func=bench_contention)
+
+    recovery_parser = subparsers.add_parser("recovery", help="故障注入：中断写入后的恢复正确性与耗时")
+    recovery_parser.add_argument("--tasks", type=int, default=50000)
+    recovery_parser.add_argument("--content-size", type=int, default=200)
+    recovery_parser.add_argument("--journal-records", type=int, default=1000)
+    recovery_parser.add_argument("--trials", type=int, default=10)
+    recovery_parser.add_argument("--seed", type=int, default=42)
+    recovery_parser.set_defaults(func=bench_recovery)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    main()
@@ -1,3 +1,4 @@
+import hashlib
 import os
 import sys
 import markdown
@@ -159,6 +160,11 @@ class MarkdownRenderer:
             </style>
         """
     
+    @property
+    def css_version(self):
+        """样式表的摘要，样式变化后由它生成的图像缓存随之失效"""
+        return hashlib.blake2b(self.css_style.encode("utf-8"), digest_size=8).hexdigest()
+    
     def render_markdown(self, md_text, width=500, font_size=16, completed=False):
         """渲染Markdown为QPixmap图像"""
         # 如果任务已完成，使用暗色
@@ -0,0 +1,91 @@
+import os
+import csv
+import json
+
+# 导出格式
+EXPORT_JSON = "json"
+EXPORT_NDJSON = "ndjson"
+EXPORT_CSV = "csv"
+EXPORT_MARKDOWN = "markdown"
+
+# 按文件扩展名推断导出格式
+EXPORT_EXTENSIONS = {
+    ".json": EXPORT_JSON,
+    ".ndjson": EXPORT_NDJSON,
+    ".jsonl": EXPORT_NDJSON,
+    ".csv": EXPORT_CSV,
+    ".md": EXPORT_MARKDOWN,
+    ".markdown": EXPORT_MARKDOWN,
+}
+
+# 导出范围
+EXPORT_ALL = "all"
+EXPORT_ACTIVE = "active"
+EXPORT_WALLPAPER = "wallpaper"
+
+CSV_COLUMNS = ("id", "title", "content", "is_completed", "created_at", "completed_at",
+               "show_on_wallpaper", "updated_at", "priority", "tags", "category", "due_at", "remind_at")
+
+
+def export_format_for_path(path):
+    """根据文件扩展名选择导出格式，默认JSON"""
+    return EXPORT_EXTENSIONS.get(os.path.splitext(path)[1].lower(), EXPORT_JSON)
+
+
+def write_json(f, tasks):
+    """逐个写出任务，输出与json.dump(tasks, indent=2)相同"""
+    f.write("[")
+    first = True
+    for task in tasks:
+        f.write("\n  " if first else ",\n  ")
+        f.write(json.dumps(task, ensure_ascii=False, indent=2, default=dict).replace("\n", "\n  "))
+        first = False
+    f.write("]" if first else "\n]")
+
+
+def write_ndjson(f, tasks):
+    """每行一个任务的JSON，便于脚本逐行处理"""
+    for task in tasks:
+        f.write(json.dumps(task, ensure_ascii=False, separators=(',', ':'), default=dict))
+        f.write("\n")
+
+
+def write_csv(f, tasks):
+    """CSV表格，每个任务一行"""
+    writer = csv.writer(f)
+    writer.writerow(CSV_COLUMNS)
+    for task in tasks:
+        row = [task.get(column, "") for column in CSV_COLUMNS]
+        # 标签列表写成逗号分隔的一格
+        writer.writerow([", ".join(value) if isinstance(value, list) else value for value in row])
+
+
+def write_markdown(f, tasks):
+    """Markdown清单：标题作为勾选项，内容缩进在勾选项下"""
+    f.write("# 任务清单\n")
+    for task in tasks:
+        content = task.get("content", "")
+        title = task.get("title") or content.split('\n')[0]
+        mark = "x" if task.get("is_completed") else " "
+        f.write(f"\n- [{mark}] {title}\n")
+        if content.strip() and content.strip() != title.strip():
+            for line in content.rstrip('\n').split('\n'):
+                f.write(f"  {line}\n" if line else "\n")
+
+
+EXPORT_WRITERS = {
+    EXPORT_JSON: write_json,
+    EXPORT_NDJSON: write_ndjson,
+    EXPORT_CSV: write_csv,
+    EXPORT_MARKDOWN: write_markdown,
+}
+
+
+def write_tasks(path, tasks, export_format=None):
+    """把任务流式写入文件，tasks可以是生成器"""
+    export_format = export_format or export_format_for_path(path)
+    writer = EXPORT_WRITERS[export_format]
+    # CSV带BOM，Excel打开时才能正确识别中文
+    encoding = 'utf-8-sig' if export_format == EXPORT_CSV else 'utf-8'
+    with open(path, 'w', encoding=encoding, newline='' if export_format == EXPORT_CSV else None) as f:
+        writer(f, tasks)
@@ -0,0 +1,97 @@
+from collections import deque
+
+
+class HistoryEntry:
+    """一次可撤销的操作：重做时依次应用的变更记录，以及撤销时依次应用的逆向记录"""
+
+    __slots__ = ("redo_records", "undo_records", "size")
+
+    def __init__(self):
+        self.redo_records = []
+        self.undo_records = []
+        self.size = 0
+
+    def record(self, record, previous=None):
+        """记下一条已提交的变更及其逆向记录，previous为变更前的任务记录"""
+        op = record["op"]
+        if op == "add":
+            task = record["task"]
+            inverse = {"op": "delete", "id": task["id"]}
+            self.size += estimate_size(task)
+        elif op == "update":
+            inverse = {"op": "update", "id": record["id"],
+                       "fields": {key: previous.get(key) for key in record["fields"]}}
+            self.size += estimate_size(record["fields"]) * 2
+        elif op == "delete":
+            inverse = {"op": "add", "task": previous}
+            self.size += estimate_size(previous)
+        else:
+            raise ValueError(f"无法撤销的变更: {op}")
+        self.redo_records.append(record)
+        self.undo_records.append(inverse)
+
+    def __bool__(self):
+        return bool(self.redo_records)
+
+    def __len__(self):
+        return len(self.redo_records)
+
+
+def estimate_size(fields):
+    """粗略估计一组字段占用的字节数：字符串按长度计算，其他值按固定开销计算"""
+    return 64 + sum(len(value) if isinstance(value, str) else 16 for value in fields.values())
+
+
+class TaskHistory:
+    """有界的撤销/重做历史
+
+    每个条目是一次用户操作（批量操作、导入算作一次），超过max_entries个条目或
+    估计占用超过max_bytes字节时丢弃最早的条目，但至少保留最近的一个条目。
+    新的操作会清空重做历史。
+    """
+
+    def __init__(self, max_entries=100, max_bytes=64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._undo = deque()
+        self._redo = []
+        self._size = 0
+
+    def push(self, entry):
+        """记录一次新的操作"""
+        if not entry:
+            return
+        self._redo = []
+        self._undo.append(entry)
+        self._size += entry.size
+        while len(self._undo) > 1 and (len(self._undo) > self.max_entries or self._size > self.max_bytes):
+            self._size -= self._undo.popleft().size
+
+    def can_undo(self):
+        return bool(self._undo)
+
+    def can_redo(self):
+        return bool(self._redo)
+
+    def pop_undo(self):
+        """取出最近一次操作用于撤销，之后可以重做"""
+        if not self._undo:
+            return None
+        entry = self._undo.pop()
+        self._size -= entry.size
+        self._redo.append(entry)
+        return entry
+
+    def pop_redo(self):
+        """取出最近一次撤销的操作用于重做，之后可以再次撤销"""
+        if not self._redo:
+            return None
+        entry = self._redo.pop()
+        self._undo.append(entry)
+        self._size += entry.size
+        return entry
+
+    def clear(self):
+        self._undo.clear()
+        self._redo = []
+        self._size = 0
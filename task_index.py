@@ -0,0 +1,271 @@
+import heapq
+import itertools
+from bisect import bisect_left, insort
+from itertools import islice
+
+from task_record import task_timestamp
+from task_schema import PRIORITY_NORMAL
+
+
+def task_priority(task):
+    """任务的优先级，缺失或无法识别的值（外部工具写入的）按普通优先级处理"""
+    try:
+        return int(task.get("priority", PRIORITY_NORMAL))
+    except (TypeError, ValueError):
+        return PRIORITY_NORMAL
+
+
+def task_overdue(task, now):
+    """未完成的任务是否已过截止时间，now为微秒时间戳"""
+    if task["is_completed"]:
+        return False
+    due = task_timestamp(task, "due_at")
+    return due is not None and due <= now
+
+
+def normalize_tags(tags):
+    """整理标签：字符串按逗号拆分，去掉两端空白、空标签和重复标签，保持原有顺序"""
+    if isinstance(tags, str):
+        tags = tags.split(",")
+    return list(dict.fromkeys(tag.strip() for tag in tags or () if isinstance(tag, str) and tag.strip()))
+
+
+# 时间缺失或无法解析的任务在时间索引中排在最早
+UNKNOWN_TIME = float("-inf")
+
+
+def _remove(keys, key):
+    index = bisect_left(keys, key)
+    if index < len(keys) and keys[index] == key:
+        del keys[index]
+
+
+def _time_or_unknown(task, field):
+    when = task_timestamp(task, field)
+    return UNKNOWN_TIME if when is None else when
+
+
+class TaskIndex:
+    """任务的二级索引，随任务的增删改增量维护
+
+    未完成的壁纸任务、每个标签和每个分类下的任务各是一个有序的排序键列表，
+    排序键为(-优先级, 序号, 任务ID)：优先级高的在前，同一优先级按显示顺序。
+    序号在任务第一次加入时分配，替换记录时保留，与任务字典的插入顺序一致。
+    created和completed按(时间, 序号, 任务ID)排序，分别包含全部任务和已完成的任务，
+    时间范围查询是两次二分查找。
+    取前N个任务只需切片，加入或移除一个任务是一次二分查找加一次列表插入/删除。
+    """
+
+    def __init__(self):
+        self.wallpaper = []
+        self.tags = {}
+        self.categories = {}
+        self.created = []
+        self.completed = []
+        # 任务ID -> (排序键, 是否显示在壁纸上, 标签元组, 分类, 创建时间键, 完成时间键)
+        self._entries = {}
+        self._sequence = itertools.count()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def _entry(task, sequence):
+        key = (-task_priority(task), sequence, task["id"])
+        on_wallpaper = not task.get("is_completed", False) and bool(task.get("show_on_wallpaper", True))
+        category = task.get("category")
+        category = category.strip() if isinstance(category, str) else ""
+        created = (_time_or_unknown(task, "created_at"), sequence, task["id"])
+        completed = None
+        if task.get("is_completed"):
+            completed = (_time_or_unknown(task, "completed_at"), sequence, task["id"])
+        return key, on_wallpaper, tuple(normalize_tags(task.get("tags"))), category, created, completed
+
+    def build(self, tasks):
+        """由全部任务整体建立索引"""
+        self._sequence = itertools.count()
+        entries = self._entries = {task["id"]: self._entry(task, next(self._sequence)) for task in tasks}
+        wallpaper = self.wallpaper = []
+        tags = self.tags = {}
+        categories = self.categories = {}
+        created = self.created = []
+        completed = self.completed = []
+        for key, on_wallpaper, task_tags, category, created_key, completed_key in entries.values():
+            if on_wallpaper:
+                wallpaper.append(key)
+            for tag in task_tags:
+                tags.setdefault(tag, []).append(key)
+            if category:
+                categories.setdefault(category, []).append(key)
+            created.append(created_key)
+            if completed_key is not None:
+                completed.append(completed_key)
+        wallpaper.sort()
+        created.sort()
+        completed.sort()
+        for keys in tags.values():
+            keys.sort()
+        for keys in categories.values():
+            keys.sort()
+
+    def put(self, task):
+        """加入或更新一个任务，不影响索引的修改（标题、内容等）直接跳过"""
+        old = self._entries.get(task["id"])
+        entry = self._entry(task, next(self._sequence) if old is None else old[0][1])
+        if old == entry:
+            return
+        if old is not None:
+            self._unlink(old)
+        self._entries[task["id"]] = entry
+        key, on_wallpaper, task_tags, category, created_key, completed_key = entry
+        if on_wallpaper:
+            insort(self.wallpaper, key)
+        for tag in task_tags:
+            insort(self.tags.setdefault(tag, []), key)
+        if category:
+            insort(self.categories.setdefault(category, []), key)
+        insort(self.created, created_key)
+        if completed_key is not None:
+            insort(self.completed, completed_key)
+
+    def discard(self, task_id):
+        """移除一个任务，不存在时忽略"""
+        entry = self._entries.pop(task_id, None)
+        if entry is not None:
+            self._unlink(entry)
+
+    def _unlink(self, entry):
+        key, on_wallpaper, task_tags, category, created_key, completed_key = entry
+        if on_wallpaper:
+            _remove(self.wallpaper, key)
+        for tag in task_tags:
+            self._remove_grouped(self.tags, tag, key)
+        if category:
+            self._remove_grouped(self.categories, category, key)
+        _remove(self.created, created_key)
+        if completed_key is not None:
+            _remove(self.completed, completed_key)
+
+    @staticmethod
+    def _remove_grouped(groups, name, key):
+        keys = groups.get(name)
+        if keys is not None:
+            _remove(keys, key)
+            if not keys:
+                del groups[name]
+
+    def top_wallpaper(self, limit=None):
+        """按优先级排列的未完成壁纸任务ID，最多limit个"""
+        return [key[2] for key in self.wallpaper[:limit]]
+
+    def with_tag(self, tag, limit=None):
+        """带有指定标签的任务ID，按优先级排列"""
+        return [key[2] for key in self.tags.get(tag, ())[:limit]]
+
+    def in_category(self, category, limit=None):
+        """属于指定分类的任务ID，按优先级排列"""
+        return [key[2] for key in self.categories.get(category, ())[:limit]]
+
+    @staticmethod
+    def _bounds(keys, start, end):
+        # [start, end)对应的下标范围，边界为None表示不限
+        low = 0 if start is None else bisect_left(keys, (start,))
+        high = len(keys) if end is None else bisect_left(keys, (end,))
+        return low, max(low, high)
+
+    @classmethod
+    def _time_range(cls, keys, start, end, offset, limit, newest_first):
+        low, high = cls._bounds(keys, start, end)
+        if newest_first:
+            selected = islice(reversed(range(low, high)), offset, None if limit is None else offset + limit)
+        else:
+            selected = range(low + offset, high if limit is None else min(high, low + offset + limit))
+        return [keys[index][2] for index in selected]
+
+    def created_range(self, start=None, end=None, offset=0, limit=None, newest_first=False):
+        """创建时间在[start, end)内的任务ID，按创建时间排列，offset和limit用于分页"""
+        return self._time_range(self.created, start, end, offset, limit, newest_first)
+
+    def completed_range(self, start=None, end=None, offset=0, limit=None, newest_first=False):
+        """完成时间在[start, end)内的已完成任务ID，按完成时间排列，offset和limit用于分页"""
+        return self._time_range(self.completed, start, end, offset, limit, newest_first)
+
+    def created_count(self, start=None, end=None):
+        """创建时间在[start, end)内的任务数"""
+        low, high = self._bounds(self.created, start, end)
+        return high - low
+
+    def completed_count(self, start=None, end=None):
+        """完成时间在[start, end)内的已完成任务数"""
+        low, high = self._bounds(self.completed, start, end)
+        return high - low
+
+    def tag_counts(self):
+        """每个标签下的任务数"""
+        return {tag: len(keys) for tag, keys in self.tags.items()}
+
+    def category_counts(self):
+        """每个分类下的任务数"""
+        return {category: len(keys) for category, keys in self.categories.items()}
+
+
+class DeadlineQueue:
+    """按时间排列的任务事件（到期、提醒等）最小堆
+
+    每个任务的每种事件最多有一个有效时间，记在_times中。修改或移除事件时不在堆中
+    查找旧条目，只更新_times，旧条目弹出到堆顶时因与_times不一致而被丢弃。
+    因此安排、修改、取消一个事件都是O(log n)；失效条目多于有效条目时整体重建一次。
+    """
+
+    def __init__(self):
+        self._heap = []
+        # (任务ID, 事件类型) -> 时间（微秒）
+        self._times = {}
+
+    def __len__(self):
+        return len(self._times)
+
+    def build(self, events):
+        """由(时间, 任务ID, 事件类型)序列整体建立"""
+        self._times = {(task_id, kind): when for when, task_id, kind in events}
+        self._rebuild()
+
+    def _rebuild(self):
+        self._heap = [(when, task_id, kind) for (task_id, kind), when in self._times.items()]
+        heapq.heapify(self._heap)
+
+    def set(self, task_id, kind, when):
+        """安排或修改一个事件的时间，when为None时取消该事件"""
+        key = (task_id, kind)
+        if self._times.get(key) == when:
+            return
+        if when is None:
+            del self._times[key]
+        else:
+            self._times[key] = when
+            heapq.heappush(self._heap, (when, task_id, kind))
+        if len(self._heap) > 2 * len(self._times) + 64:
+            self._rebuild()
+
+    def _valid(self, entry):
+        when, task_id, kind = entry
+        return self._times.get((task_id, kind)) == when
+
+    def next_time(self):
+        """最近一个事件的时间，没有事件时返回None"""
+        heap = self._heap
+        while heap and not self._valid(heap[0]):
+            heapq.heappop(heap)
+        return heap[0][0] if heap else None
+
+    def pop_due(self, now):
+        """取出时间不晚于now的全部事件，返回(任务ID, 事件类型)列表"""
+        heap = self._heap
+        due = []
+        while heap and heap[0][0] <= now:
+            entry = heapq.heappop(heap)
+            if self._valid(entry):
+                _, task_id, kind = entry
+                del self._times[(task_id, kind)]
+                due.append((task_id, kind))
+        return due
@@ -1,23 +1,175 @@
 import os
-import json
 import uuid
-from datetime import datetime
+import itertools
+from collections.abc import Mapping
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from task_storage import TaskArchive, create_storage, iter_json_tasks
+from task_export import EXPORT_ALL, EXPORT_ACTIVE, EXPORT_WALLPAPER, write_tasks
+from task_history import HistoryEntry, TaskHistory
+from task_index import TaskIndex, normalize_tags
+from task_record import Task, parse_timestamp, task_timestamp
+from task_schema import SCHEMA_VERSION, PRIORITY_NORMAL, migrate_tasks
+from task_search import SearchIndexBuild, TaskSearchIndex
+
+# 导入任务时ID冲突的处理策略
+IMPORT_NEWEST = "newest"          # 以修改时间较新的为准
+IMPORT_KEEP_LOCAL = "keep_local"  # 保留本地任务
+IMPORT_KEEP_IMPORTED = "keep_imported"  # 使用导入的任务
+
+# 导入时每处理多少个任务报告一次进度
+IMPORT_PROGRESS_INTERVAL = 500
+
+class ImportCancelled(Exception):
+    """导入被用户取消"""
+
+class ChangeSet:
+    """一次变更通知携带的变更集
+    
+    added: 新增任务ID -> 新任务记录
+    updated: 更新任务ID -> 变更的字段名集合
+    removed: 删除任务ID -> 删除前的任务记录
+    previous: 更新任务ID -> 变更前的任务记录
+    reset为True表示任务被整体替换（导入、切换存储位置等），接收者应视为全部变更。
+    """
+    
+    def __init__(self, reset=False):
+        self.added = {}
+        self.updated = {}
+        self.removed = {}
+        self.previous = {}
+        self.reset = reset
+    
+    def record(self, record, previous=None):
+        """把一条变更记录合并进变更集"""
+        op = record.get("op")
+        if op == "add":
+            task = record["task"]
+            self.added[task["id"]] = task
+        elif op == "update":
+            task_id = record["id"]
+            if task_id in self.added:
+                # 同一批次内新增后又修改，对接收者而言仍然只是新增
+                self.added[task_id] = {**self.added[task_id], **record["fields"]}
+                return
+            self.updated.setdefault(task_id, set()).update(record["fields"])
+            self.previous.setdefault(task_id, previous)
+        elif op == "delete":
+            task_id = record["id"]
+            if self.added.pop(task_id, None) is not None:
+                return
+            self.updated.pop(task_id, None)
+            self.removed[task_id] = self.previous.pop(task_id, previous)
+        elif op == "reset":
+            self.reset = True
+    
+    def __bool__(self):
+        return bool(self.reset or self.added or self.updated or self.removed)
+    
+    def __repr__(self):
+        return (f"ChangeSet(added={list(self.added)}, updated={self.updated}, "
+                f"removed={list(self.removed)}, reset={self.reset})")
+
+class TaskSnapshot(Mapping):
+    """某一版本全部常驻任务的只读视图（任务ID -> 任务记录，按显示顺序）
+    
+    任务记录本身不会被原地修改，快照只需保存记录的引用：每个版本第一次读取时
+    生成一次任务元组，之后同一版本的读取都共用它，修改任务只是让TaskManager进入
+    新版本，不影响已经交出的快照。因此快照可以交给后台线程读取而无需加锁。
+    version单调递增，内容不同的快照版本号一定不同，可以作为渲染缓存的键。
+    """
+    
+    __slots__ = ("version", "tasks", "_by_id")
+    
+    def __init__(self, tasks, version):
+        self.version = version
+        # 按显示顺序排列的任务元组
+        self.tasks = tuple(tasks)
+        self._by_id = None
+    
+    def _index(self):
+        # 按ID查找时才建立映射
+        if self._by_id is None:
+            self._by_id = {task["id"]: task for task in self.tasks}
+        return self._by_id
+    
+    def __getitem__(self, task_id):
+        return self._index()[task_id]
+    
+    def __contains__(self, task_id):
+        return task_id in self._index()
+    
+    def __iter__(self):
+        return (task["id"] for task in self.tasks)
+    
+    def __len__(self):
+        return len(self.tasks)
+    
+    def __repr__(self):
+        return f"TaskSnapshot(version={self.version}, tasks={len(self.tasks)})"
 
 class TaskManager:
-    def __init__(self):
+    def __init__(self, data_path=None, journal_mode=False, save_delay=0.5, lazy_content=False,
+                 archive_days=None, undo_limit=100, undo_bytes=64 * 1024 * 1024):
         """初始化任务管理器"""
         # 任务数据存储路径
-        self.data_path = os.path.join(os.environ['LOCALAPPDATA'], 'WallpaperTasks', 'tasks.json')
+        self.data_path = data_path or os.path.join(os.environ['LOCALAPPDATA'], 'WallpaperTasks', 'tasks.json')
         os.makedirs(os.path.dirname(self.data_path), exist_ok=True)
         
-        # 加载任务
-        self.tasks = self._load_tasks()
+        # 存储后端，按文件扩展名选择；日志模式下每次变更只追加一条记录，
+        # 否则由后台线程在save_delay秒的窗口内合并写入。
+        # lazy_content为True且存储支持时，内存中只保留任务元数据，内容按需读取
+        self.journal_mode = journal_mode
+        self.save_delay = save_delay
+        self.lazy_content = lazy_content
+        self.storage = create_storage(self.data_path, journal_mode, save_delay, lazy_content)
+        
+        # 加载任务：以ID为键的有序字典，保持插入（显示）顺序，查找/更新/删除均为O(1)
+        self.tasks = {task["id"]: task for task in self._load_tasks()}
+        
+        # 只读快照：version在每次修改任务时递增，_snapshot缓存当前版本的快照
+        self._versions = itertools.count(1)
+        self.version = 0
+        self._snapshot = None
+        
+        # 标签、分类和壁纸任务优先级顺序的二级索引，第一次查询时建立，
+        # 之后随每个任务记录的加入、替换、移除增量维护
+        self._task_index = None
+        
+        if self.storage.has_pending() or self.storage.schema_version < SCHEMA_VERSION:
+            # 把上次运行遗留的日志折叠进快照；旧版本的数据升级后写回一次
+            self._save_tasks()
         
         # 更改通知回调
         self.on_changed_callbacks = []
+        
+        # 全文搜索索引，第一次搜索时建立，之后随变更增量维护
+        self._search_index = None
+        # 正在后台建立的搜索索引，以及建立期间发生、安装索引时需要补上的变更集
+        self._search_build = None
+        self._search_pending = []
+        # 存档任务的搜索索引：(存档, 存档版本, SearchIndexBuild)，存档变化后重新建立
+        self._archive_search = None
+        
+        # 批量变更状态
+        self._batch_depth = 0
+        self._batch_records = []
+        self._batch_changes = None
+        self._batch_snapshot = None
+        self._batch_history = None
+        
+        # 撤销/重做历史，最多undo_limit次操作、估计占用不超过undo_bytes字节
+        self.history = TaskHistory(undo_limit, undo_bytes)
+        
+        # 冷存档：完成超过archive_days天的任务移出常驻任务，只在查看已完成任务时读取
+        self.archive_days = archive_days
+        self.archive = TaskArchive.for_data_path(self.data_path)
+        if archive_days:
+            self.archive_completed(archive_days)
     
     def add_change_listener(self, callback):
-        """添加任务变更监听器"""
+        """添加任务变更监听器，监听器以ChangeSet为参数被调用"""
         if callback not in self.on_changed_callbacks:
             self.on_changed_callbacks.append(callback)
     
@@ -26,145 +178,777 @@ class TaskManager:
         if callback in self.on_changed_callbacks:
             self.on_changed_callbacks.remove(callback)
     
-    def _notify_changed(self):
-        """通知所有监听器任务已变更"""
+    def _notify_changed(self, changes):
+        """把变更集通知给所有监听器"""
+        if self._search_index is not None:
+            self._update_search_index(changes)
+        elif self._search_build is not None:
+            self._search_pending.append(changes)
         for callback in self.on_changed_callbacks:
             try:
-                callback()
+                callback(changes)
             except Exception as e:
                 print(f"通知任务变更出错: {e}")
     
-    def _load_tasks(self):
-        """从文件加载任务"""
-        if os.path.exists(self.data_path):
+    def _update_search_index(self, changes):
+        """按变更集增量更新搜索索引"""
+        if changes.reset:
+            # 整体替换后在下次搜索时重建
+            self._search_index = None
+            return
+        index = self._search_index
+        for task_id in changes.removed:
+            index.remove(task_id)
+        for task_id, task in changes.added.items():
+            index.add(task_id, task.get("title", ""), self.get_task_content(task_id))
+        for task_id, fields in changes.updated.items():
+            task = self.tasks.get(task_id)
+            if task is None:
+                continue
+            if "title" in fields or "content" in fields:
+                index.update(task_id,
+                             title=task.get("title", "") if "title" in fields else None,
+                             content=self.get_task_content(task_id) if "content" in fields else None)
+    
+    def prepare_search_index(self, on_ready=None):
+        """在后台线程中建立搜索索引，不阻塞调用者
+        
+        索引由当前版本的快照建立，未驻留内存的内容也在后台线程中读取。建立完成后
+        调用on_ready（在后台线程中调用，界面应转到GUI线程处理），之后
+        search_index_ready()返回True。索引已经存在或正在建立时什么也不做。
+        """
+        if self._search_index is not None or self._search_build is not None:
+            return
+        storage = self.storage
+        
+        def content(task):
+            if "content" in task:
+                return task["content"]
             try:
-                with open(self.data_path, 'r', encoding='utf-8') as f:
-                    tasks = json.load(f)
-                    
-                    # 兼容旧数据，添加标题字段和显示字段
-                    for task in tasks:
-                        if "title" not in task:
-                            # 使用内容的第一行作为标题
-                            first_line = task["content"].split('\n')[0]
-                            task["title"] = first_line[:50]  # 限制标题长度
-                        
-                        # 添加显示在壁纸上的标记，默认为True
-                        if "show_on_wallpaper" not in task:
-                            task["show_on_wallpaper"] = True
-                    
-                    return tasks
+                return storage.load_content(task["id"])
             except Exception as e:
-                print(f"加载任务数据出错: {e}")
-                return []
-        else:
+                print(f"读取任务内容出错: {e}")
+                return ""
+        
+        documents = ((task["id"], task.get("title", ""), content(task)) for task in self.snapshot().tasks)
+        self._search_pending = []
+        self._search_build = SearchIndexBuild(documents, on_ready)
+    
+    def search_index_ready(self):
+        """搜索索引是否可以立即使用（后台建立完成时在此接管）"""
+        if self._search_index is None and self._search_build is not None and self._search_build.done():
+            self._install_search_index()
+        return self._search_index is not None
+    
+    def _install_search_index(self):
+        """等待后台建立的索引，补上建立期间的变更后开始使用"""
+        build, self._search_build = self._search_build, None
+        pending, self._search_pending = self._search_pending, []
+        self._search_index = build.wait()
+        for changes in pending:
+            if self._search_index is None:
+                break
+            self._update_search_index(changes)
+    
+    def prepare_archive_search_index(self, on_ready=None):
+        """在后台线程中为存档中的任务建立搜索索引（会读取存档），完成后调用on_ready
+        
+        存档中的任务不会被修改，只在存档变化（归档、移回常驻任务）后重新建立。
+        """
+        key = (self.archive, self.archive.version)
+        if self._archive_search is not None and self._archive_search[:2] == key:
+            return
+        # 存档任务带有内容，在当前线程取出需要的字段，后台线程只读这个列表
+        documents = [(task["id"], task.get("title", ""), task.get("content", ""))
+                     for task in self.get_archived_tasks()]
+        self._archive_search = key + (SearchIndexBuild(documents, on_ready),)
+    
+    def archive_search_index_ready(self):
+        """存档任务的搜索索引是否可以立即使用"""
+        return (self._archive_search is not None
+                and self._archive_search[:2] == (self.archive, self.archive.version)
+                and self._archive_search[2].done())
+    
+    def search_archived_tasks(self, query, limit=None):
+        """全文搜索存档中的任务，返回按相关度排序的任务ID；索引未建好时等待它建好"""
+        self.prepare_archive_search_index()
+        index = self._archive_search[2].wait()
+        return index.search(query, limit) if index is not None else []
+    
+    def search_tasks(self, query, limit=None):
+        """全文搜索任务标题和内容，返回按相关度排序的任务ID
+        
+        多个查询词之间是“与”的关系，最后一个词和以*结尾的词按前缀匹配。
+        索引尚未建立时在当前线程中建立（正在后台建立时等待它完成），界面中应先用
+        prepare_search_index()在后台建立，search_index_ready()之后再调用。
+        """
+        if self._search_index is None and self._search_build is not None:
+            self._install_search_index()
+        if self._search_index is None:
+            self._search_index = TaskSearchIndex()
+            self._search_index.build(
+                (task_id, task.get("title", ""), self.get_task_content(task_id))
+                for task_id, task in self.tasks.items())
+        return self._search_index.search(query, limit)
+    
+    def snapshot(self):
+        """获取当前版本的只读快照，同一版本多次获取返回同一个对象
+        
+        快照应在拥有TaskManager的线程（GUI线程）中获取，之后可以交给任何线程读取。
+        """
+        if self._snapshot is None:
+            self._snapshot = TaskSnapshot(self.tasks.values(), self.version)
+        return self._snapshot
+    
+    def _begin_write(self):
+        """修改self.tasks之前调用：进入新版本，当前快照不再代表最新状态"""
+        self.version = next(self._versions)
+        self._snapshot = None
+    
+    def _put_task(self, task):
+        """加入或替换一个任务记录"""
+        self._begin_write()
+        self.tasks[task["id"]] = task
+        if self._task_index is not None:
+            self._task_index.put(task)
+        return task
+    
+    def _pop_task(self, task_id):
+        """移除一个任务记录，不存在时返回None"""
+        if task_id not in self.tasks:
+            return None
+        self._begin_write()
+        if self._task_index is not None:
+            self._task_index.discard(task_id)
+        return self.tasks.pop(task_id)
+    
+    def _replace_tasks(self, tasks):
+        """整体替换任务字典"""
+        self._begin_write()
+        self.tasks = tasks
+        # 在下次查询时重建二级索引
+        self._task_index = None
+    
+    def _secondary_index(self):
+        """获取二级索引，尚未建立时由全部常驻任务建立"""
+        if self._task_index is None:
+            self._task_index = TaskIndex()
+            self._task_index.build(self.tasks.values())
+        return self._task_index
+    
+    def _load_tasks(self):
+        """从存储加载任务"""
+        try:
+            tasks = self.storage.load()
+        except Exception as e:
+            print(f"加载任务数据出错: {e}")
             return []
+        
+        # 旧版本的数据文件在这里一次性升级，当前版本的数据不做任何逐条处理
+        migrate_tasks(tasks, self.storage.schema_version)
+        return [Task.from_dict(task) for task in tasks]
+    
+    def get_task_content(self, task_id):
+        """获取任务内容，内容未驻留内存时从存储读取"""
+        task = self.tasks.get(task_id)
+        if task is None:
+            return ""
+        if "content" in task:
+            return task["content"]
+        try:
+            return self.storage.load_content(task_id)
+        except Exception as e:
+            print(f"读取任务内容出错: {e}")
+            return ""
+    
+    def _with_content(self, task):
+        """返回带有内容字段的任务记录"""
+        if "content" in task:
+            return task
+        return {**task, "content": self.get_task_content(task["id"])}
     
     def _save_tasks(self):
-        """保存任务到文件"""
+        """保存全部任务到存储"""
         try:
-            with open(self.data_path, 'w', encoding='utf-8') as f:
-                json.dump(self.tasks, f, ensure_ascii=False, indent=2)
+            self.storage.save(self.tasks.values())
         except Exception as e:
             print(f"保存任务数据出错: {e}")
     
+    def _persist(self, records):
+        """持久化一组变更"""
+        try:
+            self.storage.apply(records, self.tasks.values())
+        except Exception as e:
+            print(f"保存任务数据出错: {e}")
+            return
+        if not self.archive.has_discarded():
+            return
+        try:
+            # 移回常驻任务的存档任务写入数据文件之后，才从存档文件中删除；后台保存
+            # 模式下apply只是安排写入，需要先等它完成，写入失败时留到下次再删除
+            if self.storage.flush():
+                self.archive.flush()
+        except Exception as e:
+            print(f"保存任务存档出错: {e}")
+    
+    def _commit(self, record, previous=None, undoable=True):
+        """提交一次变更：批量模式下先暂存，否则立即持久化并通知
+        
+        previous为更新或删除前的任务记录，随变更集一起通知给监听器。
+        undoable为False的变更（归档、撤销/重做本身）不记入撤销历史。
+        """
+        if undoable:
+            # 必须在持久化之前取得旧内容，按需加载模式下之后就读不到了
+            history_previous = self._history_previous(record, previous)
+        if self._batch_depth:
+            self._batch_records.append(record)
+            self._batch_changes.record(record, previous)
+            if undoable:
+                self._batch_history.record(record, history_previous)
+            return
+        self._persist([record])
+        if undoable:
+            entry = HistoryEntry()
+            entry.record(record, history_previous)
+            self.history.push(entry)
+        changes = ChangeSet()
+        changes.record(record, previous)
+        self._notify_changed(changes)
+    
+    def _history_previous(self, record, previous):
+        """撤销需要的旧记录：内容未驻留内存时从存储读取"""
+        if previous is None or "content" in previous:
+            return previous
+        if record["op"] == "delete" or "content" in record.get("fields", ()):
+            try:
+                return {**previous, "content": self.storage.load_content(previous["id"])}
+            except Exception as e:
+                print(f"读取任务内容出错: {e}")
+        return previous
+    
+    def can_undo(self):
+        return self.history.can_undo()
+    
+    def can_redo(self):
+        return self.history.can_redo()
+    
+    def undo(self):
+        """撤销最近一次操作，整个操作只保存一次、通知一次，返回是否撤销了操作"""
+        entry = self.history.pop_undo()
+        if entry is None:
+            return False
+        try:
+            self._replay(reversed(entry.undo_records))
+        except Exception as e:
+            print(f"撤销操作出错: {e}")
+            self.history.pop_redo()
+            return False
+        return True
+    
+    def redo(self):
+        """重做最近一次撤销的操作，返回是否重做了操作"""
+        entry = self.history.pop_redo()
+        if entry is None:
+            return False
+        try:
+            self._replay(entry.redo_records)
+        except Exception as e:
+            print(f"重做操作出错: {e}")
+            self.history.pop_undo()
+            return False
+        return True
+    
+    def _replay(self, records):
+        """在一个批量中应用撤销/重做记录，已不存在的任务（被外部删除或已归档）跳过"""
+        with self.batch():
+            for record in records:
+                op = record["op"]
+                if op == "add":
+                    task = self._put_task(Task.from_dict(record["task"]))
+                    self._commit({"op": "add", "task": task}, undoable=False)
+                elif op == "update":
+                    current = self.tasks.get(record["id"])
+                    if current is not None:
+                        self._put_task(current.replace(record["fields"]))
+                        self._commit(record, previous=current, undoable=False)
+                elif op == "delete":
+                    current = self._pop_task(record["id"])
+                    if current is not None:
+                        self._commit(record, previous=current, undoable=False)
+    
+    def in_batch(self):
+        """是否处于批量变更中：块内的变更尚未保存，还可能被回滚"""
+        return self._batch_depth > 0
+    
+    @contextmanager
+    def batch(self):
+        """批量变更：块内的变更只作用于内存，退出时统一保存一次、通知一次
+        
+        块内抛出异常时回滚到最外层batch开始时的状态，不保存也不通知。
+        """
+        if self._batch_depth == 0:
+            self._batch_records = []
+            self._batch_changes = ChangeSet()
+            self._batch_history = HistoryEntry()
+            # 任务记录不会被原地修改，保存ID映射的浅拷贝即可用于回滚
+            self._batch_snapshot = (dict(self.tasks), self.version, self._snapshot)
+        self._batch_depth += 1
+        try:
+            yield self
+        except BaseException:
+            self._batch_depth -= 1
+            if self._batch_depth == 0:
+                self._rollback_batch()
+            raise
+        
+        self._batch_depth -= 1
+        if self._batch_depth == 0:
+            records = self._batch_records
+            changes = self._batch_changes
+            history = self._batch_history
+            self._batch_records = []
+            self._batch_changes = None
+            self._batch_snapshot = None
+            self._batch_history = None
+            if records:
+                self._persist(records)
+                # 整个批量（例如一次导入）作为一次操作撤销
+                self.history.push(history)
+                self._notify_changed(changes)
+    
+    def _rollback_batch(self):
+        """撤销批量模式下在内存中做的全部变更"""
+        # 版本号随内容一起恢复，内容与版本号仍然一一对应
+        self.tasks, self.version, self._snapshot = self._batch_snapshot
+        self._task_index = None
+        self.archive.undiscard()
+        self._batch_records = []
+        self._batch_changes = None
+        self._batch_snapshot = None
+        self._batch_history = None
+    
+    def apply_external_changes(self, signature, external_tasks):
+        """合并外部工具（编辑器、同步盘等）对数据文件的修改
+        
+        以存储记录的上次读写磁盘时的任务为基准，只把外部实际改动的任务和字段
+        合并进内存：外部修改的字段覆盖本地，本地尚未保存的其他变更保留。
+        变更只通知一次，返回变更集。external_tasks应已升级到当前数据格式版本。
+        """
+        _, base_tasks = self.storage.disk_state
+        base = {task["id"]: task for task in base_tasks}
+        external = {task["id"]: task for task in external_tasks}
+        
+        changes = ChangeSet()
+        for task_id, task in external.items():
+            old = base.get(task_id)
+            if old == task:
+                continue
+            current = self.tasks.get(task_id)
+            if current is None:
+                if old is None:
+                    task = self._put_task(Task.from_dict(task))
+                    changes.record({"op": "add", "task": task})
+                # 基准中有而内存中没有：本地已删除，不再恢复
+                continue
+            old = old or {}
+            fields = {key: value for key, value in task.items()
+                      if old.get(key) != value and current.get(key) != value}
+            if fields:
+                self._put_task(current.replace(fields))
+                changes.record({"op": "update", "id": task_id, "fields": fields}, previous=current)
+        for task_id in base:
+            if task_id not in external:
+                current = self._pop_task(task_id)
+                if current is not None:
+                    changes.record({"op": "delete", "id": task_id}, previous=current)
+        
+        modified = len(self.tasks) != len(external) or any(
+            external.get(task_id) != task for task_id, task in self.tasks.items())
+        try:
+            self.storage.accept_external(signature, external_tasks, self.tasks.values(), modified)
+        except Exception as e:
+            print(f"保存任务数据出错: {e}")
+        if changes:
+            self._notify_changed(changes)
+        return changes
+    
+    def close(self):
+        """关闭任务管理器，确保数据已写入磁盘"""
+        try:
+            self.storage.close()
+        except Exception as e:
+            print(f"关闭任务存储出错: {e}")
+    
+    def get_storage_metrics(self):
+        """存储层的统计信息，例如后台保存的写入次数与等待时间"""
+        return self.storage.metrics()
+    
     def get_all_tasks(self):
-        """获取所有任务"""
-        return self.tasks.copy()
+        """获取所有任务（按显示顺序）的只读元组，同一版本内多次调用不会复制"""
+        return self.snapshot().tasks
+    
+    def get_task(self, task_id):
+        """按ID获取任务，存档已读入时也查找存档，不存在时返回None"""
+        task = self.tasks.get(task_id)
+        if task is None:
+            task = self.archive.get(task_id)
+        return task
+    
+    def _query_tasks(self, is_completed=None, show_on_wallpaper=None):
+        """按完成状态和壁纸显示标记筛选任务，存储支持时直接走索引查询"""
+        if self.storage.supports_query:
+            try:
+                return self.storage.query(is_completed=is_completed, show_on_wallpaper=show_on_wallpaper)
+            except Exception as e:
+                print(f"查询任务出错: {e}")
+        return [task for task in self.get_all_tasks()
+                if (is_completed is None or task["is_completed"] == is_completed)
+                and (show_on_wallpaper is None or task.get("show_on_wallpaper", True) == show_on_wallpaper)]
+    
+    def get_active_tasks(self):
+        """获取未完成的任务"""
+        return self._query_tasks(is_completed=False)
     
-    def add_task(self, title, content=""):
-        """添加新任务"""
-        task = {
+    def get_completed_tasks(self, include_archived=False):
+        """获取已完成的任务，include_archived为True时包括存档中的任务（会读取存档）"""
+        tasks = self._query_tasks(is_completed=True)
+        if include_archived:
+            tasks.extend(self.get_archived_tasks())
+        return tasks
+    
+    def get_archived_tasks(self):
+        """获取存档中的任务"""
+        try:
+            archived = self.archive.load()
+        except Exception as e:
+            print(f"读取任务存档出错: {e}")
+            return []
+        # 归档过程中断时任务可能同时在两处，以常驻任务为准
+        return [task for task_id, task in archived.items() if task_id not in self.tasks]
+    
+    def archive_completed(self, days=None):
+        """把完成超过days天的任务移入存档，返回移动的任务数"""
+        days = days if days is not None else self.archive_days
+        if not days:
+            return 0
+        cutoff = (datetime.now() - timedelta(days=days)).isoformat()
+        tasks = [task for task in self.tasks.values()
+                 if task["is_completed"] and (task.get("completed_at") or "") < cutoff]
+        if not tasks:
+            return 0
+        try:
+            # 先写存档再从常驻任务中删除，中途出错时任务不会丢失
+            self.archive.append(self._with_content(task) for task in tasks)
+        except Exception as e:
+            print(f"写入任务存档出错: {e}")
+            return 0
+        with self.batch():
+            for task in tasks:
+                self._pop_task(task["id"])
+                # 归档不是用户操作，不记入撤销历史
+                self._commit({"op": "delete", "id": task["id"]}, previous=task, undoable=False)
+        return len(tasks)
+    
+    def _restore_archived(self, task_id):
+        """把存档中的任务移回常驻任务，任务不在存档中时返回None"""
+        task = self.archive.discard(task_id)
+        if task is not None:
+            task = self._put_task(Task.from_dict(task))
+            # 移回只是换了存放位置，撤销随后的修改时任务留在常驻任务中
+            self._commit({"op": "add", "task": task}, undoable=False)
+        return task
+    
+    def get_wallpaper_tasks(self, limit=None):
+        """获取需要显示在壁纸上的未完成任务，按优先级从高到低排列（同一优先级按创建先后）
+        
+        走二级索引，limit限制最多返回的任务数，只取前几个任务时不需要遍历全部任务。
+        """
+        return [self.tasks[task_id] for task_id in self._secondary_index().top_wallpaper(limit)]
+    
+    def get_tasks_by_tag(self, tag, limit=None):
+        """获取带有指定标签的常驻任务，按优先级排列"""
+        return [self.tasks[task_id] for task_id in self._secondary_index().with_tag(tag, limit)]
+    
+    def get_tasks_by_category(self, category, limit=None):
+        """获取属于指定分类的常驻任务，按优先级排列"""
+        return [self.tasks[task_id] for task_id in self._secondary_index().in_category(category, limit)]
+    
+    def get_tags(self):
+        """所有标签及各自的任务数"""
+        return self._secondary_index().tag_counts()
+    
+    def get_categories(self):
+        """所有分类及各自的任务数"""
+        return self._secondary_index().category_counts()
+    
+    @staticmethod
+    def _time_bound(value):
+        """时间范围的边界：datetime、ISO字符串或None（不限）"""
+        if value is None:
+            return None
+        when = parse_timestamp(value)
+        if when is None:
+            raise ValueError(f"无法识别的时间: {value!r}")
+        return when
+    
+    def get_tasks_created_between(self, start=None, end=None, offset=0, limit=None, newest_first=False):
+        """获取创建时间在[start, end)内的常驻任务，按创建时间排列
+        
+        start和end可以是datetime或ISO字符串，None表示不限；offset和limit用于分页。
+        走排序的时间索引，不需要解析每个任务的时间。
+        """
+        ids = self._secondary_index().created_range(self._time_bound(start), self._time_bound(end),
+                                                    offset, limit, newest_first)
+        return [self.tasks[task_id] for task_id in ids]
+    
+    def get_tasks_completed_between(self, start=None, end=None, offset=0, limit=None, newest_first=True):
+        """获取完成时间在[start, end)内的常驻任务，默认最近完成的在前，参数同get_tasks_created_between"""
+        ids = self._secondary_index().completed_range(self._time_bound(start), self._time_bound(end),
+                                                      offset, limit, newest_first)
+        return [self.tasks[task_id] for task_id in ids]
+    
+    def count_tasks_created_between(self, start=None, end=None):
+        """创建时间在[start, end)内的常驻任务数"""
+        return self._secondary_index().created_count(self._time_bound(start), self._time_bound(end))
+    
+    def count_tasks_completed_between(self, start=None, end=None):
+        """完成时间在[start, end)内的常驻任务数"""
+        return self._secondary_index().completed_count(self._time_bound(start), self._time_bound(end))
+    
+    def get_recent_completed_tasks(self, offset=0, limit=None, include_archived=False):
+        """按完成时间从近到远分页获取已完成的任务
+        
+        常驻任务在前；include_archived为True且这一页超出常驻任务时，接着取存档中的
+        任务（这时才读取存档）。存档中的任务都是完成较早、已经归档的任务。
+        """
+        tasks = self.get_tasks_completed_between(offset=offset, limit=limit)
+        if include_archived and (limit is None or len(tasks) < limit):
+            start = max(0, offset - self.count_tasks_completed_between())
+            archived = sorted(self.get_archived_tasks(), reverse=True,
+                              key=lambda task: task_timestamp(task, "completed_at") or 0)
+            tasks.extend(archived[start:None if limit is None else start + limit - len(tasks)])
+        return tasks
+    
+    def task_count(self):
+        """任务总数"""
+        return len(self.tasks)
+    
+    @staticmethod
+    def _time_value(value):
+        """截止、提醒时间参数转换为保存的值：datetime转为ISO字符串，空字符串表示清除"""
+        if isinstance(value, datetime):
+            return value.isoformat()
+        return value or None
+    
+    def add_task(self, title, content="", priority=PRIORITY_NORMAL, tags=(), category="",
+                 due_at=None, remind_at=None):
+        """添加新任务，tags可以是标签列表或逗号分隔的字符串，due_at和remind_at可以是datetime或ISO字符串"""
+        now = datetime.now().isoformat()
+        task = Task({
             "id": str(uuid.uuid4()),
             "title": title,  # 新增标题字段
             "content": content,
             "is_completed": False,
-            "created_at": datetime.now().isoformat(),
+            "created_at": now,
             "completed_at": None,
-            "show_on_wallpaper": True  # 默认显示在壁纸上
-        }
-        self.tasks.append(task)
-        self._save_tasks()
-        self._notify_changed()
+            "show_on_wallpaper": True,  # 默认显示在壁纸上
+            "updated_at": now,
+            "priority": priority,
+            "tags": normalize_tags(tags),
+            "category": category.strip(),
+            "due_at": self._time_value(due_at),
+            "remind_at": self._time_value(remind_at)
+        })
+        self._put_task(task)
+        self._commit({"op": "add", "task": task})
         return task
     
-    def update_task(self, task_id, title=None, content=None, is_completed=None, show_on_wallpaper=None):
-        """更新任务"""
-        for task in self.tasks:
-            if task["id"] == task_id:
-                if title is not None:
-                    task["title"] = title
-                if content is not None:
-                    task["content"] = content
-                if is_completed is not None:
-                    task["is_completed"] = is_completed
-                    task["completed_at"] = datetime.now().isoformat() if is_completed else None
-                if show_on_wallpaper is not None:
-                    task["show_on_wallpaper"] = show_on_wallpaper
-                self._save_tasks()
-                self._notify_changed()
-                return True
-        return False
+    def update_task(self, task_id, title=None, content=None, is_completed=None, show_on_wallpaper=None,
+                    priority=None, tags=None, category=None, due_at=None, remind_at=None):
+        """更新任务，值为None的字段保持不变，due_at或remind_at为空字符串时清除该时间"""
+        if task_id not in self.tasks and self.archive.exists():
+            # 存档中的任务先移回常驻任务，与这次修改一起保存、通知
+            with self.batch():
+                if self._restore_archived(task_id) is None:
+                    return False
+                return self.update_task(task_id, title=title, content=content,
+                                        is_completed=is_completed, show_on_wallpaper=show_on_wallpaper,
+                                        priority=priority, tags=tags, category=category,
+                                        due_at=due_at, remind_at=remind_at)
+        
+        task = self.tasks.get(task_id)
+        if task is None:
+            return False
+        
+        fields = {}
+        if title is not None:
+            fields["title"] = title
+        if content is not None:
+            fields["content"] = content
+        if is_completed is not None:
+            fields["is_completed"] = is_completed
+            fields["completed_at"] = datetime.now().isoformat() if is_completed else None
+        if show_on_wallpaper is not None:
+            fields["show_on_wallpaper"] = show_on_wallpaper
+        if priority is not None:
+            fields["priority"] = priority
+        if tags is not None:
+            fields["tags"] = normalize_tags(tags)
+        if category is not None:
+            fields["category"] = category.strip()
+        if due_at is not None:
+            fields["due_at"] = self._time_value(due_at)
+        if remind_at is not None:
+            fields["remind_at"] = self._time_value(remind_at)
+        fields["updated_at"] = datetime.now().isoformat()
+        # 写时复制：替换整个任务记录而不是原地修改，后台保存线程和批量回滚
+        # 持有的旧记录因此保持不变
+        self._put_task(task.replace(fields))
+        self._commit({"op": "update", "id": task_id, "fields": fields}, previous=task)
+        return True
+    
+    def update_tasks(self, task_ids, title=None, content=None, is_completed=None, show_on_wallpaper=None,
+                     priority=None, tags=None, category=None, due_at=None, remind_at=None):
+        """批量更新任务，只保存一次、通知一次，返回更新的任务数"""
+        updated = 0
+        with self.batch():
+            for task_id in task_ids:
+                if self.update_task(task_id, title=title, content=content,
+                                    is_completed=is_completed, show_on_wallpaper=show_on_wallpaper,
+                                    priority=priority, tags=tags, category=category,
+                                    due_at=due_at, remind_at=remind_at):
+                    updated += 1
+        return updated
     
     def delete_task(self, task_id):
         """删除任务"""
-        original_count = len(self.tasks)
-        self.tasks = [task for task in self.tasks if task["id"] != task_id]
+        task = self._pop_task(task_id)
+        if task is None and self.archive.exists():
+            # 存档中的任务直接从存档删除
+            task = self.archive.discard(task_id)
+        if task is None:
+            return False
         
-        if len(self.tasks) < original_count:
-            self._save_tasks()
-            self._notify_changed()
-            return True
-        return False
+        self._commit({"op": "delete", "id": task_id}, previous=task)
+        return True
+    
+    def delete_tasks(self, task_ids):
+        """批量删除任务，只保存一次、通知一次，返回删除的任务数"""
+        deleted = 0
+        with self.batch():
+            for task_id in task_ids:
+                if self.delete_task(task_id):
+                    deleted += 1
+        return deleted
     
     def set_data_path(self, path):
-        """设置数据存储路径"""
+        """设置数据存储路径，存储后端由文件扩展名决定（.json / .pack / .db）"""
         if path and path != self.data_path:
             self.data_path = path
             os.makedirs(os.path.dirname(self.data_path), exist_ok=True)
+            # 新存储需要完整的任务内容，切换前从旧存储读入
+            self._replace_tasks({task_id: Task.from_dict(self._with_content(task))
+                                 for task_id, task in self.tasks.items()})
+            self.close()
+            self.storage = create_storage(self.data_path, self.journal_mode, self.save_delay, self.lazy_content)
             self._save_tasks()  # 保存现有任务到新位置
-            self._notify_changed()
+            
+            # 存档随数据文件一起移动
+            old_archive = self.archive
+            self.archive = TaskArchive.for_data_path(self.data_path)
+            if old_archive.exists() and old_archive.path != self.archive.path:
+                try:
+                    self.archive.append(old_archive.load().values())
+                except Exception as e:
+                    print(f"移动任务存档出错: {e}")
+            self._notify_changed(ChangeSet(reset=True))
     
-    def import_tasks(self, file_path):
-        """从文件导入任务"""
-        if os.path.exists(file_path):
-            try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    imported_tasks = json.load(f)
-                    
-                    # 创建任务ID映射，用于识别相同任务
-                    current_tasks_map = {task["id"]: task for task in self.tasks}
-                    
-                    # 处理导入的任务
-                    for task in imported_tasks:
-                        # 兼容旧数据，添加标题字段
-                        if "title" not in task:
-                            first_line = task["content"].split('\n')[0]
-                            task["title"] = first_line[:50]  # 限制标题长度
-                        
-                        # 如果是已存在的任务，保留其壁纸显示设置
-                        if task["id"] in current_tasks_map:
-                            task["show_on_wallpaper"] = current_tasks_map[task["id"]].get("show_on_wallpaper", True)
-                        # 对于新导入的任务，如果没有壁纸显示设置，则默认为True
-                        elif "show_on_wallpaper" not in task:
-                            task["show_on_wallpaper"] = True
-                    
-                    # 更新任务列表
-                    self.tasks = imported_tasks
-                    self._save_tasks()
-                    self._notify_changed()
-                    return True
-                
-            except Exception as e:
-                print(f"导入任务出错: {e}")
-                return False
-        return False
+    @staticmethod
+    def _modified_at(task):
+        """任务最后修改的时间，旧数据没有updated_at时取创建或完成时间"""
+        return max(filter(None, (task.get("updated_at"), task.get("completed_at"),
+                                 task.get("created_at"))), default="")
+    
+    def _merge_imported(self, task, policy):
+        """把一个导入的任务按ID合并进当前任务，返回合并结果：added、updated或skipped"""
+        if not isinstance(task, dict):
+            return "skipped"
+        if not task.get("id"):
+            task["id"] = str(uuid.uuid4())
+        # 导出文件不带版本号，按最旧的版本升级
+        migrate_tasks([task], 1)
+        
+        local = self.tasks.get(task["id"])
+        if local is None:
+            task = self._put_task(Task.from_dict(task))
+            self._commit({"op": "add", "task": task})
+            return "added"
+        
+        if policy == IMPORT_KEEP_LOCAL:
+            return "skipped"
+        if policy == IMPORT_NEWEST and self._modified_at(task) <= self._modified_at(local):
+            return "skipped"
+        # 已存在的任务保留本地的壁纸显示设置
+        fields = {key: value for key, value in task.items()
+                  if key not in ("id", "show_on_wallpaper") and local.get(key) != value}
+        if not fields:
+            return "skipped"
+        self._put_task(local.replace(fields))
+        self._commit({"op": "update", "id": task["id"], "fields": fields}, previous=local)
+        return "updated"
     
-    def export_tasks(self, file_path):
-        """导出任务到文件"""
+    def import_tasks(self, file_path, policy=IMPORT_NEWEST, progress=None):
+        """从JSON数组或NDJSON文件流式导入任务，按ID合并进现有任务
+        
+        policy决定ID冲突时保留哪一方；progress(已处理任务数, 已读取字节数, 文件字节数)
+        定期被调用，返回False时取消导入并回滚。全部任务只保存一次、通知一次。
+        成功或取消时返回统计字典（取消时cancelled为True），出错时返回False。
+        """
+        if not os.path.exists(file_path):
+            return False
+        
+        stats = {"added": 0, "updated": 0, "skipped": 0, "cancelled": False}
+        total_bytes = os.path.getsize(file_path)
+        try:
+            with self.batch():
+                count = 0
+                for task, bytes_read in iter_json_tasks(file_path):
+                    stats[self._merge_imported(task, policy)] += 1
+                    count += 1
+                    if progress is not None and count % IMPORT_PROGRESS_INTERVAL == 0:
+                        if progress(count, bytes_read, total_bytes) is False:
+                            raise ImportCancelled()
+                if progress is not None:
+                    progress(count, total_bytes, total_bytes)
+        except ImportCancelled:
+            return {"added": 0, "updated": 0, "skipped": 0, "cancelled": True}
+        except Exception as e:
+            print(f"导入任务出错: {e}")
+            return False
+        return stats
+    
+    def iter_tasks(self, scope=EXPORT_ALL):
+        """按显示顺序逐个产出带内容的任务，scope可以只取未完成或壁纸上显示的任务
+        
+        遍历的是开始时的快照，导出过程中任务被修改也不影响输出。
+        """
+        for task in self.get_all_tasks():
+            if scope == EXPORT_ACTIVE and task["is_completed"]:
+                continue
+            if scope == EXPORT_WALLPAPER and (task["is_completed"] or not task.get("show_on_wallpaper", True)):
+                continue
+            yield self._with_content(task)
+        if scope == EXPORT_ALL and self.archive.exists():
+            yield from self.get_archived_tasks()
+    
+    def export_tasks(self, file_path, export_format=None, scope=EXPORT_ALL):
+        """流式导出任务到文件
+        
+        export_format为json、ndjson、csv或markdown，省略时按文件扩展名选择。
+        """
         try:
-            with open(file_path, 'w', encoding='utf-8') as f:
-                json.dump(self.tasks, f, ensure_ascii=False, indent=2)
+            write_tasks(file_path, self.iter_tasks(scope), export_format)
             return True
         except Exception as e:
             print(f"导出任务出错: {e}")
-            return False
\ No newline at end of file
+            return False
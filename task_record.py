@@ -0,0 +1,187 @@
+from collections.abc import Mapping
+from datetime import datetime, timedelta
+
+# 整数时间戳的起点，不做时区换算，与原来的本地时间ISO字符串一一对应
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+
+
+def timestamp_to_int(value):
+    """把ISO时间字符串转换为自EPOCH起的微秒数，不能无损还原的值返回None"""
+    try:
+        moment = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+    if moment.tzinfo is not None or moment.isoformat() != value:
+        return None
+    return (moment - EPOCH) // MICROSECOND
+
+
+def int_to_timestamp(value):
+    """把微秒数还原为ISO时间字符串"""
+    return (EPOCH + value * MICROSECOND).isoformat()
+
+
+def parse_timestamp(value):
+    """把时间字符串或datetime转换为自EPOCH起的微秒数，用于比较和排序
+
+    与timestamp_to_int不同，不要求能还原为原字符串：只有日期、省略秒等写法也可以，
+    带时区的时间换算为本地时间。无法解析时返回None。
+    """
+    if isinstance(value, datetime):
+        moment = value
+    else:
+        try:
+            moment = datetime.fromisoformat(value)
+        except (TypeError, ValueError):
+            return None
+    if moment.tzinfo is not None:
+        moment = moment.astimezone().replace(tzinfo=None)
+    return (moment - EPOCH) // MICROSECOND
+
+
+def now_timestamp():
+    """当前本地时间的微秒数"""
+    return (datetime.now() - EPOCH) // MICROSECOND
+
+
+# 字段缺失的标记，区别于值为None
+_MISSING = object()
+
+
+class Task(Mapping):
+    """紧凑的任务记录
+
+    常用字段保存在__slots__中，时间字段保存为整数微秒，列表字段保存为元组，
+    其他字段放在_extra字典里。对外表现为只读的映射：task["title"]、task.get()、
+    dict(task)都与原来的字典一致，时间字段读取时还原为ISO字符串，列表字段读取时
+    返回新的列表。修改通过replace()得到新的记录。
+    """
+
+    FIELDS = ("id", "title", "content", "is_completed", "created_at", "completed_at",
+              "show_on_wallpaper", "updated_at", "priority", "tags", "category", "due_at", "remind_at")
+    TIMESTAMP_FIELDS = frozenset(("created_at", "completed_at", "updated_at", "due_at", "remind_at"))
+    LIST_FIELDS = frozenset(("tags",))
+
+    __slots__ = FIELDS + ("_extra",)
+
+    _SLOTS = frozenset(FIELDS)
+
+    def __init__(self, fields=()):
+        for name in self.FIELDS:
+            object.__setattr__(self, name, _MISSING)
+        self._extra = None
+        for key, value in dict(fields).items():
+            self._set(key, value)
+
+    @classmethod
+    def from_dict(cls, data):
+        """由字典创建任务记录，已经是Task时直接返回"""
+        if isinstance(data, cls):
+            return data
+        return cls(data)
+
+    def _set(self, key, value):
+        if key in self._SLOTS:
+            if key in self.TIMESTAMP_FIELDS and value is not None:
+                converted = timestamp_to_int(value)
+                if converted is None:
+                    # 无法无损转换的时间值（外部工具写入的其他格式）原样保存
+                    object.__setattr__(self, key, _MISSING)
+                    self._set_extra(key, value)
+                    return
+                value = converted
+            elif key in self.LIST_FIELDS and isinstance(value, list):
+                value = tuple(value)
+            object.__setattr__(self, key, value)
+            if self._extra is not None and key in self._extra:
+                self._set_extra(key, _MISSING)
+        else:
+            self._set_extra(key, value)
+
+    def _set_extra(self, key, value):
+        extra = dict(self._extra) if self._extra else {}
+        if value is _MISSING:
+            extra.pop(key, None)
+        else:
+            extra[key] = value
+        self._extra = extra or None
+
+    def replace(self, fields):
+        """返回修改了部分字段的新记录，原记录保持不变"""
+        task = Task.__new__(Task)
+        for name in self.__slots__:
+            object.__setattr__(task, name, getattr(self, name))
+        for key, value in fields.items():
+            task._set(key, value)
+        return task
+
+    def __setattr__(self, name, value):
+        if name != "_extra":
+            raise AttributeError("任务记录是只读的，请使用replace()")
+        object.__setattr__(self, name, value)
+
+    def __getitem__(self, key):
+        if key in self._SLOTS:
+            value = getattr(self, key)
+            if value is not _MISSING:
+                if key in self.TIMESTAMP_FIELDS and value is not None:
+                    return int_to_timestamp(value)
+                if key in self.LIST_FIELDS and isinstance(value, tuple):
+                    return list(value)
+                return value
+        if self._extra is not None and key in self._extra:
+            return self._extra[key]
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        # 与Mapping.get相同，但不经过__getitem__和异常处理，索引、筛选时调用很频繁
+        if key in self._SLOTS:
+            value = getattr(self, key)
+            if value is not _MISSING:
+                if value is None:
+                    return None
+                if key in self.TIMESTAMP_FIELDS:
+                    return int_to_timestamp(value)
+                if key in self.LIST_FIELDS and isinstance(value, tuple):
+                    return list(value)
+                return value
+        if self._extra is not None:
+            return self._extra.get(key, default)
+        return default
+
+    def timestamp(self, key):
+        """时间字段的微秒数，用于比较和排序，缺失、为None或无法解析时返回None"""
+        if key in self.TIMESTAMP_FIELDS:
+            value = getattr(self, key)
+            if value is not _MISSING:
+                return value
+        if self._extra is not None:
+            return parse_timestamp(self._extra.get(key))
+        return None
+
+    def __contains__(self, key):
+        if key in self._SLOTS and getattr(self, key) is not _MISSING:
+            return True
+        return self._extra is not None and key in self._extra
+
+    def __iter__(self):
+        for name in self.FIELDS:
+            if getattr(self, name) is not _MISSING:
+                yield name
+        if self._extra is not None:
+            yield from self._extra
+
+    def __len__(self):
+        count = sum(1 for name in self.FIELDS if getattr(self, name) is not _MISSING)
+        return count + (len(self._extra) if self._extra is not None else 0)
+
+    def __repr__(self):
+        return f"Task({dict(self)!r})"
+
+
+def task_timestamp(task, key):
+    """任务时间字段的微秒数，task可以是Task记录或字典（存储查询、存档返回的任务）"""
+    if isinstance(task, Task):
+        return task.timestamp(key)
+    return parse_timestamp(task.get(key))
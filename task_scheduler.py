@@ -0,0 +1,129 @@
+from PyQt6.QtCore import QObject, QTimer, Qt, pyqtSignal
+
+from task_index import DeadlineQueue
+from task_record import now_timestamp, task_timestamp
+
+# 任务事件类型
+EVENT_DUE = "due"        # 到达截止时间，任务变为逾期
+EVENT_REMIND = "remind"  # 到达提醒时间
+
+# 事件类型 -> 决定事件时间的任务字段
+EVENT_FIELDS = {EVENT_DUE: "due_at", EVENT_REMIND: "remind_at"}
+
+# 会影响事件安排的任务字段
+SCHEDULE_FIELDS = {"due_at", "remind_at", "is_completed"}
+
+
+class TaskScheduler(QObject):
+    """按任务的截止时间和提醒时间准时发出通知
+
+    尚未到来的事件放在最小堆中，只为最近的一个事件启动一个单次定时器，不做
+    周期性轮询。任务变更时只重新安排改动了时间或完成状态的任务，每次为O(log n)。
+    已完成的任务和已经过去的时间不安排事件：逾期状态在绘制时按当前时间判断。
+    """
+
+    # 单次定时的最长间隔，更远的事件到时再重新计算（也用于纠正系统时间的调整）
+    MAX_INTERVAL_MS = 6 * 60 * 60 * 1000
+    # 批量变更期间到期的事件推迟处理的间隔
+    BATCH_RETRY_MS = 500
+
+    # 到达截止时间的任务ID列表
+    due = pyqtSignal(object)
+    # 到达提醒时间的任务ID列表
+    reminded = pyqtSignal(object)
+    # 任务变更，转发到GUI线程处理
+    _changed = pyqtSignal(object)
+
+    def __init__(self, task_manager, parent=None):
+        super().__init__(parent)
+        self.task_manager = task_manager
+        self._queue = DeadlineQueue()
+        # 定时器当前对应的事件时间
+        self._armed_at = None
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setTimerType(Qt.TimerType.PreciseTimer)
+        self._timer.timeout.connect(self._fire)
+
+        # 变更可能来自后台线程，定时器只能在所属线程中操作
+        self._changed.connect(self.on_tasks_changed, Qt.ConnectionType.QueuedConnection)
+        self.task_manager.add_change_listener(self._on_changed)
+        self.reschedule_all()
+
+    def _on_changed(self, changes):
+        self._changed.emit(changes)
+
+    def _events(self, task, now):
+        """任务尚未到来的事件：(事件类型, 时间)"""
+        if task is None or task["is_completed"]:
+            return ()
+        events = []
+        for kind, field in EVENT_FIELDS.items():
+            when = task_timestamp(task, field)
+            if when is not None and when > now:
+                events.append((kind, when))
+        return events
+
+    def reschedule_all(self):
+        """按全部任务重新安排事件"""
+        now = now_timestamp()
+        self._queue.build((when, task["id"], kind)
+                          for task in self.task_manager.get_all_tasks()
+                          for kind, when in self._events(task, now))
+        self._arm()
+
+    def _reschedule(self, task_id, now):
+        events = dict(self._events(self.task_manager.tasks.get(task_id), now))
+        for kind in EVENT_FIELDS:
+            self._queue.set(task_id, kind, events.get(kind))
+
+    def on_tasks_changed(self, changes):
+        """按变更集重新安排受影响的任务"""
+        if changes.reset:
+            self.reschedule_all()
+            return
+        now = now_timestamp()
+        for task_id in changes.removed:
+            for kind in EVENT_FIELDS:
+                self._queue.set(task_id, kind, None)
+        for task_id in changes.added:
+            self._reschedule(task_id, now)
+        for task_id, fields in changes.updated.items():
+            if fields & SCHEDULE_FIELDS:
+                self._reschedule(task_id, now)
+        self._arm()
+
+    def _arm(self):
+        """为最近的事件启动定时器，最近的事件没有变化时保持原定时"""
+        when = self._queue.next_time()
+        if when is None:
+            self._timer.stop()
+            self._armed_at = None
+            return
+        if when == self._armed_at and self._timer.isActive():
+            return
+        self._armed_at = when
+        delay_ms = (when - now_timestamp()) // 1000 + 1
+        self._timer.start(max(0, min(delay_ms, self.MAX_INTERVAL_MS)))
+
+    def _fire(self):
+        if self.task_manager.in_batch():
+            # 批量变更中的任务还可能被回滚，结束后再处理
+            self._timer.start(self.BATCH_RETRY_MS)
+            return
+        self._armed_at = None
+        due = []
+        reminded = []
+        for task_id, kind in self._queue.pop_due(now_timestamp()):
+            (due if kind == EVENT_DUE else reminded).append(task_id)
+        if due:
+            self.due.emit(due)
+        if reminded:
+            self.reminded.emit(reminded)
+        self._arm()
+
+    def stop(self):
+        """停止安排事件"""
+        self._timer.stop()
+        self.task_manager.remove_change_listener(self._on_changed)
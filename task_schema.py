@@ -0,0 +1,57 @@
+# 当前的数据格式版本，没有版本号的旧数据文件视为版本1
+SCHEMA_VERSION = 4
+
+# 任务优先级，数值越大越靠前
+PRIORITY_LOW = -1
+PRIORITY_NORMAL = 0
+PRIORITY_HIGH = 1
+PRIORITY_URGENT = 2
+
+# 目标版本 -> 把任务从上一版本升级到该版本的迁移函数
+MIGRATIONS = {}
+
+
+def migration(version):
+    """注册迁移函数：原地把一个任务字典从version-1升级到version
+
+    导出文件不带版本号，导入时会从版本1开始迁移，因此迁移函数必须可以重复执行。
+    """
+    def register(func):
+        MIGRATIONS[version] = func
+        return func
+    return register
+
+
+@migration(2)
+def add_title_and_wallpaper_flag(task):
+    """版本2：每个任务都有标题（取内容的第一行）和壁纸显示标记"""
+    if "title" not in task:
+        task["title"] = task.get("content", "").split('\n')[0][:50]  # 限制标题长度
+    if "show_on_wallpaper" not in task:
+        task["show_on_wallpaper"] = True
+
+
+@migration(3)
+def add_priority_tags_and_category(task):
+    """版本3：每个任务都有优先级、标签列表和分类"""
+    task.setdefault("priority", PRIORITY_NORMAL)
+    task.setdefault("tags", [])
+    task.setdefault("category", "")
+
+
+@migration(4)
+def add_due_and_reminder(task):
+    """版本4：每个任务都有截止时间和提醒时间，未设置时为None"""
+    task.setdefault("due_at", None)
+    task.setdefault("remind_at", None)
+
+
+def migrate_tasks(tasks, version):
+    """把一组任务字典从version原地升级到当前版本，返回是否执行了迁移"""
+    steps = [MIGRATIONS[target] for target in range(version + 1, SCHEMA_VERSION + 1)]
+    if not steps:
+        return False
+    for task in tasks:
+        for step in steps:
+            step(task)
+    return True
@@ -0,0 +1,243 @@
+import re
+import sys
+import math
+import heapq
+import threading
+from operator import add
+from bisect import bisect_left, insort
+from collections import Counter
+
+# 中日韩文字按连续片段切分为二元组，其他文字按单词切分
+CJK_RANGES = "\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff"
+TOKEN_PATTERN = re.compile(f"([{CJK_RANGES}]+)|([^\\W{CJK_RANGES}]+)(\\*?)")
+
+
+def tokenize(text):
+    """把文本切分为索引词：中文取相邻两字的二元组（单字片段保留单字），拉丁文取小写单词"""
+    tokens = []
+    for cjk, word, _ in TOKEN_PATTERN.findall(text.lower()):
+        if len(cjk) > 1:
+            tokens.extend(map(add, cjk, cjk[1:]))
+        else:
+            tokens.append(cjk or word)
+    return tokens
+
+
+def query_terms(query):
+    """把查询切分为(词, 是否前缀匹配)列表
+
+    以*结尾的单词、查询末尾的单词（边输入边搜索）和单个汉字按前缀匹配。
+    """
+    matches = list(TOKEN_PATTERN.finditer(query.lower()))
+    terms = []
+    for index, match in enumerate(matches):
+        cjk, word, star = match.groups()
+        if cjk:
+            if len(cjk) == 1:
+                terms.append((cjk, True))
+            else:
+                terms.extend((cjk[i:i + 2], False) for i in range(len(cjk) - 1))
+        else:
+            terms.append((word, bool(star) or index == len(matches) - 1))
+    # 去重并保持顺序
+    return list(dict.fromkeys(terms))
+
+
+def count_tokens(text):
+    """统计文本中每个索引词出现的次数，词经过驻留以便与索引共用同一个字符串"""
+    return Counter(map(sys.intern, tokenize(text or "")))
+
+
+class TaskSearchIndex:
+    """任务标题和内容的倒排索引
+
+    postings记录每个词出现在哪些任务中及其权重（标题中的词权重更高），
+    vocabulary是排好序的词表，用于前缀查询。每个任务另外记下标题词频和
+    内容中出现过的词，只修改标题时不需要重新读取内容。
+    """
+
+    # 标题中出现一次相当于内容中出现的次数
+    TITLE_WEIGHT = 5
+
+    def __init__(self):
+        self.postings = {}
+        self.vocabulary = []
+        # 任务ID -> (标题词频, 内容词元组)
+        self._documents = {}
+
+    def __len__(self):
+        return len(self._documents)
+
+    def _weights(self, title_counts, content_counts):
+        weights = dict(content_counts)
+        for token, count in title_counts.items():
+            weights[token] = weights.get(token, 0) + count * self.TITLE_WEIGHT
+        return weights
+
+    def build(self, documents):
+        """从(任务ID, 标题, 内容)序列整体建立索引"""
+        postings = self.postings = {}
+        documents_by_id = self._documents = {}
+        get_posting = postings.get
+        title_weight = self.TITLE_WEIGHT
+        for task_id, title, content in documents:
+            title_counts = count_tokens(title)
+            weights = count_tokens(content)
+            documents_by_id[task_id] = (title_counts, tuple(weights))
+            for token, count in title_counts.items():
+                weights[token] += count * title_weight
+            for token, weight in weights.items():
+                posting = get_posting(token)
+                if posting is None:
+                    postings[token] = {task_id: weight}
+                else:
+                    posting[task_id] = weight
+        self.vocabulary = sorted(postings)
+
+    def _set_document(self, task_id, title_counts, content_counts):
+        """替换一个任务的索引内容，只改动权重变化的词
+
+        title_counts或content_counts为None时沿用原来的部分，内容词频由
+        倒排表中的权重减去标题的贡献得到。
+        """
+        old_weights = {}
+        old = self._documents.pop(task_id, None)
+        if old is not None:
+            old_title, old_content = old
+            for token in old_title.keys() | set(old_content):
+                old_weights[token] = self.postings[token][task_id]
+            if title_counts is None:
+                title_counts = old_title
+            if content_counts is None:
+                content_counts = {token: old_weights[token] - old_title.get(token, 0) * self.TITLE_WEIGHT
+                                  for token in old_content}
+
+        self._documents[task_id] = (title_counts, tuple(content_counts))
+        new_weights = self._weights(title_counts, content_counts)
+
+        self._discard(task_id, old_weights.keys() - new_weights.keys())
+        for token, weight in new_weights.items():
+            if old_weights.get(token) == weight:
+                continue
+            posting = self.postings.get(token)
+            if posting is None:
+                posting = self.postings[token] = {}
+                insort(self.vocabulary, token)
+            posting[task_id] = weight
+
+    def add(self, task_id, title, content):
+        """索引一个任务"""
+        self._set_document(task_id, count_tokens(title), count_tokens(content))
+
+    def update(self, task_id, title=None, content=None):
+        """更新一个任务的索引，为None的部分保持不变"""
+        if task_id not in self._documents:
+            self.add(task_id, title or "", content or "")
+            return
+        self._set_document(task_id,
+                           None if title is None else count_tokens(title),
+                           None if content is None else count_tokens(content))
+
+    def remove(self, task_id):
+        """从索引中移除一个任务"""
+        old = self._documents.pop(task_id, None)
+        if old is not None:
+            title_counts, content_tokens = old
+            self._discard(task_id, title_counts.keys() | set(content_tokens))
+
+    def _discard(self, task_id, tokens):
+        """从这些词的倒排表中删除任务，倒排表为空时同时从词表中删除"""
+        for token in tokens:
+            posting = self.postings[token]
+            del posting[task_id]
+            if not posting:
+                del self.postings[token]
+                del self.vocabulary[bisect_left(self.vocabulary, token)]
+
+    def _expand(self, prefix):
+        """以prefix开头的全部词"""
+        start = bisect_left(self.vocabulary, prefix)
+        end = start
+        while end < len(self.vocabulary) and self.vocabulary[end].startswith(prefix):
+            end += 1
+        return self.vocabulary[start:end]
+
+    def _lookup(self, token, prefix):
+        """取一个查询词的倒排表，前缀查询时合并所有匹配词的倒排表"""
+        if not prefix:
+            return self.postings.get(token, {})
+        tokens = self._expand(token)
+        if len(tokens) == 1:
+            return self.postings[tokens[0]]
+        merged = {}
+        for matched in tokens:
+            for task_id, weight in self.postings[matched].items():
+                merged[task_id] = merged.get(task_id, 0) + weight
+        return merged
+
+    def search(self, query, limit=None):
+        """查询包含全部查询词的任务，按相关度从高到低返回任务ID"""
+        terms = query_terms(query)
+        if not terms:
+            return []
+        postings = []
+        for token, prefix in terms:
+            posting = self._lookup(token, prefix)
+            if not posting:
+                return []
+            postings.append(posting)
+
+        # 从最短的倒排表开始求交集
+        postings.sort(key=len)
+        candidates = list(postings[0])
+        for posting in postings[1:]:
+            candidates = [task_id for task_id in candidates if task_id in posting]
+            if not candidates:
+                return []
+
+        if len(postings) == 1:
+            # 只有一个查询词时相关度与权重成正比
+            scores = postings[0]
+        else:
+            total = len(self._documents)
+            scores = dict.fromkeys(candidates, 0.0)
+            for posting in postings:
+                idf = math.log(1 + total / len(posting))
+                for task_id in candidates:
+                    scores[task_id] += posting[task_id] * idf
+        if limit is not None:
+            return heapq.nlargest(limit, candidates, key=scores.__getitem__)
+        candidates.sort(key=scores.__getitem__, reverse=True)
+        return candidates
+
+
+class SearchIndexBuild:
+    """在后台线程中建立搜索索引
+
+    documents在后台线程中迭代，只应读取不会被修改的数据（任务快照）。建立完成后
+    调用on_done（在后台线程中调用），index为建好的索引，出错时为None。
+    """
+
+    def __init__(self, documents, on_done=None):
+        self.index = None
+        self._thread = threading.Thread(target=self._run, args=(documents, on_done), daemon=True)
+        self._thread.start()
+
+    def _run(self, documents, on_done):
+        try:
+            index = TaskSearchIndex()
+            index.build(documents)
+            self.index = index
+        except Exception as e:
+            print(f"建立搜索索引出错: {e}")
+        if on_done is not None:
+            on_done()
+
+    def done(self):
+        """是否已经建立完成"""
+        return not self._thread.is_alive()
+
+    def wait(self):
+        """等待建立完成并返回索引"""
+        self._thread.join()
+        return self.index
@@ -0,0 +1,27 @@
+from PyQt6.QtCore import QObject, Qt, pyqtSignal
+
+
+class TaskChangeSignals(QObject):
+    """把TaskManager的变更通知转换为Qt信号
+
+    通过connect_queued连接的槽函数会在接收者所在线程的事件循环中收到
+    ChangeSet，适合需要在GUI线程中刷新界面、或变更来自后台线程的场景。
+    """
+
+    changed = pyqtSignal(object)
+
+    def __init__(self, task_manager, parent=None):
+        super().__init__(parent)
+        self.task_manager = task_manager
+        self.task_manager.add_change_listener(self._on_changed)
+
+    def _on_changed(self, changes):
+        self.changed.emit(changes)
+
+    def connect_queued(self, slot):
+        """以队列方式连接槽函数"""
+        self.changed.connect(slot, Qt.ConnectionType.QueuedConnection)
+
+    def detach(self):
+        """停止转发任务变更通知"""
+        self.task_manager.remove_change_listener(self._on_changed)
@@ -0,0 +1,1320 @@
+import os
+import json
+import codecs
+import zlib
+import struct
+import sqlite3
+import time
+import argparse
+import threading
+from contextlib import nullcontext
+
+try:
+    import fcntl
+except ImportError:
+    # Windows没有fcntl，使用msvcrt的字节区间锁
+    fcntl = None
+    import msvcrt
+
+from task_schema import SCHEMA_VERSION, migrate_tasks
+
+# 使用SQLite后端的文件扩展名
+SQLITE_EXTENSIONS = ('.db', '.sqlite', '.sqlite3')
+
+# 使用紧凑二进制快照的文件扩展名
+PACK_EXTENSIONS = ('.pack',)
+
+# 二进制快照格式：魔数 + 元数据长度 + 压缩的元数据 + 分块压缩的任务内容
+PACK_MAGIC = b"WTPK\x01"
+PACK_HEADER = struct.Struct("<5sI")
+PACK_CHUNK_SIZE = 256
+
+
+def apply_record(tasks_by_id, record):
+    """将一条变更记录应用到以ID为键的任务字典上"""
+    op = record.get("op")
+    if op == "add":
+        task = record["task"]
+        tasks_by_id[task["id"]] = task
+    elif op == "update":
+        task = tasks_by_id.get(record["id"])
+        if task is not None:
+            # 写时复制，重放前的快照记录保持不变
+            tasks_by_id[record["id"]] = {**task, **record["fields"]}
+    elif op == "delete":
+        tasks_by_id.pop(record["id"], None)
+    elif op == "reset":
+        tasks_by_id.clear()
+        for task in record["tasks"]:
+            tasks_by_id[task["id"]] = task
+
+
+def file_signature(path):
+    """文件的(修改时间, 大小)签名，文件不存在时返回None"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class TaskFileLock:
+    """跨进程的建议性文件锁，同时保存数据文件的写入代数
+
+    锁加在单独的锁文件上（数据文件会被原子替换，不能直接加锁）。同一进程内
+    可重入，只有最外层获取时才加系统锁。锁文件的内容是一个递增的代数，每次
+    写入快照后加一，其他进程据此判断自己读入后数据文件是否被写过，比文件的
+    修改时间可靠（时间精度有限，大小也可能恰好相同）。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        # 最近一次获取锁时读到的代数
+        self.generation = 0
+        self._fd = None
+        self._depth = 0
+        self._thread_lock = threading.RLock()
+
+    def __enter__(self):
+        self._thread_lock.acquire()
+        if self._depth == 0:
+            try:
+                self._lock()
+            except BaseException:
+                self._thread_lock.release()
+                raise
+        self._depth += 1
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._depth -= 1
+        if self._depth == 0:
+            self._unlock()
+        self._thread_lock.release()
+
+    def _lock(self):
+        if self._fd is None:
+            self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o666)
+        if fcntl is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+        else:
+            os.lseek(self._fd, 0, os.SEEK_SET)
+            while True:
+                try:
+                    msvcrt.locking(self._fd, msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    # LK_LOCK重试10秒后仍未获得锁时报错，继续等待
+                    continue
+        os.lseek(self._fd, 0, os.SEEK_SET)
+        try:
+            self.generation = int(os.read(self._fd, 32) or 0)
+        except ValueError:
+            self.generation = 0
+
+    def _unlock(self):
+        if fcntl is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        else:
+            os.lseek(self._fd, 0, os.SEEK_SET)
+            msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+
+    def bump(self):
+        """持有锁时调用：代数加一并写回锁文件，返回新的代数"""
+        self.generation += 1
+        data = str(self.generation).encode()
+        os.lseek(self._fd, 0, os.SEEK_SET)
+        os.write(self._fd, data)
+        os.ftruncate(self._fd, len(data))
+        return self.generation
+
+    def close(self):
+        with self._thread_lock:
+            if self._fd is not None and self._depth == 0:
+                os.close(self._fd)
+                self._fd = None
+
+
+def merge_tasks(base, ours, theirs):
+    """三方合并任务列表，返回合并后的任务列表
+    
+    base是双方共同的起点，ours是本进程要写入的任务，theirs是其他进程已经写入的
+    任务。只有一方修改的字段取修改的一方，双方都修改的字段以本进程为准；一方
+    删除而另一方没有修改的任务删除。顺序以ours为准，其他进程新增的任务排在最后。
+    """
+    base = {task["id"]: task for task in base}
+    theirs = {task["id"]: task for task in theirs}
+    merged = []
+    for task in ours:
+        task_id = task["id"]
+        old = base.get(task_id)
+        other = theirs.pop(task_id, None)
+        if other is None:
+            if old is not None and old == task:
+                # 其他进程删除了本进程没有修改的任务
+                continue
+            merged.append(task)
+            continue
+        if old is None or other == old:
+            merged.append(task)
+            continue
+        fields = {key: value for key, value in other.items()
+                  if old.get(key) != value and task.get(key) == old.get(key)}
+        merged.append({**task, **fields} if fields else task)
+    for task_id, task in theirs.items():
+        if task_id not in base:
+            merged.append(task)
+    return merged
+
+
+class SnapshotCorrupted(ValueError):
+    """快照文件不完整或结构不对"""
+
+
+def sync_file(f):
+    """把已写入的数据刷到磁盘，之后再替换文件，断电时也不会得到空文件"""
+    f.flush()
+    os.fsync(f.fileno())
+
+
+def replace_snapshot(tmp_path, path):
+    """用写好的临时文件替换快照，原快照保留为.bak，作为恢复时的上一个一致状态"""
+    if os.path.exists(path):
+        os.replace(path, path + ".bak")
+    os.replace(tmp_path, path)
+
+
+# JSON快照与json.dump({"schema_version": ..., "tasks": [...]}, indent=2)的输出相同，
+# 只是在最后多一个checksum字段：任务数组部分字节的CRC32。文件仍以本程序写入的
+# 结尾（校验和字段后换行）结束而校验和不符时视为已损坏；脚本读入、修改后用
+# json.dump写回的文件会保留checksum字段，但结尾不同，按外部工具的修改接受。
+# 无法解析或结构不对的文件总是视为已损坏。
+JSON_SNAPSHOT_TRAILER = ',\n  "checksum": "%08x"\n}\n'
+JSON_FLUSH_PIECES = 4096
+
+
+def _well_formed_tasks(tasks):
+    """是否是结构完整的任务列表：每个任务都是带ID的对象"""
+    return isinstance(tasks, list) and all(isinstance(task, dict) and "id" in task for task in tasks)
+
+
+def read_json_snapshot(path):
+    """读取JSON快照并校验，返回(任务列表, 数据格式版本)；旧文件是不带版本号的任务数组"""
+    with open(path, 'rb') as f:
+        raw = f.read()
+    data = json.loads(raw)
+    if isinstance(data, list):
+        tasks, version = data, 1
+    elif isinstance(data, dict):
+        tasks, version = data.get("tasks"), data.get("schema_version", 1)
+    else:
+        tasks = version = None
+    if not _well_formed_tasks(tasks):
+        raise SnapshotCorrupted(f"任务快照结构不完整: {path}")
+    checksum = data.get("checksum") if isinstance(data, dict) else None
+    if checksum is not None:
+        start = raw.find(b'"tasks": ') + len(b'"tasks": ')
+        end = raw.rfind(b',\n  "checksum": ')
+        if end < start or "%08x" % zlib.crc32(raw[start:end]) != checksum:
+            trailer = ',\n  "checksum": "%s"\n}\n' % checksum
+            if isinstance(checksum, str) and raw.endswith(trailer.encode('utf-8')):
+                raise SnapshotCorrupted(f"任务快照校验和不符: {path}")
+            print(f"任务快照校验和不符，按外部修改读取: {path}")
+    return tasks, version
+
+
+def write_json_snapshot(path, tasks):
+    """将任务完整写入带校验和的JSON快照（先写临时文件并刷盘，再原子替换）"""
+    tmp_path = path + ".tmp"
+    # 任务记录可以是任意映射类型，序列化时转换为字典
+    encoder = json.JSONEncoder(ensure_ascii=False, indent=2, default=dict)
+    pieces = encoder.iterencode({"schema_version": SCHEMA_VERSION, "tasks": list(tasks)})
+    with open(tmp_path, 'wb') as f:
+        # 头部直到"tasks"键和冒号为止，之后是计入校验和的任务数组
+        header = []
+        for piece in pieces:
+            header.append(piece)
+            if piece == '"tasks"':
+                header.append(next(pieces))
+                break
+        f.write("".join(header).encode('utf-8'))
+        checksum = 0
+        body = []
+        for piece in pieces:
+            body.append(piece)
+            if len(body) >= JSON_FLUSH_PIECES:
+                # 最后两段是对象的结尾，总是留到最后替换为校验和字段
+                data = "".join(body[:-2]).encode('utf-8')
+                checksum = zlib.crc32(data, checksum)
+                f.write(data)
+                body = body[-2:]
+        data = "".join(body[:-2]).encode('utf-8')
+        checksum = zlib.crc32(data, checksum)
+        f.write(data)
+        f.write((JSON_SNAPSHOT_TRAILER % checksum).encode('utf-8'))
+        sync_file(f)
+    replace_snapshot(tmp_path, path)
+
+
+def iter_json_tasks(path, chunk_size=1 << 16):
+    """流式解析JSON数组或NDJSON文件，逐个产出(任务, 已读取字节数)
+
+    文件按块读取并增量解码，内存中只保留当前块和正在解析的对象。
+    """
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder('utf-8-sig')()
+    with open(path, 'rb') as f:
+        buffer = ""
+        position = 0
+        bytes_read = 0
+        eof = False
+        in_array = None
+        while True:
+            # 跳过空白和数组元素之间的逗号，缓冲区用完时继续读取
+            while True:
+                while position < len(buffer) and buffer[position] in ' \t\r\n,':
+                    position += 1
+                if position < len(buffer) or eof:
+                    break
+                data = f.read(chunk_size)
+                bytes_read += len(data)
+                eof = not data
+                buffer = utf8.decode(data, final=eof)
+                position = 0
+            if position >= len(buffer):
+                return
+
+            if in_array is None:
+                in_array = buffer[position] == '['
+                if in_array:
+                    position += 1
+                    continue
+            if in_array and buffer[position] == ']':
+                return
+
+            try:
+                value, position = decoder.raw_decode(buffer, position)
+                if isinstance(value, dict) and isinstance(value.get("tasks"), list):
+                    # 带版本号的数据文件，任务整体在一个对象里，无法逐个解析
+                    for task in value["tasks"]:
+                        yield task, bytes_read
+                    continue
+            except ValueError:
+                if eof:
+                    raise
+                # 对象跨越了块边界，读入下一块后重新解析
+                data = f.read(chunk_size)
+                bytes_read += len(data)
+                eof = not data
+                buffer = buffer[position:] + utf8.decode(data, final=eof)
+                position = 0
+                continue
+            yield value, bytes_read
+
+
+def read_pack_meta(f):
+    """读取二进制快照的头部和元数据，返回(元数据, 内容区起始偏移)"""
+    magic, meta_length = PACK_HEADER.unpack(f.read(PACK_HEADER.size))
+    if magic != PACK_MAGIC:
+        raise ValueError(f"不是有效的任务快照文件: {f.name}")
+    meta = json.loads(zlib.decompress(f.read(meta_length)))
+    return meta, PACK_HEADER.size + meta_length
+
+
+def read_pack_chunk(f, content_start, chunk):
+    """读取一块任务内容"""
+    offset, length = chunk
+    f.seek(content_start + offset)
+    return json.loads(zlib.decompress(f.read(length)))
+
+
+def read_pack_tasks(f, start=0):
+    """从文件的start偏移处读取一段二进制快照，返回(任务列表, 数据格式版本, 该段的结束偏移)"""
+    f.seek(start)
+    meta, content_start = read_pack_meta(f)
+    content_start += start
+    # 内容按PACK_CHUNK_SIZE条一块，每块是压缩后的JSON字符串数组
+    contents = []
+    end = content_start
+    for chunk in meta["chunks"]:
+        contents.extend(read_pack_chunk(f, content_start, chunk))
+        end = content_start + chunk[0] + chunk[1]
+    fields = meta["fields"]
+    tasks = []
+    for row, content in zip(meta["rows"], contents):
+        task = dict(zip(fields, row))
+        task["content"] = content
+        tasks.append(task)
+    return tasks, meta.get("version", 1), end
+
+
+def read_pack_snapshot(path):
+    """读取二进制快照，返回(任务列表, 数据格式版本)"""
+    with open(path, 'rb') as f:
+        tasks, version, _ = read_pack_tasks(f)
+    return tasks, version
+
+
+def write_pack_file(path, tasks, get_content=None, mode='wb'):
+    """写入二进制快照文件：字段名只存一次，内容分块压缩以便按块读取
+
+    get_content用于获取未驻留在内存中的任务内容。返回(任务ID列表, 分块表,
+    内容区起始偏移)，供按需加载内容时定位。mode为'ab'时追加为文件中的新一段。
+    """
+    tasks = list(tasks)
+    fields = []
+    for task in tasks:
+        for key in task:
+            if key != "content" and key not in fields:
+                fields.append(key)
+    rows = [[task.get(key) for key in fields] for task in tasks]
+
+    chunks = []
+    blobs = []
+    offset = 0
+    for start in range(0, len(tasks), PACK_CHUNK_SIZE):
+        contents = []
+        for task in tasks[start:start + PACK_CHUNK_SIZE]:
+            if "content" in task or get_content is None:
+                contents.append(task.get("content", ""))
+            else:
+                contents.append(get_content(task["id"]))
+        blob = zlib.compress(json.dumps(contents, ensure_ascii=False, separators=(',', ':')).encode('utf-8'), 1)
+        chunks.append([offset, len(blob)])
+        blobs.append(blob)
+        offset += len(blob)
+
+    meta = json.dumps({"version": SCHEMA_VERSION, "fields": fields, "rows": rows, "chunks": chunks},
+                      ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    meta = zlib.compress(meta, 1)
+    with open(path, mode) as f:
+        f.write(PACK_HEADER.pack(PACK_MAGIC, len(meta)))
+        f.write(meta)
+        f.writelines(blobs)
+        sync_file(f)
+    return [task["id"] for task in tasks], chunks, PACK_HEADER.size + len(meta)
+
+
+def write_pack_snapshot(path, tasks):
+    """将任务写入二进制快照（先写临时文件再原子替换）"""
+    tmp_path = path + ".tmp"
+    write_pack_file(tmp_path, tasks)
+    os.replace(tmp_path, path)
+
+
+class TaskArchive:
+    """已完成任务的冷存档
+
+    存档文件由若干段二进制快照依次拼接而成：归档时只在文件末尾追加一段，
+    只有任务被移出存档时才整体重写。存档在第一次用到时才读入内存。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._tasks = None
+        # 已移出存档、尚未从文件中删除的任务
+        self._discarded = {}
+        # 存档中的任务每次变化时递增，用作由存档派生的数据（搜索索引）的键
+        self.version = 0
+
+    @classmethod
+    def for_data_path(cls, data_path):
+        """数据文件对应的存档：与数据文件同目录，如tasks.json -> tasks.archive.pack"""
+        return cls(os.path.splitext(data_path)[0] + ".archive.pack")
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def get(self, task_id):
+        """存档已读入内存时按ID获取任务，不会因此读取存档"""
+        return self._tasks.get(task_id) if self._tasks is not None else None
+
+    def load(self):
+        """读取全部存档任务，返回ID到任务的字典"""
+        if self._tasks is None:
+            self._tasks = {}
+            if os.path.exists(self.path):
+                size = os.path.getsize(self.path)
+                with open(self.path, 'rb') as f:
+                    start = 0
+                    while start < size:
+                        try:
+                            tasks, version, start = read_pack_tasks(f, start)
+                        except Exception as e:
+                            # 最后一段可能在追加时被中断
+                            print(f"读取任务存档出错: {e}")
+                            break
+                        # 各段由不同版本写入，读入时分别升级
+                        migrate_tasks(tasks, version)
+                        for task in tasks:
+                            self._tasks[task["id"]] = task
+        return self._tasks
+
+    def append(self, tasks):
+        """把任务追加到存档末尾"""
+        tasks = list(tasks)
+        if not tasks:
+            return
+        write_pack_file(self.path, tasks, mode='ab')
+        self.version += 1
+        if self._tasks is not None:
+            for task in tasks:
+                self._tasks[task["id"]] = task
+
+    def discard(self, task_id):
+        """把任务移出存档并返回，文件在flush时才重写"""
+        task = self.load().pop(task_id, None)
+        if task is not None:
+            self._discarded[task_id] = task
+            self.version += 1
+        return task
+
+    def has_discarded(self):
+        """是否有已移出、尚未从文件中删除的任务"""
+        return bool(self._discarded)
+
+    def undiscard(self):
+        """撤销尚未写入文件的移出操作"""
+        if self._discarded:
+            self._tasks.update(self._discarded)
+            self._discarded = {}
+            self.version += 1
+
+    def flush(self):
+        """重写存档文件，删除已移出的任务"""
+        if not self._discarded:
+            return
+        self._discarded = {}
+        if self._tasks:
+            write_pack_snapshot(self.path, self._tasks.values())
+        elif os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class TaskJournal:
+    """追加式任务变更日志
+
+    每次变更只向日志文件追加一行紧凑的JSON记录，日志条数超过阈值后
+    把当前日志轮换出去，由后台线程将内存中的任务折叠写回快照文件。
+
+    提供lock时追加、轮换和折叠都在锁内进行，并记录日志中是否有其他进程
+    追加的记录（日志大小与本进程所知不符），折叠时需要把这些记录合并进来。
+    """
+
+    def __init__(self, snapshot_path, compact_threshold=1000, write_snapshot=write_json_snapshot,
+                 lock=None):
+        self.snapshot_path = snapshot_path
+        self.write_snapshot = write_snapshot
+        self.lock = lock if lock is not None else nullcontext()
+        self.path = snapshot_path + ".journal"
+        # 正在压缩（尚未写入快照）的日志
+        self.rotated_path = self.path + ".compacting"
+        self.compact_threshold = compact_threshold
+        self.record_count = 0
+        # 本进程所知的日志文件大小，以及当前日志/轮换出的日志中是否有其他进程的记录
+        self._size = 0
+        self.foreign = False
+        self.rotated_foreign = False
+        # 本进程在上次轮换之后追加到当前日志的记录
+        self.appended = []
+        self._file = None
+        self._compact_thread = None
+
+    def has_pending(self):
+        """是否存在尚未折叠进快照的日志"""
+        return os.path.exists(self.path) or os.path.exists(self.rotated_path)
+
+    def replay(self, tasks, paths=None):
+        """在快照任务列表上依次重放日志，返回重放后的任务列表
+
+        日志末尾写入时被中断的记录及其后的内容被丢弃。启动时重放（paths为None）
+        还会把日志截断到最后一条完整的记录，之后追加的记录才不会接在残缺的行后面。
+        """
+        tasks_by_id = {task["id"]: task for task in tasks}
+        for path in paths or (self.rotated_path, self.path):
+            if not os.path.exists(path):
+                continue
+            torn_at = None
+            with open(path, 'rb') as f:
+                offset = 0
+                for line in f:
+                    start = offset
+                    offset += len(line)
+                    if not line.strip():
+                        continue
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # 最后一条记录可能在写入时被中断
+                        print(f"跳过损坏的任务日志记录: {path}")
+                        torn_at = start
+                        break
+                    apply_record(tasks_by_id, record)
+                    self.record_count += 1
+            if torn_at is not None and paths is None:
+                with open(path, 'r+b') as f:
+                    f.truncate(torn_at)
+        if paths is None:
+            self._size = self._file_size()
+        return list(tasks_by_id.values())
+
+    def _file_size(self):
+        try:
+            return os.path.getsize(self.path)
+        except OSError:
+            return 0
+
+    def _check_foreign(self):
+        """持有锁时调用：日志被其他进程轮换时重新打开，被其他进程追加过时做标记"""
+        if self._file is not None:
+            try:
+                current = os.stat(self.path)
+            except OSError:
+                current = None
+            opened = os.fstat(self._file.fileno())
+            if current is None or (current.st_ino, current.st_dev) != (opened.st_ino, opened.st_dev):
+                self._close_file()
+        if self._file_size() != self._size:
+            self.foreign = True
+
+    def append(self, record):
+        """追加一条变更记录"""
+        with self.lock:
+            self._check_foreign()
+            if self._file is None:
+                self._file = open(self.path, 'a', encoding='utf-8')
+            self._file.write(json.dumps(record, ensure_ascii=False, separators=(',', ':'), default=dict) + '\n')
+            self._file.flush()
+            self._size = os.fstat(self._file.fileno()).st_size
+            self.appended.append(record)
+        self.record_count += 1
+
+    def needs_compaction(self):
+        """日志是否已超过阈值且当前没有正在进行的压缩"""
+        if self._compact_thread is not None and self._compact_thread.is_alive():
+            return False
+        return self.record_count >= self.compact_threshold
+
+    def compact(self, tasks, background=True):
+        """将任务折叠写入快照并清空日志"""
+        self._wait_compaction()
+
+        # 任务记录不会被原地修改，保存引用列表即可作为一致的快照
+        snapshot = list(tasks)
+
+        # 轮换日志，之后的变更写入新的日志文件
+        with self.lock:
+            self._check_foreign()
+            self._close_file()
+            if os.path.exists(self.path):
+                if os.path.exists(self.rotated_path):
+                    # 上一次压缩失败（或其他进程正在压缩）留下的日志，合并后再一起丢弃
+                    with open(self.path, 'r', encoding='utf-8') as src, \
+                            open(self.rotated_path, 'a', encoding='utf-8') as dst:
+                        dst.write(src.read())
+                    os.remove(self.path)
+                    self.foreign = True
+                else:
+                    os.replace(self.path, self.rotated_path)
+            self.rotated_foreign = self.rotated_foreign or self.foreign
+            self.foreign = False
+            self._size = 0
+            self.appended = []
+        self.record_count = 0
+
+        if background:
+            self._compact_thread = threading.Thread(
+                target=self._write_snapshot, args=(snapshot,), daemon=True)
+            self._compact_thread.start()
+        else:
+            self._write_snapshot(snapshot)
+
+    def _write_snapshot(self, snapshot):
+        """写入快照并删除已折叠的日志"""
+        try:
+            with self.lock:
+                self.write_snapshot(self.snapshot_path, snapshot)
+                if os.path.exists(self.rotated_path):
+                    os.remove(self.rotated_path)
+                self.rotated_foreign = False
+        except Exception as e:
+            print(f"压缩任务日志出错: {e}")
+
+    def _wait_compaction(self):
+        """等待正在进行的后台压缩完成"""
+        if self._compact_thread is not None:
+            self._compact_thread.join()
+            self._compact_thread = None
+
+    def _close_file(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def close(self):
+        """等待后台压缩并关闭日志文件"""
+        self._wait_compaction()
+        self._close_file()
+
+
+class WriteBehindSaver:
+    """后台保存线程
+
+    保存请求只把最新的任务列表交给线程并标记为脏，线程在合并窗口内把
+    多次请求合并成一次写入，写入时先写临时文件再用os.replace原子替换。
+    """
+
+    def __init__(self, path, delay=0.5, write_snapshot=write_json_snapshot):
+        self.path = path
+        self.delay = delay
+        self.write_snapshot = write_snapshot
+        self._cond = threading.Condition()
+        self._pending = None
+        self._dirty_since = None
+        self._writing = False
+        self._flush_requested = False
+        self._closed = False
+
+        # 统计信息
+        self.requests = 0
+        self.writes = 0
+        self.failures = 0
+        self.last_latency = 0.0
+        self.max_latency = 0.0
+
+        self._thread = threading.Thread(target=self._run, name="TaskSaver", daemon=True)
+        self._thread.start()
+
+    def schedule(self, tasks):
+        """提交一次保存请求，不等待写入"""
+        with self._cond:
+            self._pending = list(tasks)
+            if self._dirty_since is None:
+                self._dirty_since = time.monotonic()
+            self.requests += 1
+            self._cond.notify_all()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._pending is None and not self._closed:
+                    self._cond.wait()
+                if self._pending is None:
+                    return
+
+                # 在合并窗口内继续等待，期间的保存请求会被合并
+                deadline = self._dirty_since + self.delay
+                while not (self._flush_requested or self._closed):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+
+                tasks = self._pending
+                dirty_since = self._dirty_since
+                self._pending = None
+                self._dirty_since = None
+                self._writing = True
+
+            try:
+                self.write_snapshot(self.path, tasks)
+                error = None
+            except Exception as e:
+                print(f"保存任务数据出错: {e}")
+                error = e
+
+            with self._cond:
+                self._writing = False
+                if error is None:
+                    self.writes += 1
+                    self.last_latency = time.monotonic() - dirty_since
+                    self.max_latency = max(self.max_latency, self.last_latency)
+                else:
+                    self.failures += 1
+                    if self._pending is None and not self._closed:
+                        # 写入失败时保留数据，等下一个合并窗口重试
+                        self._pending = tasks
+                        self._dirty_since = time.monotonic()
+                self._cond.notify_all()
+
+    def flush(self):
+        """立即写入尚未保存的数据并等待完成"""
+        with self._cond:
+            failures = self.failures
+            self._flush_requested = True
+            self._cond.notify_all()
+            while (self._pending is not None or self._writing) and self.failures == failures:
+                self._cond.wait()
+            self._flush_requested = False
+
+    def metrics(self):
+        """保存统计：请求数、实际写入数、失败数，以及待写入数据已等待的时间"""
+        with self._cond:
+            pending_latency = 0.0
+            if self._dirty_since is not None:
+                pending_latency = time.monotonic() - self._dirty_since
+            return {
+                "requests": self.requests,
+                "writes": self.writes,
+                "failures": self.failures,
+                "pending": self._pending is not None or self._writing,
+                "pending_latency": pending_latency,
+                "last_latency": self.last_latency,
+                "max_latency": self.max_latency,
+            }
+
+    def close(self):
+        """写入剩余数据并结束线程"""
+        self.flush()
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+
+
+class FileTaskStorage:
+    """基于快照文件的存储
+
+    默认由后台线程合并写入；日志模式下每次变更追加一条日志记录。
+    快照的读写格式由子类的read_snapshot/write_snapshot决定。
+
+    disk_state记录最近一次读取或写入的快照文件签名及其中的任务，用于识别
+    外部工具对快照的修改，并作为合并外部修改时的基准。merge_base是内存中的任务与
+    磁盘上的数据共同的起点：加载时的快照加上日志中的全部记录，之后随本进程写入的
+    快照和追加的日志记录更新，是与其他进程的写入三方合并的基准。
+
+    多个进程（第二个实例或脚本）可以同时使用同一个数据文件：所有写入都在
+    跨进程的文件锁内进行，写入快照前先比较锁文件中的写入代数和快照签名，
+    其他进程写过时读入它们写入的任务并三方合并，而不是直接覆盖。
+    """
+
+    supports_query = False
+    supports_lazy_content = False
+    # read_snapshot返回(任务列表, 数据格式版本)
+    read_snapshot = staticmethod(read_json_snapshot)
+    write_snapshot = staticmethod(write_json_snapshot)
+
+    def __init__(self, path, journal_mode=False, save_delay=0.5, lazy_content=False):
+        self.path = path
+        self.lazy_content = lazy_content and self.supports_lazy_content
+        # 最近一次加载的数据文件的格式版本，低于SCHEMA_VERSION时需要升级后写回
+        self.schema_version = SCHEMA_VERSION
+        self.disk_state = (None, [])
+        # 任务ID -> 任务，由锁保护（后台写入时读取和替换）
+        self.merge_base = {}
+        self.lock = TaskFileLock(path + ".lock")
+        # 本进程最近一次读取或写入时锁文件中的写入代数
+        self.generation = 0
+        self.journal = self._create_journal() if journal_mode else None
+        self.saver = None if journal_mode else WriteBehindSaver(path, save_delay, self._write_tracked)
+
+    def _create_journal(self):
+        return TaskJournal(self.path, write_snapshot=self._write_tracked, lock=self.lock)
+
+    @property
+    def supports_hot_reload(self):
+        """按需加载模式下内存中没有完整内容，无法与外部修改比较"""
+        return not self.lazy_content
+
+    def _write_tracked(self, path, tasks):
+        """在文件锁内写入快照并记录写入后的文件签名（可能在后台线程中调用）
+
+        其他进程在本进程上次读写之后写过数据时，以merge_base为基准与它们写入的任务
+        合并。合并后磁盘上的数据多于内存，disk_state的签名置为None、基准设为本进程
+        写入前的任务，热重载时按外部修改把其他进程的变更合并回内存。
+        """
+        tasks = list(tasks)
+        with self.lock:
+            signature = file_signature(path)
+            journal_foreign = self.journal is not None and self.journal.rotated_foreign
+            merged = None
+            if (self.lock.generation != self.generation or signature != self.disk_state[0]
+                    or journal_foreign):
+                merged = merge_tasks(self.merge_base.values(), tasks, self._read_written(path, signature))
+            self.write_snapshot(path, tasks if merged is None else merged)
+            self.generation = self.lock.bump()
+            if merged is None:
+                self.disk_state = (file_signature(path), tasks)
+            else:
+                self.disk_state = (None, tasks)
+            # 内存中的任务由写入的任务继续修改，以它为之后合并的基准；后台折叠期间
+            # 追加的记录已在新的日志中，也要计入
+            merge_base = {task["id"]: task for task in tasks}
+            if self.journal is not None:
+                for record in self.journal.appended:
+                    apply_record(merge_base, record)
+            self.merge_base = merge_base
+        self.schema_version = SCHEMA_VERSION
+
+    def _read_written(self, path, signature):
+        """读取磁盘上已写入的全部任务：快照加上正在折叠的日志（持有锁时调用）"""
+        tasks = []
+        if signature is not None:
+            tasks, version = self.read_snapshot(path)
+            migrate_tasks(tasks, version)
+        if self.journal is not None:
+            tasks = self.journal.replay(tasks, paths=(self.journal.rotated_path,))
+        return tasks
+
+    def has_pending(self):
+        """是否有遗留的日志需要折叠进快照"""
+        return self.journal is not None and self.journal.has_pending()
+
+    def load(self):
+        """读取全部任务"""
+        with self.lock:
+            tasks = []
+            self.generation = self.lock.generation
+            snapshot = self._recover()
+            if snapshot is not None:
+                tasks, self.schema_version = snapshot
+                self.disk_state = (file_signature(self.path), list(tasks))
+            if self.journal is not None:
+                tasks = self.journal.replay(tasks)
+                self.merge_base = {task["id"]: task for task in tasks}
+            else:
+                self.merge_base = {task["id"]: task for task in tasks}
+                # 关闭日志模式后，上次运行遗留的日志仍需重放并折叠进快照
+                journal = self._create_journal()
+                if journal.has_pending():
+                    tasks = journal.replay(tasks)
+                    self.merge_base = {task["id"]: task for task in tasks}
+                    journal.compact(tasks, background=False)
+        return tasks
+
+    def _recover(self):
+        """持有锁时调用：读取最新的一致快照，返回(任务列表, 数据格式版本)，没有时返回None
+
+        数据文件能读取时总是使用它（同步工具会保留远端文件的修改时间，不能按修改时间
+        与.bak比较），只有替换前中断留下的、比它新的完整临时文件优先。数据文件损坏
+        （写入中断、被截断，无法解析或结构不对）或不存在时，依次改用完整的临时文件
+        和上一个快照，之后由调用者重放日志。损坏的数据文件改名保留，不会被之后的
+        保存覆盖。
+        """
+        tmp_path = self.path + ".tmp"
+        exists = os.path.exists(self.path)
+        snapshot = self._read_candidate(self.path)
+        if snapshot is not None:
+            if (os.path.exists(tmp_path)
+                    and os.stat(tmp_path).st_mtime_ns > os.stat(self.path).st_mtime_ns):
+                newer = self._read_candidate(tmp_path)
+                if newer is not None:
+                    # 完成被中断的替换，原数据文件照常成为.bak
+                    replace_snapshot(tmp_path, self.path)
+                    print(f"已从 {tmp_path} 恢复任务数据")
+                    return newer
+            return snapshot
+        for candidate in (tmp_path, self.path + ".bak"):
+            snapshot = self._read_candidate(candidate)
+            if snapshot is not None:
+                if exists:
+                    self._quarantine()
+                os.replace(candidate, self.path)
+                print(f"已从 {candidate} 恢复任务数据")
+                return snapshot
+        if exists:
+            self._quarantine()
+        return None
+
+    def _read_candidate(self, path):
+        """读取一个快照文件，不存在或已损坏时返回None"""
+        if not os.path.exists(path):
+            return None
+        try:
+            return self.read_snapshot(path)
+        except Exception as e:
+            print(f"任务数据文件已损坏: {path}: {e}")
+            return None
+
+    def _quarantine(self):
+        """把损坏的数据文件改名保留"""
+        corrupt_path = f"{self.path}.corrupt-{time.strftime('%Y%m%d%H%M%S')}"
+        suffix = 1
+        while os.path.exists(corrupt_path):
+            corrupt_path = f"{self.path}.corrupt-{time.strftime('%Y%m%d%H%M%S')}-{suffix}"
+            suffix += 1
+        os.replace(self.path, corrupt_path)
+        print(f"损坏的任务数据文件已另存为: {corrupt_path}")
+
+    def load_content(self, task_id):
+        """按需读取单个任务的内容；不按需加载时内容都在内存中，缺少内容字段的任务内容为空"""
+        return ""
+
+    def save(self, tasks):
+        """整体保存全部任务"""
+        if self.journal is not None:
+            # 日志模式下立即折叠为快照
+            self.journal.compact(tasks, background=False)
+        else:
+            self.saver.schedule(tasks)
+
+    def apply(self, records, tasks):
+        """持久化一组变更：日志模式下逐条追加记录，否则整体保存一次"""
+        if self.journal is None or any(record.get("op") == "reset" for record in records):
+            # 整体替换时直接写快照，没必要把全部任务写进日志
+            self.save(tasks)
+            return
+        try:
+            with self.lock:
+                for record in records:
+                    self.journal.append(record)
+                    apply_record(self.merge_base, record)
+        except Exception as e:
+            print(f"写入任务日志出错: {e}")
+            self.save(tasks)
+            return
+        if self.journal.needs_compaction():
+            self.journal.compact(tasks)
+
+    def accept_external(self, signature, external_tasks, tasks, modified):
+        """把外部修改后的快照作为新的磁盘状态
+
+        tasks为合并外部修改后的内存任务，modified表示它与外部快照不同
+        （还有尚未写入的本地变更），此时需要写回。
+        """
+        with self.lock:
+            self.disk_state = (signature, list(external_tasks))
+            self.merge_base = {task["id"]: task for task in external_tasks}
+        if self.journal is not None:
+            # 日志是相对旧快照记录的，重放到新快照上会覆盖外部修改，需立即折叠
+            if modified or self.journal.has_pending():
+                self.journal.compact(tasks, background=False)
+        elif modified or self.saver.metrics()["pending"]:
+            # 正在等待写入的旧数据不含外部修改，用合并后的任务替换
+            self.saver.schedule(tasks)
+
+    def flush(self):
+        """等待已安排的写入完成，返回是否写入成功；日志模式下变更在apply时已追加到日志"""
+        if self.saver is None:
+            return True
+        failures = self.saver.failures
+        self.saver.flush()
+        return self.saver.failures == failures
+
+    def metrics(self):
+        """后台保存的统计信息"""
+        return self.saver.metrics() if self.saver is not None else {}
+
+    def close(self):
+        """确保数据已写入磁盘"""
+        if self.journal is not None:
+            self.journal.close()
+        if self.saver is not None:
+            self.saver.close()
+        self.lock.close()
+
+
+class JsonTaskStorage(FileTaskStorage):
+    """JSON文件存储（默认后端）"""
+
+
+class PackTaskStorage(FileTaskStorage):
+    """紧凑二进制快照存储，加载和保存都比格式化的JSON快，文件也更小
+
+    按需加载模式下只读取元数据，任务内容通过ID→位置索引从快照中按块读取。
+    """
+
+    supports_lazy_content = True
+
+    # 最多缓存的内容块数
+    CHUNK_CACHE_SIZE = 8
+
+    def __init__(self, path, journal_mode=False, save_delay=0.5, lazy_content=False):
+        # 快照文件的布局，后台写入替换文件时需要同时更新，由锁保护
+        self._lock = threading.Lock()
+        self._positions = {}
+        self._chunks = []
+        self._content_start = 0
+        self._chunk_cache = {}
+        super().__init__(path, journal_mode, save_delay, lazy_content)
+
+    def _set_layout(self, ids, chunks, content_start):
+        self._positions = {task_id: position for position, task_id in enumerate(ids)}
+        self._chunks = chunks
+        self._content_start = content_start
+        self._chunk_cache = {}
+
+    def read_snapshot(self, path):
+        """读取快照；按需加载模式下只读取元数据并记录内容布局"""
+        if not self.lazy_content:
+            return read_pack_snapshot(path)
+        with self._lock:
+            with open(path, 'rb') as f:
+                meta, content_start = read_pack_meta(f)
+            # 内容不在此时读取，至少确认文件没有被截断
+            if os.path.getsize(path) < content_start + sum(length for _, length in meta["chunks"]):
+                raise SnapshotCorrupted(f"任务快照不完整: {path}")
+            fields = meta["fields"]
+            tasks = [dict(zip(fields, row)) for row in meta["rows"]]
+            self._set_layout([task["id"] for task in tasks], meta["chunks"], content_start)
+        return tasks, meta.get("version", 1)
+
+    def write_snapshot(self, path, tasks):
+        """写入快照，未驻留内存的任务内容从旧快照中读取"""
+        tmp_path = path + ".tmp"
+        layout = write_pack_file(tmp_path, tasks, self.load_content)
+        with self._lock:
+            replace_snapshot(tmp_path, path)
+            self._set_layout(*layout)
+
+    def load_content(self, task_id):
+        """从快照中读取单个任务的内容"""
+        with self._lock:
+            position = self._positions.get(task_id)
+            if position is None:
+                return ""
+            chunk_index, offset = divmod(position, PACK_CHUNK_SIZE)
+            contents = self._chunk_cache.get(chunk_index)
+            if contents is None:
+                with open(self.path, 'rb') as f:
+                    contents = read_pack_chunk(f, self._content_start, self._chunks[chunk_index])
+                if len(self._chunk_cache) >= self.CHUNK_CACHE_SIZE:
+                    self._chunk_cache.pop(next(iter(self._chunk_cache)))
+                self._chunk_cache[chunk_index] = contents
+            return contents[offset]
+
+
+class SqliteTaskStorage:
+    """SQLite存储后端，WAL模式，按常用过滤字段建立索引
+
+    按需加载模式下读取和查询都不取content列，内容按ID单独查询。其他线程（后台建立
+    搜索索引）读取内容时使用单独的只读连接，sqlite3的连接不能跨线程使用。
+    """
+
+    supports_query = True
+    supports_lazy_content = True
+    supports_hot_reload = False
+
+    COLUMNS = ("id", "title", "content", "is_completed", "created_at", "completed_at",
+               "show_on_wallpaper", "updated_at", "priority", "tags", "category", "due_at", "remind_at")
+    BOOL_COLUMNS = ("is_completed", "show_on_wallpaper")
+    # 以JSON文本保存的列表字段
+    JSON_COLUMNS = ("tags",)
+    # 不允许为NULL的列，值为None时写入默认值
+    COLUMN_DEFAULTS = {"priority": 0, "category": ""}
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS tasks (
+            id TEXT PRIMARY KEY,
+            position INTEGER NOT NULL,
+            title TEXT NOT NULL DEFAULT '',
+            content TEXT NOT NULL DEFAULT '',
+            is_completed INTEGER NOT NULL DEFAULT 0,
+            created_at TEXT,
+            completed_at TEXT,
+            show_on_wallpaper INTEGER NOT NULL DEFAULT 1,
+            updated_at TEXT,
+            priority INTEGER NOT NULL DEFAULT 0,
+            tags TEXT NOT NULL DEFAULT '[]',
+            category TEXT NOT NULL DEFAULT '',
+            due_at TEXT,
+            remind_at TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_tasks_position ON tasks (position);
+        CREATE INDEX IF NOT EXISTS idx_tasks_completed ON tasks (is_completed, position);
+        CREATE INDEX IF NOT EXISTS idx_tasks_wallpaper ON tasks (show_on_wallpaper, is_completed, position);
+        CREATE INDEX IF NOT EXISTS idx_tasks_created_at ON tasks (created_at);
+    """
+
+    # 后来加入的列，旧数据库打开时补上
+    ADDED_COLUMNS = (("updated_at", "TEXT"),
+                     ("priority", "INTEGER NOT NULL DEFAULT 0"),
+                     ("tags", "TEXT NOT NULL DEFAULT '[]'"),
+                     ("category", "TEXT NOT NULL DEFAULT ''"),
+                     ("due_at", "TEXT"),
+                     ("remind_at", "TEXT"))
+
+    def __init__(self, path, lazy_content=False):
+        self.path = path
+        self.lazy_content = lazy_content
+        self._columns = tuple(c for c in self.COLUMNS if c != "content") if lazy_content else self.COLUMNS
+        self.conn = sqlite3.connect(path)
+        self._owner_thread = threading.get_ident()
+        # 其他线程读取内容的连接，第一次使用时创建，由锁保护
+        self._reader = None
+        self._reader_lock = threading.Lock()
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(self.SCHEMA)
+        existing = {row[1] for row in self.conn.execute("PRAGMA table_info(tasks)")}
+        for column, definition in self.ADDED_COLUMNS:
+            if column not in existing:
+                self.conn.execute(f"ALTER TABLE tasks ADD COLUMN {column} {definition}")
+        row = self.conn.execute("SELECT MAX(position) FROM tasks").fetchone()
+        self._next_position = (row[0] + 1) if row[0] is not None else 0
+
+        # 数据格式版本记录在user_version中，没有版本号的旧数据库视为版本1
+        self.schema_version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        if self.schema_version == 0:
+            if self._next_position == 0:
+                self._set_schema_version()
+            else:
+                self.schema_version = 1
+
+    def _set_schema_version(self):
+        self.conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self.schema_version = SCHEMA_VERSION
+
+    def has_pending(self):
+        return False
+
+    def _row_to_task(self, row):
+        task = dict(zip(self._columns, row))
+        for column in self.BOOL_COLUMNS:
+            task[column] = bool(task[column])
+        for column in self.JSON_COLUMNS:
+            task[column] = json.loads(task[column])
+        return task
+
+    def _column_value(self, column, value):
+        """把字段值转换为列中保存的值"""
+        if value is None and column in self.COLUMN_DEFAULTS:
+            return self.COLUMN_DEFAULTS[column]
+        if column in self.BOOL_COLUMNS:
+            return int(bool(value))
+        if column in self.JSON_COLUMNS:
+            return json.dumps(list(value or ()), ensure_ascii=False)
+        return value
+
+    def _task_to_row(self, task, position):
+        return (
+            task["id"], position, task.get("title", ""), task.get("content", ""),
+            int(bool(task.get("is_completed", False))), task.get("created_at"),
+            task.get("completed_at"), int(bool(task.get("show_on_wallpaper", True))),
+            task.get("updated_at"), self._column_value("priority", task.get("priority")),
+            self._column_value("tags", task.get("tags")),
+            self._column_value("category", task.get("category")),
+            task.get("due_at"), task.get("remind_at")
+        )
+
+    def _insert(self, task, position):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO tasks (id, position, title, content, is_completed, "
+            "created_at, completed_at, show_on_wallpaper, updated_at, priority, tags, category, "
+            "due_at, remind_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            self._task_to_row(task, position))
+
+    def load(self):
+        """按显示顺序读取全部任务"""
+        cursor = self.conn.execute(
+            f"SELECT {', '.join(self._columns)} FROM tasks ORDER BY position")
+        return [self._row_to_task(row) for row in cursor]
+
+    def load_content(self, task_id):
+        """按ID读取单个任务的内容，可以在任何线程中调用"""
+        if threading.get_ident() == self._owner_thread:
+            row = self.conn.execute("SELECT content FROM tasks WHERE id = ?", (task_id,)).fetchone()
+        else:
+            with self._reader_lock:
+                if self._reader is None:
+                    self._reader = sqlite3.connect(self.path, check_same_thread=False)
+                row = self._reader.execute("SELECT content FROM tasks WHERE id = ?", (task_id,)).fetchone()
+        return row[0] if row else ""
+
+    def _replace_all(self, tasks):
+        tasks = list(tasks)
+        # 未驻留内存的任务内容需要在清空表之前读出来
+        contents = {}
+        if any("content" not in task for task in tasks):
+            contents = dict(self.conn.execute("SELECT id, content FROM tasks"))
+        self.conn.execute("DELETE FROM tasks")
+        for position, task in enumerate(tasks):
+            if "content" not in task:
+                task = {**task, "content": contents.get(task["id"], "")}
+            self._insert(task, position)
+        self._next_position = len(tasks)
+
+    def save(self, tasks):
+        """整体替换全部任务"""
+        with self.conn:
+            self._replace_all(tasks)
+            self._set_schema_version()
+
+    def _apply_record(self, record):
+        """把一条变更记录转换为对应的SQL语句"""
+        op = record.get("op")
+        if op == "add":
+            self._insert(record["task"], self._next_position)
+            self._next_position += 1
+        elif op == "update":
+            fields = {k: v for k, v in record["fields"].items() if k in self.COLUMNS and k != "id"}
+            if fields:
+                values = [self._column_value(k, v) for k, v in fields.items()]
+                assignments = ", ".join(f"{k} = ?" for k in fields)
+                self.conn.execute(f"UPDATE tasks SET {assignments} WHERE id = ?",
+                                  values + [record["id"]])
+        elif op == "delete":
+            self.conn.execute("DELETE FROM tasks WHERE id = ?", (record["id"],))
+        elif op == "reset":
+            self._replace_all(record["tasks"])
+
+    def apply(self, records, tasks):
+        """在一个事务中执行一组变更"""
+        with self.conn:
+            for record in records:
+                self._apply_record(record)
+
+    def flush(self):
+        """变更在apply时已提交"""
+        return True
+
+    def metrics(self):
+        return {}
+
+    def query(self, is_completed=None, show_on_wallpaper=None):
+        """按完成状态和壁纸显示标记查询任务，走索引而不是全表扫描"""
+        conditions = []
+        params = []
+        if is_completed is not None:
+            conditions.append("is_completed = ?")
+            params.append(int(is_completed))
+        if show_on_wallpaper is not None:
+            conditions.append("show_on_wallpaper = ?")
+            params.append(int(show_on_wallpaper))
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        cursor = self.conn.execute(
+            f"SELECT {', '.join(self._columns)} FROM tasks {where} ORDER BY position", params)
+        return [self._row_to_task(row) for row in cursor]
+
+    def close(self):
+        with self._reader_lock:
+            if self._reader is not None:
+                self._reader.close()
+                self._reader = None
+        self.conn.close()
+
+
+def create_storage(path, journal_mode=False, save_delay=0.5, lazy_content=False):
+    """根据文件扩展名选择存储后端"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension in SQLITE_EXTENSIONS:
+        return SqliteTaskStorage(path, lazy_content)
+    if extension in PACK_EXTENSIONS:
+        return PackTaskStorage(path, journal_mode, save_delay, lazy_content)
+    return JsonTaskStorage(path, journal_mode, save_delay, lazy_content)
+
+
+def migrate_storage(source_path, target_path):
+    """一次性把任务从一种存储迁移到另一种存储，返回迁移的任务数"""
+    source = create_storage(source_path)
+    try:
+        tasks = source.load()
+    finally:
+        source.close()
+    migrate_tasks(tasks, source.schema_version)
+
+    target = create_storage(target_path)
+    try:
+        target.save(tasks)
+    finally:
+        target.close()
+    return len(tasks)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="在不同格式的任务存储之间迁移数据")
+    parser.add_argument("source", help="源数据文件，如 tasks.json")
+    parser.add_argument("target", help="目标数据文件，如 tasks.db 或 tasks.pack")
+    args = parser.parse_args()
+    count = migrate_storage(args.source, args.target)
+    print(f"已迁移 {count} 个任务: {args.source} -> {args.target}")
@@ -0,0 +1,124 @@
+import os
+import threading
+
+from PyQt6.QtCore import QObject, QFileSystemWatcher, QTimer, Qt, pyqtSignal
+
+from task_schema import migrate_tasks
+from task_storage import file_signature
+
+
+class TaskFileWatcher(QObject):
+    """监视任务数据文件，被外部工具或同步盘修改后自动重新加载
+
+    文件变化由QFileSystemWatcher通知，同时定时比较文件签名作为兜底（部分
+    网络盘和同步盘不发出通知）。签名与存储最近一次读写时一致的变化是本程序
+    自己的写入，直接忽略；否则在后台线程解析文件，回到GUI线程后按任务合并。
+    """
+
+    # 合并连续文件事件的等待时间
+    DEBOUNCE_MS = 300
+    # 兜底轮询间隔
+    POLL_MS = 2000
+
+    # 后台线程解析完成：(存储, 文件签名, 任务列表)
+    loaded = pyqtSignal(object, object, object)
+    # 外部修改已合并，参数为ChangeSet
+    reloaded = pyqtSignal(object)
+
+    def __init__(self, task_manager, parent=None):
+        super().__init__(parent)
+        self.task_manager = task_manager
+        self.path = None
+        self._loading = False
+        self._failed_signature = None
+
+        self._watcher = QFileSystemWatcher(self)
+        self._watcher.fileChanged.connect(self._schedule_check)
+        self._watcher.directoryChanged.connect(self._schedule_check)
+
+        self._debounce = QTimer(self)
+        self._debounce.setSingleShot(True)
+        self._debounce.setInterval(self.DEBOUNCE_MS)
+        self._debounce.timeout.connect(self.check)
+
+        self._poll = QTimer(self)
+        self._poll.setInterval(self.POLL_MS)
+        self._poll.timeout.connect(self.check)
+        self._poll.start()
+
+        self.loaded.connect(self._on_loaded, Qt.ConnectionType.QueuedConnection)
+        self.watch()
+
+    def watch(self):
+        """监视当前的数据文件及其所在目录（切换存储位置后重新调用）"""
+        paths = self._watcher.files() + self._watcher.directories()
+        if paths:
+            self._watcher.removePaths(paths)
+        self.path = self.task_manager.data_path
+        self._watcher.addPath(os.path.dirname(self.path))
+        if os.path.exists(self.path):
+            self._watcher.addPath(self.path)
+
+    def _schedule_check(self, _path=None):
+        # 文件被原子替换后原来的监视会失效，需要重新加入
+        if os.path.exists(self.path) and self.path not in self._watcher.files():
+            self._watcher.addPath(self.path)
+        self._debounce.start()
+
+    def check(self):
+        """比较文件签名，发现外部修改时在后台线程中解析"""
+        if self.task_manager.data_path != self.path:
+            self.watch()
+        storage = self.task_manager.storage
+        if self._loading or not storage.supports_hot_reload:
+            return
+        if self.task_manager.in_batch():
+            # 批量变更（导入时处理事件）期间合并的外部修改会随回滚丢失，结束后再检查
+            self._debounce.start()
+            return
+        if storage.metrics().get("pending"):
+            # 本程序的写入尚未完成，等写入后再比较
+            return
+        signature = file_signature(self.path)
+        if signature is None or signature in (storage.disk_state[0], self._failed_signature):
+            return
+        self._loading = True
+        threading.Thread(target=self._load, args=(storage, signature), daemon=True).start()
+
+    def _load(self, storage, signature):
+        tasks = None
+        try:
+            tasks, version = storage.read_snapshot(storage.path)
+            migrate_tasks(tasks, version)
+            if file_signature(storage.path) != signature:
+                # 读取期间文件又被修改，下次检查时重新读取
+                signature = tasks = None
+        except Exception as e:
+            print(f"重新加载任务数据出错: {e}")
+            self._failed_signature = signature
+            signature = None
+        self.loaded.emit(storage, signature, tasks)
+
+    def _on_loaded(self, storage, signature, tasks):
+        self._loading = False
+        if tasks is None:
+            if signature is None and self._failed_signature is None:
+                self._debounce.start()
+            return
+        self._failed_signature = None
+        if storage is not self.task_manager.storage or signature == storage.disk_state[0]:
+            return
+        if self.task_manager.in_batch():
+            self._debounce.start()
+            return
+        changes = self.task_manager.apply_external_changes(signature, tasks)
+        if changes:
+            self.reloaded.emit(changes)
+
+    def stop(self):
+        """停止监视"""
+        self._poll.stop()
+        self._debounce.stop()
+        paths = self._watcher.files() + self._watcher.directories()
+        if paths:
+            self._watcher.removePaths(paths)
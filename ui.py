@@ -4,11 +4,20 @@ from PyQt6.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
                             QPushButton, QListWidget, QListWidgetItem, QDialog, 
                             QTextEdit, QLabel, QFileDialog, QMessageBox, QMenu,
                             QSystemTrayIcon, QApplication, QSlider, QGroupBox, QStyle,
-                            QComboBox, QLineEdit)
-from PyQt6.QtCore import Qt, QSize, QSettings
-from PyQt6.QtGui import QIcon, QAction
+                            QComboBox, QLineEdit, QProgressDialog, QInputDialog,
+                            QCheckBox, QDateTimeEdit)
+from PyQt6.QtCore import Qt, QSize, QSettings, QDateTime, QTimer, pyqtSignal
+from PyQt6.QtGui import QIcon, QAction, QKeySequence
 
-from task_manager import TaskManager
+from task_manager import TaskManager, IMPORT_NEWEST, IMPORT_KEEP_LOCAL, IMPORT_KEEP_IMPORTED
+from task_schema import PRIORITY_LOW, PRIORITY_NORMAL, PRIORITY_HIGH, PRIORITY_URGENT
+from task_index import task_overdue, task_priority
+from task_record import now_timestamp
+from task_export import (EXPORT_JSON, EXPORT_NDJSON, EXPORT_CSV, EXPORT_MARKDOWN,
+                         EXPORT_ALL, EXPORT_ACTIVE, EXPORT_WALLPAPER)
+from task_signals import TaskChangeSignals
+from task_watcher import TaskFileWatcher
+from task_scheduler import TaskScheduler
 from wallpaper_manager import WallpaperManager
 from logo_generator import create_logo
 from style_manager import StyleManager
@@ -17,7 +26,17 @@ from wallpaper_settings import WallpaperSettingsDialog
 
 class MarkdownEditor(QDialog):
     """Markdown编辑对话框"""
-    def __init__(self, title="", content="", parent=None):
+    
+    # 优先级选项，按显示顺序
+    PRIORITIES = (
+        ("紧急", PRIORITY_URGENT),
+        ("高", PRIORITY_HIGH),
+        ("普通", PRIORITY_NORMAL),
+        ("低", PRIORITY_LOW),
+    )
+    
+    def __init__(self, title="", content="", parent=None, priority=PRIORITY_NORMAL, tags=(), category="",
+                 due_at=None, remind_at=None):
         super().__init__(parent)
         self.setWindowTitle("编辑任务")
         self.resize(600, 400)
@@ -33,6 +52,31 @@ class MarkdownEditor(QDialog):
         title_layout.addWidget(self.title_edit)
         layout.addLayout(title_layout)
         
+        # 优先级、分类和标签
+        attributes_layout = QHBoxLayout()
+        attributes_layout.addWidget(QLabel("优先级:"))
+        self.priority_combo = QComboBox()
+        for label, value in self.PRIORITIES:
+            self.priority_combo.addItem(label, value)
+        index = self.priority_combo.findData(priority)
+        self.priority_combo.setCurrentIndex(index if index >= 0 else self.priority_combo.findData(PRIORITY_NORMAL))
+        attributes_layout.addWidget(self.priority_combo)
+        attributes_layout.addWidget(QLabel("分类:"))
+        self.category_edit = QLineEdit(category)
+        self.category_edit.setPlaceholderText("例如：工作")
+        attributes_layout.addWidget(self.category_edit)
+        attributes_layout.addWidget(QLabel("标签:"))
+        self.tags_edit = QLineEdit(", ".join(tags))
+        self.tags_edit.setPlaceholderText("多个标签用逗号分隔")
+        attributes_layout.addWidget(self.tags_edit)
+        layout.addLayout(attributes_layout)
+        
+        # 截止时间和提醒时间，不勾选表示不设置
+        time_layout = QHBoxLayout()
+        self.due_check, self.due_edit = self._add_time_field(time_layout, "截止时间", due_at)
+        self.remind_check, self.remind_edit = self._add_time_field(time_layout, "提醒时间", remind_at)
+        layout.addLayout(time_layout)
+        
         # 添加说明标签
         help_text = """任务内容 (支持Markdown语法)：
 # 标题
@@ -62,6 +106,36 @@ class MarkdownEditor(QDialog):
         self.save_button.clicked.connect(self.accept)
         self.cancel_button.clicked.connect(self.reject)
     
+    def _add_time_field(self, layout, label, value):
+        """添加一个可选的时间输入：勾选框加日期时间编辑框"""
+        check = QCheckBox(label + ":")
+        edit = QDateTimeEdit()
+        edit.setCalendarPopup(True)
+        edit.setDisplayFormat("yyyy-MM-dd HH:mm")
+        moment = QDateTime.fromString(value, Qt.DateFormat.ISODate) if value else QDateTime()
+        check.setChecked(moment.isValid())
+        edit.setDateTime(moment if moment.isValid() else QDateTime.currentDateTime().addSecs(3600))
+        edit.setEnabled(check.isChecked())
+        check.toggled.connect(edit.setEnabled)
+        layout.addWidget(check)
+        layout.addWidget(edit)
+        return check, edit
+    
+    @staticmethod
+    def _time_value(check, edit):
+        # 未勾选时返回空字符串，表示清除该时间
+        if not check.isChecked():
+            return ""
+        return edit.dateTime().toPyDateTime().replace(second=0, microsecond=0).isoformat()
+    
+    def get_due_at(self):
+        """获取截止时间（ISO字符串），未设置时为空字符串"""
+        return self._time_value(self.due_check, self.due_edit)
+    
+    def get_remind_at(self):
+        """获取提醒时间（ISO字符串），未设置时为空字符串"""
+        return self._time_value(self.remind_check, self.remind_edit)
+    
     def get_title(self):
         """获取编辑后的标题"""
         return self.title_edit.text()
@@ -69,9 +143,40 @@ class MarkdownEditor(QDialog):
     def get_content(self):
         """获取编辑后的内容"""
         return self.editor.toPlainText()
+    
+    def get_priority(self):
+        """获取选择的优先级"""
+        return self.priority_combo.currentData()
+    
+    def get_tags(self):
+        """获取输入的标签（逗号分隔的字符串）"""
+        return self.tags_edit.text()
+    
+    def get_category(self):
+        """获取输入的分类"""
+        return self.category_edit.text()
 
 class MainWindow(QMainWindow):
     """主窗口"""
+    
+    # 会影响任务列表显示的字段
+    LIST_FIELDS = {"title", "content", "is_completed", "show_on_wallpaper", "priority", "tags", "category",
+                   "due_at"}
+    
+    # 列表中高优先级任务的标记
+    PRIORITY_MARKS = {PRIORITY_URGENT: "❗ ", PRIORITY_HIGH: "⬆️ "}
+    
+    # 已完成任务每页显示的数量
+    COMPLETED_PAGE_SIZE = 100
+    # 标记“显示更多”列表项的数据角色
+    MORE_ITEM_ROLE = Qt.ItemDataRole.UserRole + 1
+    
+    # 搜索框停止输入多久后再搜索
+    SEARCH_DEBOUNCE_MS = 250
+    
+    # 后台线程建好搜索索引（从后台线程发出，在GUI线程中处理）
+    search_index_built = pyqtSignal()
+    
     def __init__(self):
         super().__init__()
         self.setWindowTitle("桌面壁纸任务清单")
@@ -87,10 +192,19 @@ class MainWindow(QMainWindow):
         self.style_name = self.settings.value("style_name", "现代蓝", type=str)
         
         # 初始化管理器
-        self.task_manager = TaskManager()
+        self.task_manager = TaskManager(
+            data_path=self.settings.value("data_path", "", type=str) or None,
+            journal_mode=self.settings.value("journal_mode", False, type=bool),
+            save_delay=self.settings.value("save_delay_ms", 500, type=int) / 1000,
+            lazy_content=self.settings.value("lazy_content", False, type=bool),
+            archive_days=self.settings.value("archive_days", 30, type=int),
+            undo_limit=self.settings.value("undo_limit", 100, type=int))
         self.wallpaper_manager = WallpaperManager(self.task_manager)
         self.wallpaper_manager.set_font_size(self.font_size)
         
+        # 已完成任务列表当前显示的数量
+        self.completed_limit = self.COMPLETED_PAGE_SIZE
+        
         # 从设置中加载任务区域位置
         try:
             position = self.settings.value("task_position", [0.5, 0.15, 0.95, 0.95])
@@ -156,6 +270,20 @@ class MainWindow(QMainWindow):
         task_filter_layout.addWidget(self.show_completed_button)
         task_filter_layout.addStretch(1)
         
+        # 全文搜索标题和内容
+        self.search_edit = QLineEdit()
+        self.search_edit.setPlaceholderText("搜索任务...")
+        self.search_edit.setClearButtonEnabled(True)
+        self.search_edit.textChanged.connect(self.on_search_text_changed)
+        task_filter_layout.addWidget(self.search_edit)
+        
+        # 连续输入时只在停顿后搜索一次
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(self.SEARCH_DEBOUNCE_MS)
+        self.search_timer.timeout.connect(self.load_tasks)
+        self.search_index_built.connect(self.on_search_index_built)
+        
         tasks_layout.addLayout(task_filter_layout)
         
         # 任务列表 - 修复滚动问题
@@ -163,6 +291,7 @@ class MainWindow(QMainWindow):
         self.task_list.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
         self.task_list.customContextMenuRequested.connect(self.show_context_menu)
         self.task_list.setAlternatingRowColors(True)
+        self.task_list.setSelectionMode(QListWidget.SelectionMode.ExtendedSelection)  # 支持多选批量操作
         self.task_list.setVerticalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAsNeeded)  # 确保显示滚动条
         self.task_list.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAsNeeded)
         self.task_list.setMinimumHeight(300)  # 设置最小高度确保有足够空间
@@ -214,6 +343,7 @@ class MainWindow(QMainWindow):
             }
         """)
         self.task_list.itemDoubleClicked.connect(self.edit_task)
+        self.task_list.itemClicked.connect(self.on_item_clicked)
         tasks_layout.addWidget(self.task_list)
         
         # 任务操作按钮区
@@ -244,6 +374,26 @@ class MainWindow(QMainWindow):
         task_buttons_layout.addWidget(self.delete_button)
         task_buttons_layout.addWidget(self.complete_button)
         
+        # 撤销/重做：删除、修改、导入等操作都可以撤销，快捷键Ctrl+Z / Ctrl+Y
+        self.undo_action = QAction("撤销", self)
+        self.undo_action.setShortcut(QKeySequence.StandardKey.Undo)
+        self.undo_action.triggered.connect(self.undo)
+        self.redo_action = QAction("重做", self)
+        self.redo_action.setShortcuts([QKeySequence.StandardKey.Redo, QKeySequence("Ctrl+Y")])
+        self.redo_action.triggered.connect(self.redo)
+        self.addAction(self.undo_action)
+        self.addAction(self.redo_action)
+        
+        self.undo_button = QPushButton("撤销")
+        self.undo_button.setIcon(QIcon.fromTheme("edit-undo", self.style().standardIcon(QStyle.StandardPixmap.SP_ArrowBack)))
+        self.undo_button.clicked.connect(self.undo_action.trigger)
+        self.redo_button = QPushButton("重做")
+        self.redo_button.setIcon(QIcon.fromTheme("edit-redo", self.style().standardIcon(QStyle.StandardPixmap.SP_ArrowForward)))
+        self.redo_button.clicked.connect(self.redo_action.trigger)
+        task_buttons_layout.addWidget(self.undo_button)
+        task_buttons_layout.addWidget(self.redo_button)
+        self.update_undo_actions()
+        
         tasks_layout.addLayout(task_buttons_layout)
         main_layout.addWidget(tasks_panel, 1)  # 让任务列表区域占据更多空间
         
@@ -312,6 +462,21 @@ class MainWindow(QMainWindow):
         # 创建系统托盘
         self.setup_tray_icon()
         
+        # 任务变更后通过队列信号刷新任务列表
+        self.task_signals = TaskChangeSignals(self.task_manager, self)
+        self.task_signals.connect_queued(self.on_tasks_changed)
+        
+        # 任务到达截止时间或提醒时间时准时通知，逾期的任务在列表和壁纸上突出显示
+        self.task_scheduler = TaskScheduler(self.task_manager, self)
+        self.task_scheduler.due.connect(self.on_tasks_due)
+        self.task_scheduler.reminded.connect(self.on_tasks_reminded)
+        
+        # 数据文件被外部工具或同步盘修改后自动重新加载
+        self.task_watcher = None
+        if self.settings.value("hot_reload", True, type=bool):
+            self.task_watcher = TaskFileWatcher(self.task_manager, self)
+            self.task_watcher.reloaded.connect(self.on_tasks_reloaded)
+        
         # 加载任务
         self.load_tasks()
         
@@ -388,6 +553,12 @@ class MainWindow(QMainWindow):
         # 恢复原壁纸
         self.wallpaper_manager.restore_original_wallpaper()
         
+        # 确保任务数据已写入磁盘
+        self.task_scheduler.stop()
+        if self.task_watcher is not None:
+            self.task_watcher.stop()
+        self.task_manager.close()
+        
         # 清理Markdown渲染器
         if hasattr(self.wallpaper_manager, 'md_renderer'):
             self.wallpaper_manager.md_renderer.cleanup()
@@ -402,16 +573,38 @@ class MainWindow(QMainWindow):
         """加载任务列表，根据过滤条件显示"""
         self.task_list.clear()
         
-        tasks = self.task_manager.get_all_tasks()
-        
         # 根据过滤条件显示任务
+        query = self.search_edit.text().strip() if hasattr(self, 'search_edit') else ""
+        has_more = False
         if hasattr(self, 'current_filter') and self.current_filter == "completed":
-            # 仅显示已完成任务
-            filtered_tasks = [task for task in tasks if task["is_completed"]]
+            if query:
+                # 在全部已完成任务中搜索，包括存档中的任务（第一次打开时读取存档）
+                filtered_tasks = self.task_manager.get_completed_tasks(include_archived=True)
+            else:
+                # 最近完成的在前，分页显示，翻到常驻任务之后才读取存档
+                filtered_tasks = self.task_manager.get_recent_completed_tasks(
+                    limit=self.completed_limit + 1, include_archived=True)
+                has_more = len(filtered_tasks) > self.completed_limit
+                filtered_tasks = filtered_tasks[:self.completed_limit]
         else:
             # 默认显示未完成任务
-            filtered_tasks = [task for task in tasks if not task["is_completed"]]
-        
+            filtered_tasks = self.task_manager.get_active_tasks()
+        
+        # 有搜索词时只显示匹配的任务，按相关度排序，已完成任务中存档的排在常驻的之后；
+        # 索引还在后台建立时先按标题过滤
+        if query and self.search_indexes_ready():
+            visible = {task["id"]: task for task in filtered_tasks}
+            matched = self.task_manager.search_tasks(query)
+            if getattr(self, 'current_filter', None) == "completed":
+                matched = matched + self.task_manager.search_archived_tasks(query)
+            filtered_tasks = [visible[task_id] for task_id in dict.fromkeys(matched) if task_id in visible]
+        elif query:
+            self.prepare_search_index()
+            words = query.lower().split()
+            filtered_tasks = [task for task in filtered_tasks
+                              if all(word in task.get("title", "").lower() for word in words)]
+        
+        now = now_timestamp()
         for task in filtered_tasks:
             item = QListWidgetItem()
             
@@ -420,7 +613,7 @@ class MainWindow(QMainWindow):
                 display_text = task["title"]
             else:
                 # 对于旧任务数据可能没有标题，使用内容的第一行
-                display_text = task["content"].split('\n')[0]
+                display_text = self.task_manager.get_task_content(task["id"]).split('\n')[0]
                 if len(display_text) > 50:
                     display_text = display_text[:47] + "..."
             
@@ -428,12 +621,27 @@ class MainWindow(QMainWindow):
             show_on_wallpaper = task.get("show_on_wallpaper", True)
             if show_on_wallpaper and not task["is_completed"]:
                 display_text = "🖼️ " + display_text  # 添加壁纸图标
+            display_text = self.PRIORITY_MARKS.get(task_priority(task), "") + display_text
+            
+            # 分类和标签显示在标题后面
+            if task.get("category"):
+                display_text += f"  [{task['category']}]"
+            if task.get("tags"):
+                display_text += "  " + " ".join(f"#{tag}" for tag in task["tags"])
+            
+            # 截止时间显示在最后，逾期的任务标红
+            overdue = task_overdue(task, now)
+            if task.get("due_at") and not task["is_completed"]:
+                display_text += f"  截止 {task['due_at'][5:16].replace('T', ' ')}"
+            if overdue:
+                display_text = "⏰ " + display_text
+                item.setForeground(Qt.GlobalColor.red)
             
             # 设置文本
             item.setText(display_text)
             
-            # 存储完整任务数据
-            item.setData(Qt.ItemDataRole.UserRole, task)
+            # 只存储任务ID，需要时再从任务管理器查找
+            item.setData(Qt.ItemDataRole.UserRole, task["id"])
             
             # 设置已完成任务的样式
             if task["is_completed"]:
@@ -444,6 +652,12 @@ class MainWindow(QMainWindow):
                 item.setFont(font)
             
             self.task_list.addItem(item)
+        
+        if has_more:
+            item = QListWidgetItem(f"显示更多已完成任务（已显示 {len(filtered_tasks)} 个）...")
+            item.setData(self.MORE_ITEM_ROLE, True)
+            item.setForeground(Qt.GlobalColor.darkGray)
+            self.task_list.addItem(item)
             
         # 根据当前过滤类型设置按钮文本
         if hasattr(self, 'current_filter') and self.current_filter == "completed":
@@ -451,6 +665,53 @@ class MainWindow(QMainWindow):
         else:
             self.complete_button.setText("标记为已完成")
     
+    def on_tasks_changed(self, changes):
+        """任务变更时刷新任务列表，只改动了列表不显示的字段时跳过"""
+        self.update_undo_actions()
+        if changes.reset or changes.added or changes.removed:
+            self.load_tasks()
+        elif any(fields & self.LIST_FIELDS for fields in changes.updated.values()):
+            self.load_tasks()
+    
+    def on_tasks_due(self, task_ids):
+        """任务到达截止时间：重新绘制逾期标记"""
+        self.wallpaper_manager.on_tasks_due(task_ids)
+        self.load_tasks()
+    
+    def on_tasks_reminded(self, task_ids):
+        """任务到达提醒时间：在托盘弹出通知"""
+        tasks = [task for task in map(self.task_manager.get_task, task_ids) if task is not None]
+        if tasks:
+            titles = "\n".join(task.get("title") or self.task_manager.get_task_content(task["id"]).split('\n')[0]
+                               for task in tasks[:5])
+            if len(tasks) > 5:
+                titles += f"\n等 {len(tasks)} 个任务"
+            self.tray_icon.showMessage("任务提醒", titles, QSystemTrayIcon.MessageIcon.Information, 10000)
+    
+    def on_tasks_reloaded(self, changes):
+        """外部修改的任务已合并"""
+        count = len(changes.added) + len(changes.updated) + len(changes.removed)
+        self.statusBar().showMessage(f"已重新加载外部修改的 {count} 个任务", 3000)
+    
+    def update_undo_actions(self):
+        """按撤销历史更新撤销/重做的可用状态"""
+        can_undo = self.task_manager.can_undo()
+        can_redo = self.task_manager.can_redo()
+        self.undo_action.setEnabled(can_undo)
+        self.undo_button.setEnabled(can_undo)
+        self.redo_action.setEnabled(can_redo)
+        self.redo_button.setEnabled(can_redo)
+    
+    def undo(self):
+        """撤销上一次操作"""
+        if self.task_manager.undo():
+            self.statusBar().showMessage("已撤销", 2000)
+    
+    def redo(self):
+        """重做撤销的操作"""
+        if self.task_manager.redo():
+            self.statusBar().showMessage("已重做", 2000)
+    
     def add_task(self):
         """添加新任务"""
         dialog = MarkdownEditor(parent=self)
@@ -458,69 +719,150 @@ class MainWindow(QMainWindow):
             title = dialog.get_title()
             content = dialog.get_content()
             if title.strip() or content.strip():
-                self.task_manager.add_task(title, content)
-                self.load_tasks()
+                self.task_manager.add_task(title, content, priority=dialog.get_priority(),
+                                           tags=dialog.get_tags(), category=dialog.get_category(),
+                                           due_at=dialog.get_due_at(), remind_at=dialog.get_remind_at())
     
     def edit_task(self):
         """编辑任务"""
-        current_item = self.task_list.currentItem()
-        if current_item:
-            task = current_item.data(Qt.ItemDataRole.UserRole)
+        task = self.task_for_item(self.task_list.currentItem())
+        if task:
             title = task.get("title", "")
-            content = task.get("content", "")
+            # 内容在打开编辑器时才按需读取
+            content = self.task_manager.get_task_content(task["id"])
             
-            dialog = MarkdownEditor(title, content, parent=self)
+            dialog = MarkdownEditor(title, content, parent=self, priority=task_priority(task),
+                                    tags=task.get("tags") or (), category=task.get("category") or "",
+                                    due_at=task.get("due_at"), remind_at=task.get("remind_at"))
             if dialog.exec() == QDialog.DialogCode.Accepted:
                 new_title = dialog.get_title()
                 new_content = dialog.get_content()
                 if new_title.strip() or new_content.strip():
-                    self.task_manager.update_task(task["id"], title=new_title, content=new_content)
-                    self.load_tasks()
+                    self.task_manager.update_task(task["id"], title=new_title, content=new_content,
+                                                  priority=dialog.get_priority(), tags=dialog.get_tags(),
+                                                  category=dialog.get_category(), due_at=dialog.get_due_at(),
+                                                  remind_at=dialog.get_remind_at())
+    
+    def selected_tasks(self):
+        """获取选中的任务，没有多选时退回到当前任务"""
+        items = self.task_list.selectedItems()
+        if not items and self.task_list.currentItem():
+            items = [self.task_list.currentItem()]
+        tasks = [self.task_for_item(item) for item in items]
+        return [task for task in tasks if task is not None]
+    
+    def task_for_item(self, item):
+        """列表项对应的任务，任务已不存在时返回None"""
+        if item is None:
+            return None
+        return self.task_manager.get_task(item.data(Qt.ItemDataRole.UserRole))
     
     def delete_task(self):
-        """删除任务"""
-        current_item = self.task_list.currentItem()
-        if current_item:
-            task = current_item.data(Qt.ItemDataRole.UserRole)
+        """删除选中的任务"""
+        tasks = self.selected_tasks()
+        if tasks:
+            message = "确定要删除此任务吗？" if len(tasks) == 1 else f"确定要删除选中的 {len(tasks)} 个任务吗？"
             confirm = QMessageBox.question(
                 self, "确认删除", 
-                "确定要删除此任务吗？",
+                message,
                 QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
             
             if confirm == QMessageBox.StandardButton.Yes:
-                self.task_manager.delete_task(task["id"])
-                self.load_tasks()
+                # 批量删除只保存一次、刷新一次壁纸
+                self.task_manager.delete_tasks([task["id"] for task in tasks])
     
     def toggle_task_completion(self):
-        """切换任务完成状态"""
-        current_item = self.task_list.currentItem()
-        if current_item:
-            task = current_item.data(Qt.ItemDataRole.UserRole)
-            self.task_manager.update_task(task["id"], is_completed=not task["is_completed"])
-            self.load_tasks()
+        """切换选中任务的完成状态"""
+        tasks = self.selected_tasks()
+        if tasks:
+            with self.task_manager.batch():
+                for task in tasks:
+                    self.task_manager.update_task(task["id"], is_completed=not task["is_completed"])
+    
+    # 导入时ID冲突的处理策略
+    IMPORT_POLICIES = (
+        ("以较新的为准", IMPORT_NEWEST),
+        ("保留本地任务", IMPORT_KEEP_LOCAL),
+        ("使用导入的任务", IMPORT_KEEP_IMPORTED),
+    )
     
     def import_tasks(self):
-        """导入任务"""
+        """导入任务，与现有任务按ID合并"""
         file_path, _ = QFileDialog.getOpenFileName(
-            self, "导入任务", "", "JSON文件 (*.json)")
-        
-        if file_path:
-            if self.task_manager.import_tasks(file_path):
-                self.load_tasks()
-                QMessageBox.information(self, "导入成功", "任务已成功导入")
-            else:
-                QMessageBox.warning(self, "导入失败", "无法导入任务，请检查文件格式")
+            self, "导入任务", "", "JSON文件 (*.json);;NDJSON文件 (*.ndjson *.jsonl)")
+        if not file_path:
+            return
+        
+        names = [name for name, _ in self.IMPORT_POLICIES]
+        policies = [policy for _, policy in self.IMPORT_POLICIES]
+        current = self.settings.value("import_policy", IMPORT_NEWEST, type=str)
+        name, ok = QInputDialog.getItem(
+            self, "导入任务", "已存在相同任务时：", names,
+            policies.index(current) if current in policies else 0, False)
+        if not ok:
+            return
+        policy = policies[names.index(name)]
+        self.settings.setValue("import_policy", policy)
+        
+        progress_dialog = QProgressDialog("正在导入任务...", "取消", 0, 100, self)
+        progress_dialog.setWindowTitle("导入任务")
+        progress_dialog.setWindowModality(Qt.WindowModality.WindowModal)
+        progress_dialog.setMinimumDuration(500)
+        
+        def on_progress(count, bytes_read, total_bytes):
+            if total_bytes:
+                progress_dialog.setValue(min(99, bytes_read * 100 // total_bytes))
+            progress_dialog.setLabelText(f"正在导入任务... 已处理 {count} 个")
+            QApplication.processEvents()
+            return not progress_dialog.wasCanceled()
+        
+        result = self.task_manager.import_tasks(file_path, policy, on_progress)
+        progress_dialog.close()
+        
+        if not result:
+            QMessageBox.warning(self, "导入失败", "无法导入任务，请检查文件格式")
+        elif result["cancelled"]:
+            self.statusBar().showMessage("导入已取消", 3000)
+        else:
+            QMessageBox.information(
+                self, "导入成功",
+                f"新增 {result['added']} 个任务，更新 {result['updated']} 个，"
+                f"跳过 {result['skipped']} 个")
+    
+    # 导出格式：(文件过滤器, 格式)
+    EXPORT_FORMATS = (
+        ("JSON文件 (*.json)", EXPORT_JSON),
+        ("NDJSON文件 (*.ndjson *.jsonl)", EXPORT_NDJSON),
+        ("CSV表格 (*.csv)", EXPORT_CSV),
+        ("Markdown清单 (*.md)", EXPORT_MARKDOWN),
+    )
+    
+    # 导出范围
+    EXPORT_SCOPES = (
+        ("全部任务", EXPORT_ALL),
+        ("未完成的任务", EXPORT_ACTIVE),
+        ("显示在壁纸上的任务", EXPORT_WALLPAPER),
+    )
     
     def export_tasks(self):
         """导出任务"""
-        file_path, _ = QFileDialog.getSaveFileName(
-            self, "导出任务", "", "JSON文件 (*.json)")
-        
-        if file_path:
-            if self.task_manager.export_tasks(file_path):
-                QMessageBox.information(self, "导出成功", "任务已成功导出")
-            else:
-                QMessageBox.warning(self, "导出失败", "无法导出任务")
+        filters = [name for name, _ in self.EXPORT_FORMATS]
+        file_path, selected_filter = QFileDialog.getSaveFileName(
+            self, "导出任务", "", ";;".join(filters))
+        if not file_path:
+            return
+        export_format = dict(self.EXPORT_FORMATS).get(selected_filter, EXPORT_JSON)
+        
+        names = [name for name, _ in self.EXPORT_SCOPES]
+        name, ok = QInputDialog.getItem(self, "导出任务", "导出范围：", names, 0, False)
+        if not ok:
+            return
+        scope = dict(self.EXPORT_SCOPES)[name]
+        
+        if self.task_manager.export_tasks(file_path, export_format, scope):
+            QMessageBox.information(self, "导出成功", "任务已成功导出")
+        else:
+            QMessageBox.warning(self, "导出失败", "无法导出任务")
     
     def refresh_wallpaper(self):
         """手动刷新壁纸"""
@@ -538,10 +880,8 @@ class MainWindow(QMainWindow):
     
     def show_context_menu(self, position):
         """显示右键菜单"""
-        current_item = self.task_list.currentItem()
-        if current_item:
-            task = current_item.data(Qt.ItemDataRole.UserRole)
-            
+        task = self.task_for_item(self.task_list.currentItem())
+        if task:
             context_menu = QMenu(self)
             edit_action = context_menu.addAction("编辑")
             complete_action = context_menu.addAction(
@@ -568,19 +908,13 @@ class MainWindow(QMainWindow):
     def toggle_task_wallpaper_visibility(self, task):
         """切换任务在壁纸上的显示状态"""
         current_state = task.get("show_on_wallpaper", True)
+        # 任务列表和壁纸会在收到变更通知后自动刷新
         self.task_manager.update_task(task["id"], show_on_wallpaper=not current_state)
-        
-        # 更新视觉提示
-        self.load_tasks()
-        
-        # 刷新壁纸
-        self.refresh_wallpaper()
     
     def toggle_selected_task_wallpaper(self):
         """切换选中任务在壁纸上的显示状态"""
-        current_item = self.task_list.currentItem()
-        if current_item:
-            task = current_item.data(Qt.ItemDataRole.UserRole)
+        task = self.task_for_item(self.task_list.currentItem())
+        if task:
             self.toggle_task_wallpaper_visibility(task)
 
     def on_font_size_changed(self, value):
@@ -648,9 +982,42 @@ class MainWindow(QMainWindow):
         self.apply_style(style_name)
         self.statusBar().showMessage(f"已切换到 {style_name} 风格", 3000)
     
+    def on_search_text_changed(self, text):
+        """搜索词变化：索引尚未建立时开始在后台建立，停止输入后再刷新列表"""
+        if text.strip():
+            self.prepare_search_index()
+        self.search_timer.start()
+    
+    def search_indexes_ready(self):
+        """当前列表需要的搜索索引是否都已建好：查看已完成任务时还需要存档的索引"""
+        return self.task_manager.search_index_ready() and (
+            getattr(self, 'current_filter', None) != "completed"
+            or self.task_manager.archive_search_index_ready())
+    
+    def prepare_search_index(self):
+        """在后台建立搜索索引，建立期间在状态栏显示提示"""
+        if not self.search_indexes_ready():
+            self.statusBar().showMessage("正在建立搜索索引，暂时只按标题搜索...")
+            self.task_manager.prepare_search_index(self.search_index_built.emit)
+            if getattr(self, 'current_filter', None) == "completed":
+                self.task_manager.prepare_archive_search_index(self.search_index_built.emit)
+    
+    def on_search_index_built(self):
+        """搜索索引建好后按全文重新搜索"""
+        self.statusBar().showMessage("搜索索引已建立", 2000)
+        if self.search_edit.text().strip():
+            self.load_tasks()
+    
+    def on_item_clicked(self, item):
+        """点击“显示更多”时加载下一页已完成任务"""
+        if item.data(self.MORE_ITEM_ROLE):
+            self.completed_limit += self.COMPLETED_PAGE_SIZE
+            self.load_tasks()
+    
     def filter_tasks(self, filter_type):
         """过滤任务列表显示"""
         self.current_filter = filter_type
+        self.completed_limit = self.COMPLETED_PAGE_SIZE
         
         # 更新按钮样式
         if filter_type == "active":
@@ -0,0 +1,149 @@
+import hashlib
+import os
+from collections import OrderedDict
+
+from PIL import Image
+
+
+class BaseImageCache:
+    """解码后的原始壁纸缓存
+
+    以(路径, 修改时间, 文件大小)为键，只保留最近的一张：文件不变时不再解码，
+    壁纸文件被替换或修改后，下次获取时自动重新读取。图像解码后立即转换为合成
+    使用的RGBA模式，之后的刷新不必再转换。返回的图像是共享的，调用者不应修改它。
+    generation在每次重新读取后递增，可以作为由底图派生的缓存的键。
+    """
+
+    # 没有原始壁纸或无法读取时使用的纯色背景
+    FALLBACK_SIZE = (1920, 1080)
+    FALLBACK_COLOR = (30, 30, 40, 255)
+
+    def __init__(self):
+        self._key = None
+        self._image = None
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _file_key(path):
+        if not path:
+            return None
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return (path, stat.st_mtime_ns, stat.st_size)
+
+    def get(self, path):
+        """获取path对应的RGBA图像，文件不存在或无法解码时返回纯色背景"""
+        key = self._file_key(path)
+        if self._image is not None and key == self._key:
+            self.hits += 1
+            return self._image
+        self.misses += 1
+        image = None
+        if key is not None:
+            try:
+                with Image.open(path) as source:
+                    image = source.convert("RGBA")
+            except Exception as e:
+                # 解码失败的文件在变化之前不再重试
+                print(f"加载原始壁纸图片失败: {e}")
+        if image is None:
+            image = Image.new("RGBA", self.FALLBACK_SIZE, self.FALLBACK_COLOR)
+        self._key = key
+        self._image = image
+        self.generation += 1
+        return image
+
+    def clear(self):
+        """释放缓存的图像"""
+        self._key = None
+        self._image = None
+
+
+class LayerCache:
+    """缓存一张渲染好的图层，键变化时才重新渲染
+
+    键应包含决定图层内容的全部因素，只保留最近的一张。返回的图层是共享的，
+    调用者应在副本上继续绘制。
+    """
+
+    def __init__(self):
+        self._key = None
+        self._image = None
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, render):
+        """获取键对应的图层，不存在时调用render()渲染"""
+        if self._image is not None and key == self._key:
+            self.hits += 1
+            return self._image
+        self.misses += 1
+        image = render()
+        self._key = key
+        self._image = image
+        return image
+
+    def clear(self):
+        """释放缓存的图层"""
+        self._key = None
+        self._image = None
+
+
+def tile_key(*parts):
+    """由决定图块内容的各项计算缓存键，只保存摘要，不在缓存中保留任务内容"""
+    return hashlib.blake2b(repr(parts).encode("utf-8"), digest_size=16).digest()
+
+
+class TileCache:
+    """渲染好的任务图块（RGBA图像）的LRU缓存，按占用字节数限制大小
+
+    每张图块按宽×高×4字节计算，总量超过max_bytes时丢弃最久未使用的图块，
+    但至少保留最近使用的一张。返回的图块是共享的，调用者只应读取或粘贴它。
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._tiles = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._tiles)
+
+    @staticmethod
+    def _tile_size(image):
+        return image.width * image.height * 4
+
+    def get(self, key, render):
+        """获取键对应的图块，不存在时调用render()渲染并加入缓存"""
+        image = self._tiles.get(key)
+        if image is not None:
+            self._tiles.move_to_end(key)
+            self.hits += 1
+            return image
+        self.misses += 1
+        image = render()
+        self._tiles[key] = image
+        self.size += self._tile_size(image)
+        self._evict()
+        return image
+
+    def set_max_bytes(self, max_bytes):
+        """修改内存预算，超出的部分立即丢弃"""
+        self.max_bytes = max_bytes
+        self._evict()
+
+    def _evict(self):
+        while len(self._tiles) > 1 and self.size > self.max_bytes:
+            _, image = self._tiles.popitem(last=False)
+            self.size -= self._tile_size(image)
+
+    def clear(self):
+        """释放全部图块"""
+        self._tiles.clear()
+        self.size = 0
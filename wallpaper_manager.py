@@ -9,10 +9,32 @@ from PyQt6.QtGui import QPixmap
 from PyQt6.QtCore import Qt, QBuffer, QByteArray, QIODevice
 import io
 from markdown_renderer import MarkdownRenderer
+from task_index import task_overdue, task_priority
+from task_record import now_timestamp
+from task_schema import PRIORITY_LOW, PRIORITY_HIGH, PRIORITY_URGENT
+from wallpaper_cache import BaseImageCache, LayerCache, TileCache, tile_key
 
 class WallpaperManager:
     """壁纸管理器，负责在壁纸上添加任务清单"""
     
+    # 会影响壁纸显示的任务字段
+    WALLPAPER_FIELDS = {"title", "content", "is_completed", "show_on_wallpaper", "priority", "due_at"}
+    
+    # 壁纸上最多绘制的任务数，实际显示的数量还受任务区域高度限制
+    MAX_TASKS = 50
+    
+    # 按优先级区分的任务标题颜色，其他优先级使用默认颜色
+    TITLE_COLORS = {
+        PRIORITY_URGENT: (255, 150, 150),
+        PRIORITY_HIGH: (255, 210, 150),
+        PRIORITY_LOW: (170, 170, 200),
+    }
+    DEFAULT_TITLE_COLOR = (220, 220, 255)
+    # 已过截止时间的任务标题颜色，优先于优先级颜色
+    OVERDUE_TITLE_COLOR = (255, 90, 90)
+    # 任务图块缓存的默认内存预算（字节）
+    TILE_CACHE_BYTES = 64 * 1024 * 1024
+    
     def __init__(self, task_manager):
         """初始化壁纸管理器"""
         self.task_manager = task_manager
@@ -20,15 +42,12 @@ class WallpaperManager:
         # 保存原始壁纸路径
         self.original_wallpaper = self._get_current_wallpaper()
         
-        # 在此加载原图并保存到内存中
-        if self.original_wallpaper and os.path.exists(self.original_wallpaper):
-            try:
-                self.original_image = Image.open(self.original_wallpaper).copy()
-            except Exception as e:
-                print(f"加载原始壁纸图片失败: {e}")
-                self.original_image = Image.new('RGB', (1920, 1080), (30, 30, 40))
-        else:
-            self.original_image = Image.new('RGB', (1920, 1080), (30, 30, 40))
+        # 解码后的原始壁纸，只在壁纸文件变化时重新读取
+        self.base_images = BaseImageCache()
+        # 底图加任务面板和标题的静态图层
+        self.panel_layers = LayerCache()
+        # 每个任务渲染好的Markdown图块，内容、宽度、字体大小和样式不变时直接复用
+        self.task_tiles = TileCache(self.TILE_CACHE_BYTES)
         
         # 创建临时文件目录
         self.temp_dir = os.path.join(tempfile.gettempdir(), "wallpaper_tasks")
@@ -44,12 +63,53 @@ class WallpaperManager:
         self.md_renderer = MarkdownRenderer()
         
         # 监听任务变更
-        self.task_manager.add_change_listener(self.refresh_wallpaper)
+        self.task_manager.add_change_listener(self.on_tasks_changed)
+    
+    def on_tasks_changed(self, changes):
+        """任务变更时，只有影响到壁纸显示内容才重新渲染"""
+        if self._affects_wallpaper(changes):
+            self.refresh_wallpaper()
+    
+    def on_tasks_due(self, task_ids):
+        """任务到达截止时间时，显示在壁纸上的任务需要重新绘制为逾期"""
+        if any(self._is_visible(self.task_manager.get_task(task_id)) for task_id in task_ids):
+            self.refresh_wallpaper()
+    
+    @staticmethod
+    def _is_visible(task):
+        """任务是否显示在壁纸上"""
+        return task is not None and not task["is_completed"] and task.get("show_on_wallpaper", True)
+    
+    def _affects_wallpaper(self, changes):
+        """判断变更集是否会改变壁纸上的内容"""
+        if changes.reset:
+            return True
+        
+        # 任务总数在0与非0之间变化时，空列表的提示文字会改变
+        task_count = self.task_manager.task_count()
+        if (changes.added and task_count == len(changes.added)) or (changes.removed and task_count == 0):
+            return True
+        
+        if any(self._is_visible(task) for task in changes.added.values()):
+            return True
+        if any(self._is_visible(task) for task in changes.removed.values()):
+            return True
+        for task_id, fields in changes.updated.items():
+            if not fields & self.WALLPAPER_FIELDS:
+                continue
+            if (self._is_visible(changes.previous.get(task_id))
+                    or self._is_visible(self.task_manager.get_task(task_id))):
+                return True
+        return False
     
     def set_font_size(self, size):
         """设置字体大小"""
         self.font_size = size
     
+    def set_tile_cache_budget(self, max_bytes):
+        """设置任务图块缓存的内存预算（字节）"""
+        self.task_tiles.set_max_bytes(max_bytes)
+    
     def set_task_area(self, x1, y1, x2, y2):
         """设置任务区域位置 (相对坐标 0-1)"""
         self.task_area_rel = [x1, y1, x2, y2]
@@ -91,53 +151,17 @@ class WallpaperManager:
     
     def refresh_wallpaper(self):
         try:
-            # 每次刷新时都重新加载原始壁纸，保证基础图像干净
-            if self.original_wallpaper and os.path.exists(self.original_wallpaper):
-                original_image = Image.open(self.original_wallpaper).copy()
-            else:
-                original_image = Image.new('RGB', (1920, 1080), (30, 30, 40))
-            img = original_image.copy()
+            # 原始壁纸（RGBA）来自缓存，壁纸文件变化后自动重新读取
+            base_image = self.base_images.get(self.original_wallpaper)
             
             # 计算任务区域
-            width, height = img.size
+            width, height = base_image.size
             x1 = int(self.task_area_rel[0] * width)
             y1 = int(self.task_area_rel[1] * height)
             x2 = int(self.task_area_rel[2] * width)
             y2 = int(self.task_area_rel[3] * height)
             task_area = (x1, y1, x2, y2)
             
-            # 绘制半透明任务区域背景
-            from PIL import ImageDraw  # 确保导入ImageDraw
-            overlay = Image.new('RGBA', img.size, (0, 0, 0, 0))
-            overlay_draw = ImageDraw.Draw(overlay)
-            radius = 20
-            overlay_draw.rectangle(
-                [task_area[0], task_area[1] + radius, task_area[2], task_area[3] - radius],
-                fill=(30, 30, 40, 160)
-            )
-            overlay_draw.rectangle(
-                [task_area[0] + radius, task_area[1], task_area[2] - radius, task_area[1] + radius],
-                fill=(30, 30, 40, 160)
-            )
-            overlay_draw.rectangle(
-                [task_area[0] + radius, task_area[3] - radius, task_area[2] - radius, task_area[3]],
-                fill=(30, 30, 40, 160)
-            )
-            overlay_draw.ellipse([task_area[0], task_area[1], task_area[0] + radius * 2, task_area[1] + radius * 2],
-                                   fill=(30, 30, 40, 160))
-            overlay_draw.ellipse([task_area[2] - radius * 2, task_area[1], task_area[2], task_area[1] + radius * 2],
-                                   fill=(30, 30, 40, 160))
-            overlay_draw.ellipse([task_area[0], task_area[3] - radius * 2, task_area[0] + radius * 2, task_area[3]],
-                                   fill=(30, 30, 40, 160))
-            overlay_draw.ellipse([task_area[2] - radius * 2, task_area[3] - radius * 2, task_area[2], task_area[3]],
-                                   fill=(30, 30, 40, 160))
-            
-            img = Image.alpha_composite(img.convert('RGBA'), overlay).convert('RGB')
-            
-            # 后续绘制任务内容代码保持不变...
-            # 创建绘图对象
-            draw = ImageDraw.Draw(img)
-            
             # 加载字体
             try:
                 font_dir = os.path.join(os.environ['WINDIR'], 'Fonts')
@@ -151,64 +175,62 @@ class WallpaperManager:
                 task_font = ImageFont.load_default()
                 status_font = ImageFont.load_default()
             
-            # 绘制标题
-            title = "任务清单"
-            title_width = draw.textlength(title, font=title_font)
-            title_x = task_area[0] + (task_area[2] - task_area[0] - title_width) // 2
-            draw.text((title_x, task_area[1] + 20), title, fill=(255, 255, 255), font=title_font)
+            # 底图、半透明面板和标题组成的静态图层只在壁纸、任务区域或字体大小变化时
+            # 重新合成，之后的刷新在它的副本上绘制任务
+            layer_key = (self.base_images.generation, task_area, self.font_size)
+            img = self.panel_layers.get(
+                layer_key, lambda: self._render_panel_layer(base_image, task_area, title_font)).copy()
+            
+            # 创建绘图对象
+            draw = ImageDraw.Draw(img)
             
-            # 获取任务列表 - 只显示标记为在壁纸上显示且未完成的任务
-            all_tasks = self.task_manager.get_all_tasks()
-            tasks = [task for task in all_tasks 
-                     if not task["is_completed"] and task.get("show_on_wallpaper", True)]
+            # 获取任务列表 - 只显示标记为在壁纸上显示且未完成的任务，优先级高的在前；
+            # 多取一个用于判断是否还有更多任务
+            tasks = self.task_manager.get_wallpaper_tasks(limit=self.MAX_TASKS + 1)
+            now = now_timestamp()
             
             # 任务起始Y坐标
             y_pos = task_area[1] + 80
             task_width = task_area[2] - task_area[0] - 90  # 为状态图标留出空间
             
             # 处理任务列表 - 不再显示任务状态图标（移除方框）
-            for task in tasks:
+            for index, task in enumerate(tasks):
+                if index == self.MAX_TASKS:
+                    draw.text((task_area[0] + 70, y_pos), "更多任务...", fill=(255, 255, 255), font=task_font)
+                    break
+                
+                # 任务内容可能未驻留内存，按需读取
+                content = self.task_manager.get_task_content(task["id"])
                 try:
                     # 绘制任务标题
                     title = task.get("title", "").strip()
                     if not title:
                         # 如果没有标题，使用内容的第一行
-                        title = task["content"].split('\n')[0]
+                        title = content.split('\n')[0]
                         if len(title) > 50:
                             title = title[:47] + "..."
                     
-                    # 使用加粗字体渲染标题
+                    # 使用加粗字体渲染标题，颜色表示优先级，逾期的任务突出显示
+                    if task_overdue(task, now):
+                        title = "[已逾期] " + title
+                        title_color = self.OVERDUE_TITLE_COLOR
+                    else:
+                        title_color = self.TITLE_COLORS.get(task_priority(task), self.DEFAULT_TITLE_COLOR)
                     draw.text(
                         (task_area[0] + 30, y_pos), 
                         title, 
-                        fill=(220, 220, 255), 
+                        fill=title_color, 
                         font=title_font
                     )
                     
                     # 更新Y位置，为内容留出空间
                     y_pos += title_font.getbbox(title)[3] + 10
                     
-                    # 使用Markdown渲染器渲染任务内容
+                    # 使用Markdown渲染器渲染任务内容，渲染结果按内容、宽度、字体大小和
+                    # 样式缓存，其他任务变化时不再重新渲染
                     md_width = task_area[2] - task_area[0] - 50  # 不再为状态图标留空间
-                    rendered_pixmap = self.md_renderer.render_markdown(
-                        task["content"], 
-                        width=md_width, 
-                        font_size=self.font_size, 
-                        completed=False  # 已完成任务不会显示
-                    )
-                    
-                    # 检查QPixmap是否有效
-                    if rendered_pixmap.isNull():
-                        raise RuntimeError("渲染的QPixmap无效")
-                    
-                    # 将QPixmap转换为PIL Image
-                    arr = QByteArray()
-                    qbuf = QBuffer(arr)
-                    qbuf.open(QIODevice.OpenModeFlag.WriteOnly)
-                    rendered_pixmap.save(qbuf, b"PNG")
-                    
-                    buffer = io.BytesIO(bytes(arr))
-                    md_image = Image.open(buffer).convert("RGBA")
+                    md_key = tile_key(content, md_width, self.font_size, self.md_renderer.css_version)
+                    md_image = self.task_tiles.get(md_key, lambda: self._render_task_tile(content, md_width))
                     
                     # 计算粘贴位置 - 不再缩进
                     paste_x = task_area[0] + 30  # 从30像素开始，而不是70
@@ -226,7 +248,7 @@ class WallpaperManager:
                     print("详细错误信息:")
                     traceback.print_exc()  # 打印完整的堆栈跟踪
                     # 回退到纯文本渲染
-                    text = task["content"]
+                    text = content
                     color = (180, 180, 180) if task["is_completed"] else (255, 255, 255)
                     
                     # 处理文本换行
@@ -267,7 +289,7 @@ class WallpaperManager:
             
             # 如果没有未完成任务，显示提示信息
             if not tasks:
-                if all_tasks:
+                if self.task_manager.task_count():
                     # 有任务但都已完成
                     message = '所有任务已完成！'
                 else:
@@ -294,6 +316,66 @@ class WallpaperManager:
             traceback.print_exc()
             return False
     
+    def _render_task_tile(self, content, width):
+        """用Markdown渲染器渲染任务内容，返回RGBA图像"""
+        rendered_pixmap = self.md_renderer.render_markdown(
+            content, 
+            width=width, 
+            font_size=self.font_size, 
+            completed=False  # 已完成任务不会显示
+        )
+        
+        # 检查QPixmap是否有效
+        if rendered_pixmap.isNull():
+            raise RuntimeError("渲染的QPixmap无效")
+        
+        # 将QPixmap转换为PIL Image
+        arr = QByteArray()
+        qbuf = QBuffer(arr)
+        qbuf.open(QIODevice.OpenModeFlag.WriteOnly)
+        rendered_pixmap.save(qbuf, b"PNG")
+        
+        buffer = io.BytesIO(bytes(arr))
+        return Image.open(buffer).convert("RGBA")
+    
+    @staticmethod
+    def _render_panel_layer(base_image, task_area, title_font):
+        """合成静态图层：原始壁纸、圆角半透明任务面板和“任务清单”标题，返回RGB图像"""
+        overlay = Image.new('RGBA', base_image.size, (0, 0, 0, 0))
+        overlay_draw = ImageDraw.Draw(overlay)
+        radius = 20
+        overlay_draw.rectangle(
+            [task_area[0], task_area[1] + radius, task_area[2], task_area[3] - radius],
+            fill=(30, 30, 40, 160)
+        )
+        overlay_draw.rectangle(
+            [task_area[0] + radius, task_area[1], task_area[2] - radius, task_area[1] + radius],
+            fill=(30, 30, 40, 160)
+        )
+        overlay_draw.rectangle(
+            [task_area[0] + radius, task_area[3] - radius, task_area[2] - radius, task_area[3]],
+            fill=(30, 30, 40, 160)
+        )
+        overlay_draw.ellipse([task_area[0], task_area[1], task_area[0] + radius * 2, task_area[1] + radius * 2],
+                               fill=(30, 30, 40, 160))
+        overlay_draw.ellipse([task_area[2] - radius * 2, task_area[1], task_area[2], task_area[1] + radius * 2],
+                               fill=(30, 30, 40, 160))
+        overlay_draw.ellipse([task_area[0], task_area[3] - radius * 2, task_area[0] + radius * 2, task_area[3]],
+                               fill=(30, 30, 40, 160))
+        overlay_draw.ellipse([task_area[2] - radius * 2, task_area[3] - radius * 2, task_area[2], task_area[3]],
+                               fill=(30, 30, 40, 160))
+        
+        # 缓存的原始壁纸是共享的，alpha_composite生成新图像而不修改它
+        layer = Image.alpha_composite(base_image, overlay).convert('RGB')
+        
+        # 绘制标题
+        draw = ImageDraw.Draw(layer)
+        title = "任务清单"
+        title_width = draw.textlength(title, font=title_font)
+        title_x = task_area[0] + (task_area[2] - task_area[0] - title_width) // 2
+        draw.text((title_x, task_area[1] + 20), title, fill=(255, 255, 255), font=title_font)
+        return layer
+    
     def restore_original_wallpaper(self):
         """恢复原始壁纸"""
         if self.original_wallpaper and os.path.exists(self.original_wallpaper):